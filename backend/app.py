@@ -5,37 +5,115 @@ from contextlib import asynccontextmanager
 from backend.db import create_db_and_tables
 from backend.routers.chat import router as chat_router
 from backend.routers.history import router as history_router
+from backend.routers.usage import router as usage_router
 
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from backend.db import create_db_and_tables
 # Import your pool and saver
-from src.agents.workflow_executor import connection_pool
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from src.agents.checkpointing import DATABASE_URL, connection_pool, setup_checkpointer, USE_POSTGRES
+from src.data_retriever.vector_store import get_vector_store_service
+from backend.services.ingestion_queue import get_ingestion_queue
+from backend.services.memory_compaction import run_compaction_loop
+from backend.services.job_queue import get_job_settings
+from backend.services.run_recovery import run_recovery_loop
+from backend.services.checkpoint_retention import run_retention_loop
+from backend.services.event_broadcaster import get_event_broadcaster
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Set PRELOAD_GRAPHS=0 to skip warming the agent graphs after start-up
+PRELOAD_GRAPHS = os.getenv("PRELOAD_GRAPHS", "1") == "1"
+
+def warm_up_graphs():
+    """Compile the agent graphs and build the model clients ahead of the first chat."""
+    try:
+        from src.agents.scope_agent import get_model
+        from src.agents.graph_registry import compile_graphs
+        compile_graphs()
+        get_model()
+    except Exception as e:
+        # Not fatal: the first request retries the import and reports the error
+        print(f"⚠️ Graph warm-up failed: {e}")
+
+def log_warm_up_failure(task: asyncio.Task):
+    """Done-callback: surface what warm_up_graphs did not catch instead of dropping it with the task."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Graph warm-up task failed", exc_info=task.exception())
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # --- 1. OPEN THE CONNECTION POOL ---
-    # This removes the Deprecation Warning and ensures routes can connect
-    await connection_pool.open()
-
-    # --- 2. SETUP STANDARD TABLES ---
+    # --- 1. SETUP STANDARD TABLES ---
     await create_db_and_tables()
 
-    # --- 3. SETUP LANGGRAPH TABLES ---
-    async with connection_pool.connection() as conn:
-        # LangGraph setup requires autocommit for index creation
-        await conn.set_autocommit(True)
-        checkpointer = AsyncPostgresSaver(conn)
-        await checkpointer.setup()
-        await conn.set_autocommit(False)
+    if USE_POSTGRES:
+        # --- 2. OPEN THE CONNECTION POOL ---
+        # Opened first: the pgvector memory backend runs on the same pool
+        await connection_pool.open()
+
+        # --- 3. SETUP LANGGRAPH TABLES ---
+        # Once per process: every compiled graph shares this pool-backed saver
+        await setup_checkpointer()
         print("✅ Database and LangGraph tables are fully initialized.")
+    else:
+        # Local stand-in database: graph state lives in memory, no pool to manage
+        await setup_checkpointer()
+        print("✅ Database initialized (in-memory LangGraph checkpoints).")
+
+    relay_listener = None
+    if get_job_settings().executor == "queue":
+        if not USE_POSTGRES:
+            raise RuntimeError("RESEARCH_EXECUTOR=queue requires a PostgreSQL DATABASE_URL")
+        if get_vector_store_service().settings.provider != "pgvector":
+            # Workers write reports to memory; a local Chroma directory would split it per machine
+            raise RuntimeError("RESEARCH_EXECUTOR=queue requires VECTOR_STORE_PROVIDER=pgvector")
+        # Research runs in backend.worker processes; their events arrive over LISTEN/NOTIFY
+        from backend.services.event_relay import run_event_listener
+        relay_listener = asyncio.create_task(run_event_listener(DATABASE_URL, get_event_broadcaster()))
+
+    # Open the shared vector store once; retrieval and ingestion reuse it
+    vector_store = get_vector_store_service()
+    if vector_store.settings.provider == "pgvector" and not USE_POSTGRES:
+        raise RuntimeError("VECTOR_STORE_PROVIDER=pgvector requires a PostgreSQL DATABASE_URL")
+    await vector_store.aopen()
+    if vector_store.settings.provider == "pgvector":
+        print(f"✅ Vector store ready in Postgres table {vector_store.settings.pgvector_table}")
+    else:
+        print(f"✅ Vector store ready at {vector_store.settings.persist_path}")
+    ingestion_queue = get_ingestion_queue()
+    ingestion_queue.start()
+    compaction = asyncio.create_task(run_compaction_loop(vector_store))
+    # Resume research runs a crashed or restarted process left behind
+    recovery = asyncio.create_task(run_recovery_loop())
+    # Trim the checkpoint history of finished research
+    retention = asyncio.create_task(run_retention_loop())
+
+    # The server accepts requests while the graphs compile in a worker thread
+    warm_up = asyncio.create_task(asyncio.to_thread(warm_up_graphs)) if PRELOAD_GRAPHS else None
+    if warm_up is not None:
+        warm_up.add_done_callback(log_warm_up_failure)
 
     yield
 
+    if warm_up is not None:
+        # The thread cannot be interrupted; let it finish before the clients and pool it may touch close
+        await asyncio.gather(warm_up, return_exceptions=True)
+    compaction.cancel()
+    recovery.cancel()
+    retention.cancel()
+    if relay_listener is not None:
+        relay_listener.cancel()
+    # Drain pending ingestion before the pool goes away (pgvector writes use it)
+    await ingestion_queue.stop()
+    vector_store.close()
+
     # --- 4. CLOSE THE POOL ---
     # Ensures no hanging connections when the server restarts
-    await connection_pool.close()
+    if USE_POSTGRES:
+        await connection_pool.close()
 app = FastAPI(lifespan=lifespan)
 
 
@@ -47,4 +125,5 @@ app.include_router(fastapi_users.get_users_router(UserRead, UserUpdate), prefix=
 
 app.include_router(chat_router)
 app.include_router(history_router)
+app.include_router(usage_router)
 
@@ -5,7 +5,7 @@ from typing import List, Optional
 from fastapi import Depends
 import contextlib
 
-from sqlalchemy import String, Text, ForeignKey, Enum, Integer, func
+from sqlalchemy import String, Text, ForeignKey, Enum, Integer, Float, Boolean, Index, func, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.types import Uuid
@@ -25,14 +25,22 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
 
 class TaskStatus(enum.Enum):
     CLARIFYING = "Clarifying"
+    QUEUED = "Queued"
     SEARCHING = "Searching"
     SUMMARIZING = "Summarizing"
     COMPLETED = "Completed"
     FAILED = "Failed"
+    CANCELLED = "Cancelled"
 
 
 class ResearchTask(Base):
     __tablename__ = "research_tasks"
+    __table_args__ = (
+        # The admission queue is read oldest first among QUEUED tasks
+        Index("ix_research_tasks_status_queued_at", "status", "queued_at"),
+        # History pages: a user's tasks by (updated_at, id), read as a range from the cursor
+        Index("ix_research_tasks_user_updated_id", "user_id", "updated_at", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"))
@@ -40,6 +48,10 @@ class ResearchTask(Base):
 
     initial_query: Mapped[str] = mapped_column(Text)
     research_brief: Mapped[Optional[str]] = mapped_column(Text)
+    # Normalized brief digest (research_coalescing.brief_hash) for reusing identical research
+    brief_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    # Thread whose run this task waits on instead of running its own
+    coalesced_with: Mapped[Optional[str]] = mapped_column(String, index=True)
     final_report: Mapped[Optional[str]] = mapped_column(Text)
     status: Mapped[TaskStatus] = mapped_column(
         Enum(TaskStatus, name="task_status_enum"),
@@ -47,17 +59,103 @@ class ResearchTask(Base):
     )
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set periodically by the process running the research; a stale value means the run was lost
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column()
+    resume_count: Mapped[int] = mapped_column(Integer, default=0)
+    # When the task entered the admission queue (backend/services/admission.py)
+    queued_at: Mapped[Optional[datetime]] = mapped_column()
+    # Last checkpoint pruning (backend/services/checkpoint_retention.py)
+    checkpoints_pruned_at: Mapped[Optional[datetime]] = mapped_column()
 
     user: Mapped["User"] = relationship(back_populates="tasks")
+    usage: Mapped[List["ResearchTaskUsage"]] = relationship(
+        back_populates="task", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class JobState(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class ResearchJob(Base):
+    """A research run waiting for, or claimed by, a worker (RESEARCH_EXECUTOR=queue)."""
+    __tablename__ = "research_jobs"
+    # Workers claim the oldest queued job: (state, id) serves that without a sort
+    __table_args__ = (Index("ix_research_jobs_state_id", "state", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    thread_id: Mapped[str] = mapped_column(String, index=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    research_brief: Mapped[str] = mapped_column(Text)
+    # Continue the thread from its latest checkpoint instead of starting the research over
+    resume: Mapped[bool] = mapped_column(Boolean, default=False)
+    state: Mapped[JobState] = mapped_column(Enum(JobState, name="job_state_enum"), default=JobState.QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    locked_by: Mapped[Optional[str]] = mapped_column(String(128))
+    locked_at: Mapped[Optional[datetime]] = mapped_column()
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column()
+
+
+class ResearchTaskUsage(Base):
+    """Token, latency and cost accounting for one LLM call or graph node run."""
+    __tablename__ = "research_task_usage"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("research_tasks.id", ondelete="CASCADE"), index=True)
+    thread_id: Mapped[str] = mapped_column(String, index=True)
+
+    kind: Mapped[str] = mapped_column(String(16))  # "llm" | "node"
+    agent_name: Mapped[str] = mapped_column(String(64))
+    node: Mapped[Optional[str]] = mapped_column(String(64))
+    model: Mapped[Optional[str]] = mapped_column(String(64))
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[float] = mapped_column(Float, default=0.0)
+    retries: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    error: Mapped[Optional[str]] = mapped_column(String(128))
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    task: Mapped["ResearchTask"] = relationship(back_populates="usage")
 
 engine = create_async_engine(DATABASE_URL)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+# create_all() only creates missing tables; columns added since are patched in on Postgres
+POSTGRES_SCHEMA_PATCHES = [
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITHOUT TIME ZONE",
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS resume_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE research_jobs ADD COLUMN IF NOT EXISTS resume BOOLEAN NOT NULL DEFAULT false",
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS brief_hash VARCHAR(64)",
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS coalesced_with VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_research_tasks_brief_hash ON research_tasks (brief_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_research_tasks_coalesced_with ON research_tasks (coalesced_with)",
+    # Enum columns store member names
+    "ALTER TYPE task_status_enum ADD VALUE IF NOT EXISTS 'CANCELLED'",
+    "ALTER TYPE job_state_enum ADD VALUE IF NOT EXISTS 'CANCELLED'",
+    "ALTER TYPE task_status_enum ADD VALUE IF NOT EXISTS 'QUEUED'",
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS queued_at TIMESTAMP WITHOUT TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_research_tasks_status_queued_at ON research_tasks (status, queued_at)",
+    "CREATE INDEX IF NOT EXISTS ix_research_tasks_user_updated_id ON research_tasks (user_id, updated_at, id)",
+    "ALTER TABLE research_tasks ADD COLUMN IF NOT EXISTS checkpoints_pruned_at TIMESTAMP WITHOUT TIME ZONE",
+]
+
+
 async def create_db_and_tables():
     async with engine.begin() as conn:
         # Use Base.metadata so it sees all classes
         await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "postgresql":
+            for statement in POSTGRES_SCHEMA_PATCHES:
+                await conn.execute(text(statement))
 
 async def get_async_session():
     async with async_session_maker() as session:
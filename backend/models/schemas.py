@@ -18,6 +18,8 @@ class ChatResponse(BaseModel):
 
     chat_id : str = Field(description="ID of the chat")
     messages : List = Field(description="list of messages")
+    next_since : Optional[int] = Field(None, description="Pass as ?since= to fetch only messages after this page")
+    total_messages : Optional[int] = Field(None, description="Number of messages in the conversation")
 
 class ChatHistoryItem(BaseModel):
 
@@ -33,3 +35,44 @@ class UserCreate(schemas.BaseUserCreate):
 
 class UserUpdate(schemas.BaseUserUpdate):
     pass
+
+
+class UsageRecordRead(BaseModel):
+
+    kind : str = Field(description="'llm' for a model call, 'node' for a graph node run")
+    agent_name : str = Field(description="Agent that owns the call or node")
+    node : Optional[str] = Field(None, description="LangGraph node name")
+    model : Optional[str] = Field(None, description="Provider model name for LLM calls")
+    prompt_tokens : int = 0
+    completion_tokens : int = 0
+    cached_tokens : int = 0
+    latency_ms : float = 0.0
+    retries : int = 0
+    cost_usd : float = 0.0
+    error : Optional[str] = None
+    created_at : Optional[datetime] = None
+
+class UsageBreakdownItem(BaseModel):
+
+    agent_name : str
+    node : Optional[str] = None
+    kind : str
+    calls : int = Field(description="Number of LLM calls or node executions")
+    prompt_tokens : int = 0
+    completion_tokens : int = 0
+    cached_tokens : int = 0
+    total_latency_ms : float = 0.0
+    avg_latency_ms : float = 0.0
+    retries : int = 0
+    cost_usd : float = 0.0
+
+class UsageSummary(BaseModel):
+
+    chat_id : Optional[str] = Field(None, description="Set for a single run, empty for an aggregate")
+    runs : int = Field(description="Number of runs included in the summary")
+    prompt_tokens : int = 0
+    completion_tokens : int = 0
+    cached_tokens : int = 0
+    cost_usd : float = 0.0
+    breakdown : List[UsageBreakdownItem] = Field(default_factory=list)
+    records : List[UsageRecordRead] = Field(default_factory=list)
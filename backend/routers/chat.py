@@ -1,11 +1,22 @@
 import uuid
 import datetime
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
-from backend.services.background_worker import run_agent_workflow
-from src.agents.workflow_executor import connection_pool
-from src.agents.scope_agent import scope_graph
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
-from fastapi.responses import JSONResponse
+import contextlib
+from typing import Optional
+from backend.services.usage_recorder import save_usage
+from backend.services.event_broadcaster import format_sse, get_event_broadcaster
+from backend.services.job_queue import get_job_settings, cancel_jobs
+from backend.services.run_registry import get_run_registry
+from backend.services.research_coalescing import (
+    brief_hash, submission_lock, lock_brief, find_cached_report, find_leader, attach_report, settle_followers
+)
+from backend.services.admission import (
+    get_admission_settings, lock_admission, pending_for_user, dispatch_queued, queue_position, retry_after_seconds
+)
+from src.handlers.usage_handler import UsageCallbackHandler
+from src.agents.checkpointing import get_checkpointer, latest_checkpoint_id
+from src.agents.graph_registry import get_scope_agent
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db import get_async_session, TaskStatus
 from backend.models.schemas import ChatResponse, ChatRequest
@@ -21,12 +32,14 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat",tags=['chat'])
 
+# Waiting for a run slot, or researching
+ACTIVE = (TaskStatus.QUEUED, TaskStatus.SEARCHING, TaskStatus.SUMMARIZING)
+
 
 @router.post("/{chat_id}/messages", response_model=ChatResponse)
 async def handle_agent_chat(
         chat_id: str,
         payload: ChatRequest,
-        background_tasks: BackgroundTasks,
         db: AsyncSession = Depends(get_async_session),
         user: User = Depends(current_active_user)):
 
@@ -53,99 +66,308 @@ async def handle_agent_chat(
         )
         await db.commit()
 
-    async with connection_pool.connection() as conn:
+    # Compiled once per process; the lifespan hook warms it up in the background
+    agent = get_scope_agent()
+    usage_handler = UsageCallbackHandler(chat_id)
+    config = {"configurable": {"thread_id": chat_id, "user_id":user.id}, "callbacks": [usage_handler]}
 
-        checkpoint = AsyncPostgresSaver(conn)
-        await checkpoint.setup()
+    # Step 1: Execute the first node (Scoping/Retrieval)
+    try:
+        result = await agent.ainvoke({"messages": [HumanMessage(content=payload.text)]}, config=config)
+    finally:
+        # A scope call that failed after its retries has still spent them; record usage either way
+        try:
+            await save_usage(db, chat_id, usage_handler)
+        except Exception as e:
+            logger.error(f"Failed to persist usage for {chat_id}: {e}")
+    research_brief = result.get("research_brief", "")
 
-        agent = scope_graph.compile(checkpointer=checkpoint)
-        config = {"configurable": {"thread_id": chat_id, "user_id":user.id}}
+    # Step 2: Format the conversation for the response
+    messages = result.get("messages", [])
+    formatted_messages = [
+        {"role": "user" if m.type == "human" else "assistant", "content": m.content}
+        for m in messages
+    ]
+    if research_brief:
+        digest = brief_hash(research_brief)
+        admission = get_admission_settings()
+        position = None
+        user_pending = None
+        # Only submissions of the same brief wait here; the database work after the commit runs unlocked
+        async with submission_lock(digest):
+            # Held until the commit below, so another replica cannot elect a second leader meanwhile
+            await lock_brief(db, digest)
+            cached_report = await find_cached_report(db, digest, user.id)
+            leader = None if cached_report else await find_leader(db, digest, chat_id, user.id)
+            if cached_report:
+                # Researched recently: answer with the stored report, no graph run
+                await attach_report(chat_id, cached_report)
+                await db.execute(
+                    update(ResearchTask)
+                    .where(ResearchTask.thread_id == chat_id)
+                    .values(status=TaskStatus.COMPLETED, research_brief=research_brief, brief_hash=digest,
+                            final_report=cached_report, coalesced_with=None)
+                )
+                await db.commit()
+            else:
+                counts_pending = leader is None and admission.max_pending_per_user
+                # The user's other briefs take other brief locks; this one keeps their count and queueing apart
+                async with submission_lock(f"user:{user.id}") if counts_pending else contextlib.nullcontext():
+                    if counts_pending:
+                        # Counted under the admission lock, held until the commit below,
+                        # so a user's concurrent submissions cannot all slip under the cap
+                        await lock_admission(db)
+                        pending = await pending_for_user(db, user.id, exclude_chat_id=chat_id)
+                        if pending >= admission.max_pending_per_user:
+                            user_pending = pending
+                    if user_pending is None:
+                        await db.execute(
+                            update(ResearchTask)
+                            .where(ResearchTask.thread_id == chat_id)
+                            # The brief is kept on the task so an interrupted run can be resumed;
+                            # with a leader, this task waits for that run's report instead of running,
+                            # otherwise it waits in the admission queue for a free run slot
+                            .values(status=TaskStatus.SEARCHING if leader else TaskStatus.QUEUED,
+                                    research_brief=research_brief, brief_hash=digest, coalesced_with=leader,
+                                    heartbeat_at=None, resume_count=0,
+                                    queued_at=None if leader else datetime.datetime.utcnow())
+                        )
+                    await db.commit()
 
-        # Step 1: Execute the first node (Scoping/Retrieval)
-        result = await agent.ainvoke({"messages": [HumanMessage(content=payload.text)]}, config=config)
-        research_brief = result.get("research_brief", "")
-
-        # Step 2: Format the conversation for the response
-        messages = result.get("messages", [])
-        formatted_messages = [
-            {"role": "user" if m.type == "human" else "assistant", "content": m.content}
-            for m in messages
-        ]
-        if research_brief:
-            await db.execute(
-                update(ResearchTask)
-                .where(ResearchTask.thread_id == chat_id)
-                .values(status=TaskStatus.SEARCHING)
-            )
-            await db.commit()
-            # Start the background worker ONCE
-            background_tasks.add_task(run_agent_workflow, chat_id, research_brief, user.id)
+        if not cached_report and leader is None and user_pending is None:
+            # Starts this run (in this process or as a worker job) if a run slot is free
+            await dispatch_queued()
+            position = await queue_position(db, chat_id)
+
+        if user_pending is not None:
+            # Only this user is over their share of the queue; nothing was queued
+            retry_after = retry_after_seconds(user_pending, per_user=True)
             return JSONResponse(
-                status_code=status.HTTP_202_ACCEPTED,
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)},
                 content={
                     "chat_id": chat_id,
                     "messages": formatted_messages,
-                    "status": "research_started",
-                    "message": "Research started in background. Poll /status for updates.",
-                    "poll_url": f"/chat/{chat_id}"
+                    "status": "research_rejected",
+                    "message": (f"You already have {user_pending} research runs waiting. "
+                                "Send the message again after Retry-After seconds."),
+                    "queue_position": None,
+                    "pending_for_user": user_pending,
+                    "retry_after": retry_after,
                 }
             )
+
+        max_pending = admission.max_pending
+        if position is not None and max_pending and position > max_pending:
+            # Backpressure: the admission queue is full, so this brief does not wait in it
+            withdrawn = await db.execute(
+                update(ResearchTask)
+                .where(ResearchTask.thread_id == chat_id, ResearchTask.status == TaskStatus.QUEUED)
+                .values(status=TaskStatus.CLARIFYING, queued_at=None)
+            )
+            await db.commit()
+            if withdrawn.rowcount == 1:
+                retry_after = retry_after_seconds(position)
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(retry_after)},
+                    content={
+                        "chat_id": chat_id,
+                        "messages": formatted_messages,
+                        "status": "research_rejected",
+                        "message": "Too many research runs are waiting. Send the message again after Retry-After seconds.",
+                        "queue_position": position,
+                        "retry_after": retry_after,
+                    }
+                )
+            position = await queue_position(db, chat_id)
+
+        if cached_report:
+            formatted_messages.append({"role": "assistant", "content": cached_report})
+            return ChatResponse(chat_id=chat_id, messages=formatted_messages)
+        headers = {}
+        content = {
+            "chat_id": chat_id,
+            "messages": formatted_messages,
+            "status": "research_started",
+            "message": "Research started in background. Stream events_url or poll poll_url for updates.",
+            "coalesced": leader is not None,
+            "queue_position": position,
+            "poll_url": f"/chat/{chat_id}",
+            "events_url": f"/chat/{chat_id}/events"
+        }
+        if position is not None:
+            retry_after = retry_after_seconds(position)
+            headers["Retry-After"] = str(retry_after)
+            content["status"] = "research_queued"
+            content["message"] = (f"Research is queued at position {position} and starts when a run slot frees up. "
+                                  "Stream events_url or poll poll_url for updates.")
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, headers=headers, content=content)
     return ChatResponse(
         chat_id=chat_id,
         messages=formatted_messages,
     )
 
-from psycopg.rows import dict_row
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
 @router.get("/{chat_id}", response_model=ChatResponse)
 async def get_chat(
         chat_id: str,
+        request: Request,
+        response: Response,
+        since: int = Query(0, ge=0, description="Skip the first `since` messages (the client's next_since)"),
+        limit: Optional[int] = Query(None, ge=1, le=500, description="Maximum messages to return"),
         db: AsyncSession = Depends(get_async_session),
         user: User = Depends(current_active_user)
 ):
 
-    query = select(ResearchTask).where(
+    query = select(ResearchTask.status).where(
         ResearchTask.thread_id == chat_id,
         ResearchTask.user_id==user.id
     )
 
     result = await db.execute(query)
-    task = result.scalar_one_or_none()
-    final_text = task.final_report
-    if not task:
+    task_status = result.scalar_one_or_none()
+    if task_status is None:
         raise HTTPException(status_code=403, detail=f"Unable to load conversation {chat_id}")
+
+    # The thread's version without decoding it: newest checkpoint id plus task status
+    # (the final report is stored together with the COMPLETED status), and the requested
+    # message window, so a validator cached for one window never answers for another
+    checkpoint_id = await latest_checkpoint_id(chat_id)
+    etag = f'"{checkpoint_id or "none"}.{task_status.name.lower()}.{since}-{limit or "all"}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
     formatted_messages = []
-    async with connection_pool.connection() as conn:
-        conn.row_factory = dict_row
-        checkpointer = AsyncPostgresSaver(conn)
-        checkpoint = await checkpointer.aget_tuple(config={
-        "configurable":{
-            "thread_id": chat_id}
-        })
-        if checkpoint:
-            # The actual data is usually inside checkpoint[1]['channel_values']
-            # We use .get() to handle both flat and nested structures safely
-            state = checkpoint[1]
-            data = state.get("channel_values", state)
-
-            # 1. Get Conversation Messages
-            messages = data.get("messages", [])
-            for msg in messages:
-                role = "user" if msg.type == "human" else "assistant"
-                formatted_messages.append({"role": role, "content": msg.content})
-
-            return ChatResponse(
-                chat_id=chat_id,
-                messages=formatted_messages
-            )
-    if task.final_report:
-        # Avoid duplicate entries if it's already in formatted_messages
-        if not formatted_messages or formatted_messages[-1]["content"] != task.final_report:
-            formatted_messages.append({
-                "role": "assistant",
-                "content": task.final_report
-            })
+    checkpoint = await get_checkpointer().aget_tuple(config={
+    "configurable":{
+        "thread_id": chat_id}
+    }) if checkpoint_id else None
+    if checkpoint:
+        # The actual data is usually inside checkpoint[1]['channel_values']
+        # We use .get() to handle both flat and nested structures safely
+        state = checkpoint[1]
+        data = state.get("channel_values", state)
+
+        # 1. Get Conversation Messages
+        messages = data.get("messages", [])
+        total = len(messages)
+        for msg in messages[since:since + limit if limit else None]:
+            role = "user" if msg.type == "human" else "assistant"
+            formatted_messages.append({"role": role, "content": msg.content})
+    else:
+        # No graph state (e.g. checkpoints pruned): fall back to the stored report
+        final_report = (await db.execute(
+            select(ResearchTask.final_report).where(ResearchTask.thread_id == chat_id)
+        )).scalar_one_or_none()
+        total = 1 if final_report else 0
+        if final_report and since == 0:
+            formatted_messages.append({"role": "assistant", "content": final_report})
+
+    return ChatResponse(
+        chat_id=chat_id,
+        messages=formatted_messages,
+        next_since=since + len(formatted_messages),
+        total_messages=total,
+    )
 
-    return ChatResponse(chat_id=chat_id, messages=[])
+@router.get("/{chat_id}/events")
+async def stream_chat_events(
+        chat_id: str,
+        request: Request,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user)
+):
+    """
+    Server-Sent Events stream of a chat's research progress.
+
+    Watchers share the in-process broadcaster fed by the running graph, so the
+    database is read once per connection, not once per update. A client that
+    reconnects with Last-Event-ID resumes after the last event it received.
+    """
+    result = await db.execute(select(ResearchTask.status).where(
+        ResearchTask.thread_id == chat_id,
+        ResearchTask.user_id == user.id
+    ))
+    task_status = result.scalar_one_or_none()
+    if task_status is None:
+        raise HTTPException(status_code=403, detail=f"Unable to load conversation {chat_id}")
+    # Release the connection now; the stream may stay open for the whole run
+    await db.close()
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_event_id = 0
+
+    broadcaster = get_event_broadcaster()
+    if task_status in ACTIVE or broadcaster.is_open(chat_id):
+        frames = broadcaster.stream(chat_id, last_event_id, initial=("status", {"status": task_status.value}))
+    else:
+        # Nothing is running: report the task's state and end the stream
+        async def frames():
+            yield format_sse(0, "status", {"status": task_status.value})
+            yield format_sse(0, "done", {"status": task_status.value})
+        frames = frames()
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _cancel_research(db: AsyncSession, chat_id: str, task_status: TaskStatus):
+    """
+    Stop a chat's research wherever it runs, committing the caller's changes.
+
+    A run in this process is cancelled at once. Queue workers are told over
+    NOTIFY, and a run in another API process stops at its next heartbeat,
+    when it sees the task CANCELLED or gone. A task still in the admission
+    queue only leaves it.
+    """
+    if get_job_settings().executor == "queue":
+        await cancel_jobs(db, chat_id)
+    await db.commit()
+    if not get_run_registry().cancel(chat_id):
+        # Not running here (queued, coalesced or elsewhere): end this process's streams
+        events = get_event_broadcaster()
+        events.publish(chat_id, "status", {"status": TaskStatus.CANCELLED.value})
+        events.close(chat_id, TaskStatus.CANCELLED.value)
+    if task_status == TaskStatus.QUEUED:
+        # No run will end to hand the research on to chats coalesced with this one
+        await settle_followers(chat_id, TaskStatus.CANCELLED, "")
+
+@router.post("/{chat_id}/cancel")
+async def cancel_chat(
+        chat_id: str,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user)
+):
+    """Stop the chat's running research, releasing its LLM and search capacity."""
+    result = await db.execute(select(ResearchTask.status).where(
+        ResearchTask.thread_id == chat_id,
+        ResearchTask.user_id == user.id
+    ))
+    task_status = result.scalar_one_or_none()
+    if task_status is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    if task_status not in ACTIVE:
+        return {"success": False, "status": task_status.value, "message": "No research is running for this chat"}
+
+    await db.execute(
+        update(ResearchTask)
+        .where(ResearchTask.thread_id == chat_id)
+        .values(status=TaskStatus.CANCELLED, coalesced_with=None)
+    )
+    await _cancel_research(db, chat_id, task_status)
+    return {"success": True, "status": TaskStatus.CANCELLED.value, "message": "Research cancelled"}
 
 @router.delete('/{chat_id}')
 async def delete_chat(
@@ -161,9 +383,18 @@ async def delete_chat(
         chat = result.scalars().first()
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
+        task_status = chat.status
         await db.delete(chat)
-        await db.commit()
+        if task_status in ACTIVE:
+            # Deleting commits; the run stops instead of researching for a chat that is gone
+            await _cancel_research(db, chat_id, task_status)
+        else:
+            await db.commit()
+        # The conversation state goes with the chat
+        await get_checkpointer().adelete_thread(chat_id)
 
         return {"success": True, "message": "Chat deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,9 @@
-from fastapi import APIRouter, Depends
+import base64
+import binascii
+import datetime
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from backend.db import get_async_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.db import User
@@ -6,31 +11,73 @@ from backend.models.schemas import ChatHistoryItem
 from typing_extensions import List
 from backend.routers.users import current_active_user
 from backend.db import ResearchTask
-from sqlalchemy import select, desc
+from sqlalchemy import select, func, tuple_
 
 router = APIRouter(prefix='/history', tags=['history'])
 
+TITLE_LENGTH = 50
+
+
+def encode_cursor(updated_at: datetime.datetime, task_id: uuid.UUID) -> str:
+    """Opaque position after a row: its (updated_at, id) sort key."""
+    raw = f"{updated_at.isoformat()}|{task_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, task_id = raw.split("|")
+        return datetime.datetime.fromisoformat(updated_at), uuid.UUID(task_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/", response_model=List[ChatHistoryItem])
 async def get_list(
+    response: Response,
     db: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_active_user),
-    limit: int = 50,  # Optional query parameter
-    offset: int = 0   # For pagination
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use cursor instead")
 ):
+    """
+    The user's chats, most recently updated first.
+
+    Pages are keyset-paginated: when more chats follow, the X-Next-Cursor
+    header holds the cursor for the next page. The (user_id, updated_at, id)
+    index serves every page without scanning the ones before it, and only
+    the columns the list shows are read (the title from the query's first
+    characters, not the whole query or report).
+    """
     query = (
-        select(ResearchTask)
+        select(
+            ResearchTask.id,
+            ResearchTask.thread_id,
+            ResearchTask.updated_at,
+            # One character more than the title, to know whether to add "..."
+            func.substr(ResearchTask.initial_query, 1, TITLE_LENGTH + 1).label("title"),
+        )
         .where(ResearchTask.user_id == user.id)
-        .order_by(desc(ResearchTask.updated_at))  # Most recent first
-        .limit(limit)
-        .offset(offset)
+        # id breaks ties, so rows with the same updated_at are neither skipped nor repeated
+        .order_by(ResearchTask.updated_at.desc(), ResearchTask.id.desc())  # Most recent first
+        .limit(limit + 1)
     )
-    result = await db.execute(query)
-    tasks = result.scalars().all()
+    if cursor:
+        query = query.where(tuple_(ResearchTask.updated_at, ResearchTask.id) < tuple_(*decode_cursor(cursor)))
+    elif offset:
+        query = query.offset(offset)
+    rows = (await db.execute(query)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].updated_at, rows[-1].id)
 
     return [
         ChatHistoryItem(
-            chat_id=task.thread_id,
-            title=task.initial_query[:50] + ("..." if len(task.initial_query) > 50 else ""),
-            last_updated=task.updated_at,
-        ) for task in tasks
-    ]
\ No newline at end of file
+            chat_id=row.thread_id,
+            title=row.title[:TITLE_LENGTH] + ("..." if len(row.title) > TITLE_LENGTH else ""),
+            last_updated=row.updated_at,
+        ) for row in rows
+    ]
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException
+from backend.db import get_async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import User, ResearchTask, ResearchTaskUsage
+from backend.models.schemas import UsageSummary, UsageBreakdownItem, UsageRecordRead
+from backend.routers.users import current_active_user
+from sqlalchemy import select, func
+from datetime import datetime
+from typing_extensions import Optional
+
+router = APIRouter(prefix='/usage', tags=['usage'])
+
+
+async def _breakdown(db: AsyncSession, *conditions) -> list[UsageBreakdownItem]:
+    """Group usage rows by agent, node and kind for the given filter."""
+    query = (
+        select(
+            ResearchTaskUsage.agent_name,
+            ResearchTaskUsage.node,
+            ResearchTaskUsage.kind,
+            func.count(ResearchTaskUsage.id),
+            func.coalesce(func.sum(ResearchTaskUsage.prompt_tokens), 0),
+            func.coalesce(func.sum(ResearchTaskUsage.completion_tokens), 0),
+            func.coalesce(func.sum(ResearchTaskUsage.cached_tokens), 0),
+            func.coalesce(func.sum(ResearchTaskUsage.latency_ms), 0.0),
+            func.coalesce(func.sum(ResearchTaskUsage.retries), 0),
+            func.coalesce(func.sum(ResearchTaskUsage.cost_usd), 0.0),
+        )
+        .join(ResearchTask, ResearchTask.id == ResearchTaskUsage.task_id)
+        .where(*conditions)
+        .group_by(ResearchTaskUsage.agent_name, ResearchTaskUsage.node, ResearchTaskUsage.kind)
+        .order_by(ResearchTaskUsage.agent_name, ResearchTaskUsage.node)
+    )
+    result = await db.execute(query)
+    return [
+        UsageBreakdownItem(
+            agent_name=agent_name,
+            node=node,
+            kind=kind,
+            calls=calls,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            total_latency_ms=latency,
+            avg_latency_ms=latency / calls if calls else 0.0,
+            retries=retries,
+            cost_usd=cost,
+        )
+        for agent_name, node, kind, calls, prompt_tokens, completion_tokens, cached_tokens, latency, retries, cost
+        in result.all()
+    ]
+
+
+def _summarize(breakdown: list[UsageBreakdownItem], **kwargs) -> UsageSummary:
+    # Node rows carry latency only; tokens and cost come from the LLM rows
+    llm_rows = [item for item in breakdown if item.kind == "llm"]
+    return UsageSummary(
+        prompt_tokens=sum(item.prompt_tokens for item in llm_rows),
+        completion_tokens=sum(item.completion_tokens for item in llm_rows),
+        cached_tokens=sum(item.cached_tokens for item in llm_rows),
+        cost_usd=sum(item.cost_usd for item in llm_rows),
+        breakdown=breakdown,
+        **kwargs,
+    )
+
+
+@router.get("/", response_model=UsageSummary)
+async def get_usage_summary(
+    db: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_active_user),
+    since: Optional[datetime] = None,  # Only include usage recorded after this time
+):
+    conditions = [ResearchTask.user_id == user.id]
+    if since is not None:
+        conditions.append(ResearchTaskUsage.created_at >= since)
+
+    runs = await db.execute(
+        select(func.count(func.distinct(ResearchTaskUsage.task_id)))
+        .join(ResearchTask, ResearchTask.id == ResearchTaskUsage.task_id)
+        .where(*conditions)
+    )
+    breakdown = await _breakdown(db, *conditions)
+    return _summarize(breakdown, runs=runs.scalar_one())
+
+
+@router.get("/{chat_id}", response_model=UsageSummary)
+async def get_chat_usage(
+    chat_id: str,
+    db: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_active_user),
+    include_records: bool = True,
+):
+    result = await db.execute(select(ResearchTask.id).where(
+        ResearchTask.thread_id == chat_id,
+        ResearchTask.user_id == user.id
+    ))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    conditions = [ResearchTask.thread_id == chat_id, ResearchTask.user_id == user.id]
+    breakdown = await _breakdown(db, *conditions)
+
+    records = []
+    if include_records:
+        rows = await db.execute(
+            select(ResearchTaskUsage)
+            .where(ResearchTaskUsage.thread_id == chat_id)
+            .order_by(ResearchTaskUsage.id)
+        )
+        records = [
+            UsageRecordRead.model_validate(row, from_attributes=True)
+            for row in rows.scalars().all()
+        ]
+    return _summarize(breakdown, chat_id=chat_id, runs=1, records=records)
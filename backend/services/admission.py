@@ -0,0 +1,165 @@
+"""
+Admission control for deep research runs.
+
+A chat whose scoping produced a brief does not start its run straight
+away. Its task enters the admission queue (status QUEUED, queued_at), and
+dispatch_queued() starts queued tasks oldest first while fewer than
+RESEARCH_MAX_RUNS runs are in progress, skipping users who already have
+RESEARCH_MAX_RUNS_PER_USER runs in progress. Coalesced followers do not
+count: they run nothing themselves. A started task becomes SEARCHING and
+runs in this process, or, with RESEARCH_EXECUTOR=queue, gets a job for
+the workers.
+
+Dispatch happens on submission, whenever a run ends, and on every run
+recovery sweep, which also catches tasks left queued by a lost process.
+At most RESEARCH_MAX_PENDING tasks wait. A submission that would queue
+behind them is taken out of the queue again and refused with 429, its
+queue position and a Retry-After estimated from RESEARCH_RUN_SECONDS.
+A user who already has RESEARCH_MAX_PENDING_PER_USER tasks waiting is
+refused the same way before queueing, so one user cannot fill the queue
+for everyone. The submission counts them under the admission lock, in the
+transaction that queues its task. A limit of 0 means unlimited.
+"""
+import asyncio
+import logging
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+from sqlalchemy import and_, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import engine, get_async_session_context, ResearchTask, TaskStatus
+from backend.services.job_queue import get_job_settings, enqueue_research
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key serializing dispatchers across API and worker processes
+ADMISSION_LOCK_KEY = 0x52455345  # "RESE"
+
+# A task with a run of its own in progress (followers wait on another task's run)
+RUNNING = and_(
+    ResearchTask.status.in_((TaskStatus.SEARCHING, TaskStatus.SUMMARIZING)),
+    ResearchTask.coalesced_with.is_(None),
+)
+
+
+@dataclass
+class AdmissionSettings:
+    max_runs: int = 8
+    max_runs_per_user: int = 2
+    max_pending: int = 32
+    max_pending_per_user: int = 4
+    # Typical run duration, for Retry-After estimates
+    run_seconds: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionSettings":
+        return cls(
+            max_runs=int(os.getenv("RESEARCH_MAX_RUNS", cls.max_runs)),
+            max_runs_per_user=int(os.getenv("RESEARCH_MAX_RUNS_PER_USER", cls.max_runs_per_user)),
+            max_pending=int(os.getenv("RESEARCH_MAX_PENDING", cls.max_pending)),
+            max_pending_per_user=int(os.getenv("RESEARCH_MAX_PENDING_PER_USER", cls.max_pending_per_user)),
+            run_seconds=float(os.getenv("RESEARCH_RUN_SECONDS", cls.run_seconds)),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_admission_settings() -> AdmissionSettings:
+    return AdmissionSettings.from_env()
+
+
+# Serializes dispatchers within a process; Postgres adds an advisory lock across processes
+dispatch_lock = asyncio.Lock()
+
+
+async def lock_admission(db: AsyncSession):
+    """Hold the cross-process admission lock until db's transaction ends (Postgres only)."""
+    if engine.dialect.name == "postgresql":
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADMISSION_LOCK_KEY})
+
+
+async def pending_for_user(db: AsyncSession, user_id, exclude_chat_id: Optional[str] = None) -> int:
+    """Number of the user's tasks waiting in the admission queue, other than exclude_chat_id."""
+    query = (
+        select(func.count()).select_from(ResearchTask)
+        .where(ResearchTask.user_id == user_id, ResearchTask.status == TaskStatus.QUEUED)
+    )
+    if exclude_chat_id is not None:
+        query = query.where(ResearchTask.thread_id != exclude_chat_id)
+    return (await db.execute(query)).scalar_one()
+
+
+async def queue_position(db: AsyncSession, chat_id: str) -> Optional[int]:
+    """1-based position of a queued task in the admission queue; None once it is no longer queued."""
+    queued_at = (await db.execute(
+        select(ResearchTask.queued_at)
+        .where(ResearchTask.thread_id == chat_id, ResearchTask.status == TaskStatus.QUEUED)
+    )).scalar_one_or_none()
+    if queued_at is None:
+        return None
+    return (await db.execute(
+        select(func.count()).select_from(ResearchTask)
+        .where(ResearchTask.status == TaskStatus.QUEUED, ResearchTask.queued_at <= queued_at)
+    )).scalar_one()
+
+
+def retry_after_seconds(position: int, per_user: bool = False) -> int:
+    """Rough wait until `position` queued runs ahead (only the user's own, with per_user) have had their turn."""
+    settings = get_admission_settings()
+    slots = settings.max_runs or settings.max_runs_per_user or 1
+    if per_user and settings.max_runs_per_user:
+        slots = settings.max_runs_per_user
+    return max(1, math.ceil(math.ceil(position / slots) * settings.run_seconds))
+
+
+async def dispatch_queued() -> List[str]:
+    """Start queued tasks, oldest first, while run slots are free; returns the chat ids started."""
+    from backend.services.background_worker import run_agent_workflow
+    from backend.services.run_registry import get_run_registry
+    settings = get_admission_settings()
+    queue_mode = get_job_settings().executor == "queue"
+    started = []
+
+    async with dispatch_lock:
+        async with get_async_session_context() as db:
+            # Held until commit, so two processes do not hand out the same free slot
+            await lock_admission(db)
+            per_user: Dict = dict((await db.execute(
+                select(ResearchTask.user_id, func.count()).where(RUNNING).group_by(ResearchTask.user_id)
+            )).all())
+            running = sum(per_user.values())
+            queued = (await db.execute(
+                select(ResearchTask.id, ResearchTask.thread_id, ResearchTask.user_id, ResearchTask.research_brief)
+                .where(ResearchTask.status == TaskStatus.QUEUED)
+                .order_by(ResearchTask.queued_at, ResearchTask.id)
+            )).all()
+
+            for task in queued:
+                if settings.max_runs and running >= settings.max_runs:
+                    break
+                if settings.max_runs_per_user and per_user.get(task.user_id, 0) >= settings.max_runs_per_user:
+                    continue
+                admitted = await db.execute(
+                    update(ResearchTask)
+                    .where(ResearchTask.id == task.id, ResearchTask.status == TaskStatus.QUEUED)
+                    .values(status=TaskStatus.SEARCHING, heartbeat_at=None, resume_count=0)
+                )
+                if admitted.rowcount != 1:
+                    # Cancelled meanwhile
+                    continue
+                if queue_mode:
+                    await enqueue_research(db, task.thread_id, task.research_brief, task.user_id)
+                running += 1
+                per_user[task.user_id] = per_user.get(task.user_id, 0) + 1
+                started.append(task)
+            await db.commit()
+
+    if not queue_mode:
+        runs = get_run_registry()
+        for task in started:
+            runs.spawn(run_agent_workflow(task.thread_id, task.research_brief, task.user_id))
+    if started:
+        logger.info(f"Admitted {len(started)} queued research runs ({len(queued) - len(started)} still waiting)")
+    return [task.thread_id for task in started]
+
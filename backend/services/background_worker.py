@@ -1,24 +1,30 @@
+import asyncio
 import logging
-import os
 import uuid
 import datetime
-from src.agents.workflow_executor import connection_pool, deep_researcher_builder
-from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from src.agents.graph_registry import get_deep_research_agent
 from backend.db import get_async_session_context, ResearchTask, TaskStatus
 from langchain_core.messages import HumanMessage
 from sqlalchemy import update
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from src.agent_interface.states import SupervisorState
-from src.agents.supervisor_agent import supervisor_builder
-from langgraph.checkpoint.memory import InMemorySaver
-from pathlib import Path
+from backend.services.usage_recorder import save_usage
+from backend.services.ingestion_queue import get_ingestion_queue
+from backend.services.event_broadcaster import get_event_broadcaster, run_graph_with_events
+from backend.services.run_recovery import run_heartbeat
+from backend.services.research_coalescing import settle_followers
+from backend.services.admission import dispatch_queued
+from backend.services.run_registry import get_run_registry, RunCancelled
+from src.handlers.usage_handler import UsageCallbackHandler
 logger = logging.getLogger(__name__)
 
 
-async def run_agent_workflow(chat_id: str, research_brief: str, user_id: uuid.UUID):
+async def run_agent_workflow(chat_id: str, research_brief: str, user_id: uuid.UUID, resume: bool = False) -> TaskStatus:
+    """
+    Run the deep research graph for a chat and store its report.
+
+    With resume=True (run recovery) the graph continues from the thread's
+    latest checkpoint instead of starting over.
+    """
     thread_id = chat_id
     print(f"!!! DEBUG: Background task triggered for {chat_id} !!!", flush=True)
     logger.info("Background task is started")
@@ -26,6 +32,9 @@ async def run_agent_workflow(chat_id: str, research_brief: str, user_id: uuid.UU
     logger.info(f"research brief: {research_brief}")
     logger.warning(f"🔥 Background task STARTED for chat_id={chat_id}, user_id={user_id}")
 
+    # Graph modules are imported on first use to keep API start-up light
+    from src.agent_interface.states import SupervisorState
+
     supervisor_state = SupervisorState(
         supervisor_messages=[HumanMessage(content=f"{research_brief}.")],
         research_brief =  research_brief,
@@ -34,84 +43,101 @@ async def run_agent_workflow(chat_id: str, research_brief: str, user_id: uuid.UU
         trigger_search=True,
         research_iterations=0
     )
-
+    usage_handler = UsageCallbackHandler(chat_id)
+    events = get_event_broadcaster()
+    events.open(chat_id)
+    events.publish(chat_id, "status", {"status": TaskStatus.SEARCHING.value})
+    final_status = TaskStatus.FAILED
+    final_text = ""
+    # Tells the recovery sweep (run_recovery.py) this run is alive
+    heartbeat = asyncio.create_task(run_heartbeat(thread_id))
 
     async with get_async_session_context() as db:
         try:
-            async with connection_pool.connection() as conn:
-                checkpoint = AsyncPostgresSaver(conn)
-                await checkpoint.setup()
-
-                # Using the global builder to compile the agent
-                agent = deep_researcher_builder.compile(checkpointer=checkpoint)
-
-                config = {"configurable": {
-                    "thread_id": thread_id,
-                    "user_id": user_id
-
-                },"recursion_limit" : 100}
+            # Compiled once per process against the shared checkpointer
+            agent = get_deep_research_agent()
+
+            config = {"configurable": {
+                "thread_id": thread_id,
+                "user_id": user_id
+
+            },"recursion_limit" : 100, "callbacks": [usage_handler]}
+            # Registered under the chat id, so cancel and delete can stop the graph mid-run
+            runs = get_run_registry()
+            snapshot = await agent.aget_state(config) if resume else None
+            if snapshot is not None and snapshot.next:
+                # Interrupted mid-graph: ainvoke(None) continues from the latest checkpoint
+                logger.warning(f"Resuming research for {thread_id} at {snapshot.next}")
+                final_state = await runs.run(chat_id, run_graph_with_events(agent, None, config, chat_id))
+            elif (snapshot is not None and snapshot.values.get("final_report")
+                  and snapshot.values.get("research_brief") == research_brief):
+                # The graph had finished; only the steps below were lost
+                final_state = snapshot.values
+            else:
                 await agent.aupdate_state(config, {
                     "research_brief": research_brief,
                     "trigger_search": True,
                     "research_iterations": 0,
                     "notes": [],
-                    "raw_notes": []
+                    "raw_notes": [],
+                    # So a finished graph is told apart from an earlier turn's report on resume
+                    "final_report": ""
                 })
 
-                final_state = await agent.ainvoke(None,config)
+                # Same as ainvoke, while node, researcher and report-token events reach SSE watchers
+                final_state = await runs.run(chat_id, run_graph_with_events(agent, None, config, chat_id))
 
-                # Update status to SUMMARIZING now that heavy research is done
-                stmt_summarizing = (
-                    update(ResearchTask)
-                    .where(ResearchTask.thread_id == thread_id)
-                    .values(status=TaskStatus.SUMMARIZING)
-                )
-                await db.execute(stmt_summarizing)
-                await db.commit()
-
-                final_text = final_state.get("final_report", "")
-                need_search = final_state.get("trigger_search", False)
-
-                # Only proceed if we actually got a report
-                if final_text and need_search:
-                    # 1. Prepare Document for Vector Store
-                    doc = Document(
-                        page_content=final_text,
-                        metadata={
-                            "research_brief": research_brief,
-                            "timestamp": datetime.datetime.now().isoformat(),
-                            "type": "final_report",
-                            "chat_id": chat_id
-                        }
-                    )
-
-                    # 2. Vector DB Logic
-                    embedding = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-                    VECTOR_DB_PATH = Path(r"C:\Users\User\PythonProject\data\output").resolve()
-                    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-                    chroma_db = Chroma(
-                        collection_name="deep_research_texts",
-                        embedding_function=embedding,
-                        persist_directory=str(VECTOR_DB_PATH)
-                    )
-
-                    text_splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=1800,
-                        chunk_overlap=200
-                    )
-                    all_splits = text_splitter.split_documents([doc])
-                    chroma_db.add_documents(all_splits)
-
-                # 3. Final Status Update
-                stmt_complete = (
-                    update(ResearchTask)
-                    .where(ResearchTask.thread_id == thread_id)
-                    .values(final_report=final_text,status=TaskStatus.COMPLETED)
+            # Update status to SUMMARIZING now that heavy research is done
+            stmt_summarizing = (
+                update(ResearchTask)
+                .where(ResearchTask.thread_id == thread_id, ResearchTask.status != TaskStatus.CANCELLED)
+                .values(status=TaskStatus.SUMMARIZING)
+            )
+            await db.execute(stmt_summarizing)
+            await db.commit()
+            events.publish(chat_id, "status", {"status": TaskStatus.SUMMARIZING.value})
+
+            final_text = final_state.get("final_report", "")
+            need_search = final_state.get("trigger_search", False)
+
+            # Only proceed if we actually got a report
+            if final_text and need_search:
+                # 1. Prepare Document for Vector Store
+                doc = Document(
+                    page_content=final_text,
+                    metadata={
+                        "research_brief": research_brief,
+                        "timestamp": datetime.datetime.now().isoformat(),
+                        "type": "final_report",
+                        "chat_id": chat_id
+                    }
                 )
-                await db.execute(stmt_complete)
-                await db.commit()
-                print(f"Research completed for thread: {thread_id}", flush=True)
 
+                # 2. Hand off to the ingestion queue; embedding happens in the background
+                get_ingestion_queue().submit(doc)
+
+            # 3. Final Status Update
+            stmt_complete = (
+                update(ResearchTask)
+                .where(ResearchTask.thread_id == thread_id, ResearchTask.status != TaskStatus.CANCELLED)
+                .values(final_report=final_text,status=TaskStatus.COMPLETED)
+            )
+            completed = await db.execute(stmt_complete)
+            await db.commit()
+            # No row: the chat was cancelled (or deleted) after the graph had finished
+            final_status = TaskStatus.COMPLETED if completed.rowcount else TaskStatus.CANCELLED
+            print(f"Research completed for thread: {thread_id}", flush=True)
+
+        except RunCancelled:
+            logger.warning(f"Research for {thread_id} was cancelled")
+            final_status = TaskStatus.CANCELLED
+            await db.rollback()
+            await db.execute(
+                update(ResearchTask)
+                .where(ResearchTask.thread_id == thread_id)
+                .values(status=TaskStatus.CANCELLED)
+            )
+            await db.commit()
         except Exception as e:
             logger.error(f"Workflow error: {e}")
             stmt_failed = (
@@ -120,4 +146,27 @@ async def run_agent_workflow(chat_id: str, research_brief: str, user_id: uuid.UU
                 .values(status=TaskStatus.FAILED)
             )
             await db.execute(stmt_failed)
-            await db.commit()
\ No newline at end of file
+            await db.commit()
+        finally:
+            heartbeat.cancel()
+            events.publish(chat_id, "status", {"status": final_status.value})
+            events.close(chat_id, final_status.value)
+
+        try:
+            await save_usage(db, thread_id, usage_handler)
+        except Exception as e:
+            logger.error(f"Failed to persist usage for {thread_id}: {e}")
+
+    # Chats that asked for the same brief while this ran get the same outcome
+    try:
+        await settle_followers(thread_id, final_status, final_text)
+    except Exception as e:
+        logger.error(f"Failed to settle chats coalesced with {thread_id}: {e}")
+
+    # This run's slot is free: start the next queued one
+    try:
+        await dispatch_queued()
+    except Exception as e:
+        logger.error(f"Failed to admit queued research after {thread_id}: {e}")
+
+    return final_status
@@ -0,0 +1,81 @@
+"""
+Retention of LangGraph checkpoints for finished research.
+
+Every super-step of a run writes a checkpoint, and the message lists and
+notes in its blobs grow with each one. Once a task is COMPLETED, FAILED
+or CANCELLED, its thread only needs its latest state: GET /chat reads it,
+and a new message continues from it. The pruning job keeps the newest
+CHECKPOINT_KEEP_LAST root checkpoints of such threads and drops their
+subgraph calls, writes and unreferenced blobs (see
+checkpointing.prune_checkpoints). It runs every
+CHECKPOINT_PRUNE_INTERVAL_SECONDS (0 disables it).
+
+ResearchTask.checkpoints_pruned_at records the last pruning, so each
+sweep only visits threads updated since then.
+"""
+import asyncio
+import datetime
+import logging
+from sqlalchemy import or_, select, update
+from backend.db import get_async_session_context, ResearchTask, TaskStatus
+from src.agents.checkpointing import get_checkpoint_settings, prune_checkpoints
+
+logger = logging.getLogger(__name__)
+
+FINISHED = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+BATCH_SIZE = 100
+
+
+async def prune_finished_threads(batch_size: int = BATCH_SIZE) -> int:
+    """Prune one batch of finished tasks updated since their last pruning; returns how many were pruned."""
+    keep_last = get_checkpoint_settings().keep_last
+    pruned = 0
+    async with get_async_session_context() as db:
+        tasks = (await db.execute(
+            select(ResearchTask.id, ResearchTask.thread_id, ResearchTask.updated_at)
+            .where(
+                ResearchTask.status.in_(FINISHED),
+                or_(ResearchTask.checkpoints_pruned_at.is_(None),
+                    ResearchTask.checkpoints_pruned_at < ResearchTask.updated_at),
+            )
+            .order_by(ResearchTask.updated_at)
+            .limit(batch_size)
+        )).all()
+
+        for task in tasks:
+            try:
+                await prune_checkpoints(task.thread_id, keep_last)
+            except Exception as e:
+                logger.error(f"Pruning the checkpoints of {task.thread_id} failed: {e}")
+                continue
+            await db.execute(
+                update(ResearchTask)
+                .where(ResearchTask.id == task.id)
+                # Keep updated_at: it orders the history list, and pruning is not an edit
+                .values(checkpoints_pruned_at=max(datetime.datetime.utcnow(), task.updated_at),
+                        updated_at=ResearchTask.updated_at)
+            )
+            await db.commit()
+            pruned += 1
+    return pruned
+
+
+async def run_retention_loop():
+    """
+    Prune finished threads every prune_interval_seconds, draining the
+    backlog in batches. Runs until cancelled; an interval of 0 disables it.
+    """
+    interval = get_checkpoint_settings().prune_interval_seconds
+    if interval <= 0:
+        return
+    while True:
+        try:
+            pruned = batch = await prune_finished_threads()
+            while batch == BATCH_SIZE:
+                batch = await prune_finished_threads()
+                pruned += batch
+            if pruned:
+                logger.info(f"Checkpoint retention: pruned {pruned} finished threads")
+        except Exception as e:
+            logger.error(f"Checkpoint retention failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,220 @@
+"""
+In-process fan-out of research progress to Server-Sent Events watchers.
+
+run_agent_workflow drives the research graph with astream_events() and
+publishes a few event kinds per chat:
+
+  * status      task status changes (searching, summarizing, completed, failed)
+  * node        graph node transitions ({"node", "phase": "start" | "end"})
+  * researcher  a researcher subgraph started or finished ({"id", "topic", "phase"})
+  * token       final-report tokens as the reporter model streams them
+  * report      the complete final report
+  * done        the run is over; streams close after it
+
+Each event is formatted as an SSE frame once, in publish(). Every watcher
+of GET /chat/{chat_id}/events reads frames from its own bounded queue, so
+watchers cost no database work and nothing is re-serialized per watcher.
+A channel keeps its last EVENTS_HISTORY frames, so a client that
+reconnects with Last-Event-ID resumes where it left off. A watcher that
+falls EVENTS_QUEUE_SIZE frames behind is disconnected and catches up from
+that history when it reconnects.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Set, Tuple
+
+# The node whose model tokens are forwarded, and the researcher graph's compiled name
+REPORT_NODE = "final_report_generation"
+RESEARCHER_GRAPH = "research_agent"
+
+
+@dataclass
+class EventSettings:
+    history: int = 1000
+    queue_size: int = 1000
+    heartbeat_seconds: float = 15.0
+    # Finished channels stay readable this long for late or reconnecting watchers
+    retention_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "EventSettings":
+        return cls(
+            history=int(os.getenv("EVENTS_HISTORY", cls.history)),
+            queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", cls.queue_size)),
+            heartbeat_seconds=float(os.getenv("EVENTS_HEARTBEAT_SECONDS", cls.heartbeat_seconds)),
+            retention_seconds=float(os.getenv("EVENTS_RETENTION_SECONDS", cls.retention_seconds)),
+        )
+
+
+def format_sse(event_id: int, event: str, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# (event id, event name, formatted frame)
+_Frame = Tuple[int, str, str]
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    queue: asyncio.Queue
+    lagged: bool = False
+
+
+@dataclass
+class _Channel:
+    history: Deque[_Frame]
+    subscribers: Set[_Subscriber] = field(default_factory=set)
+    closed_at: Optional[float] = None
+    touched_at: float = field(default_factory=time.monotonic)
+
+
+class EventBroadcaster:
+    """Per-chat event channels with replay history; used from the event loop only."""
+
+    def __init__(self, settings: Optional[EventSettings] = None):
+        self.settings = settings or EventSettings()
+        self._channels: Dict[str, _Channel] = {}
+        # Process-wide ids: they keep increasing across runs and swept channels, so a
+        # reconnecting watcher's Last-Event-ID never hides newer events
+        self._last_id = 0
+        # Worker processes forward every open/publish to the API processes (event_relay.py)
+        self.forward: Optional[Callable[[str, str, Dict[str, Any]], None]] = None
+
+    def _channel(self, chat_id: str) -> _Channel:
+        channel = self._channels.get(chat_id)
+        if channel is None:
+            self._sweep()
+            channel = self._channels[chat_id] = _Channel(history=deque(maxlen=self.settings.history))
+        channel.touched_at = time.monotonic()
+        return channel
+
+    def _sweep(self):
+        """Forget idle channels of finished runs, and channels watchers opened for runs that never published."""
+        cutoff = time.monotonic() - self.settings.retention_seconds
+        idle = [
+            chat_id for chat_id, channel in self._channels.items()
+            if not channel.subscribers and channel.touched_at < cutoff
+            and (channel.closed_at is not None or not channel.history)
+        ]
+        for chat_id in idle:
+            del self._channels[chat_id]
+
+    def is_open(self, chat_id: str) -> bool:
+        """True while a run in this process is publishing to the chat."""
+        channel = self._channels.get(chat_id)
+        return channel is not None and channel.closed_at is None and bool(channel.history)
+
+    def open(self, chat_id: str):
+        """Start a new run on the chat's channel, dropping a finished run's history."""
+        channel = self._channel(chat_id)
+        if channel.closed_at is not None:
+            channel.history.clear()
+            channel.closed_at = None
+        if self.forward is not None:
+            self.forward(chat_id, "open", {})
+
+    def publish(self, chat_id: str, event: str, data: Dict[str, Any]):
+        channel = self._channel(chat_id)
+        self._last_id += 1
+        event_id = self._last_id
+        item = (event_id, event, format_sse(event_id, event, data))
+        channel.history.append(item)
+        for subscriber in channel.subscribers:
+            if subscriber.lagged:
+                continue
+            try:
+                subscriber.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+        if self.forward is not None:
+            self.forward(chat_id, event, data)
+
+    def close(self, chat_id: str, status: str):
+        """Publish the terminal done event and mark the channel finished."""
+        self.publish(chat_id, "done", {"status": status})
+        self._channels[chat_id].closed_at = time.monotonic()
+
+    async def stream(self, chat_id: str, last_event_id: int = 0,
+                     initial: Optional[Tuple[str, Dict[str, Any]]] = None) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for a chat: history after last_event_id, then live
+        events, with heartbeat comments while idle. Ends after done.
+        """
+        channel = self._channel(chat_id)
+        subscriber = _Subscriber(queue=asyncio.Queue(maxsize=self.settings.queue_size))
+        channel.subscribers.add(subscriber)
+        try:
+            if initial is not None and not last_event_id:
+                # Not stored in the history: it describes the task, not this run
+                yield format_sse(0, initial[0], initial[1])
+            for event_id, event, frame in list(channel.history):
+                if event_id > last_event_id:
+                    last_event_id = event_id
+                    yield frame
+                    if event == "done":
+                        return
+            while not subscriber.lagged:
+                try:
+                    event_id, event, frame = await asyncio.wait_for(
+                        subscriber.queue.get(), self.settings.heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event_id <= last_event_id:
+                    continue
+                last_event_id = event_id
+                yield frame
+                if event == "done":
+                    return
+            # Lagged: the client reconnects with Last-Event-ID and replays from history
+        finally:
+            channel.subscribers.discard(subscriber)
+            channel.touched_at = time.monotonic()
+
+
+@lru_cache(maxsize=1)
+def get_event_broadcaster() -> EventBroadcaster:
+    """Return the process-wide broadcaster."""
+    return EventBroadcaster(EventSettings.from_env())
+
+
+async def run_graph_with_events(agent, graph_input, config: Dict[str, Any], chat_id: str) -> Dict[str, Any]:
+    """
+    Run a compiled graph like ainvoke(), publishing progress for chat_id.
+
+    Returns the graph's final state (the root run's output).
+    """
+    broadcaster = get_event_broadcaster()
+    final_state: Dict[str, Any] = {}
+    async for event in agent.astream_events(graph_input, config, version="v2"):
+        kind = event["event"]
+        name = event["name"]
+        node = event["metadata"].get("langgraph_node")
+        if not event["parent_ids"]:
+            if kind == "on_chain_end":
+                final_state = event["data"].get("output") or {}
+            continue
+        if kind == "on_chat_model_stream" and node == REPORT_NODE:
+            chunk = event["data"].get("chunk")
+            text = getattr(chunk, "content", "")
+            if isinstance(text, str) and text:
+                broadcaster.publish(chat_id, "token", {"text": text})
+        elif kind in ("on_chain_start", "on_chain_end"):
+            phase = "start" if kind == "on_chain_start" else "end"
+            if name == RESEARCHER_GRAPH:
+                data = {"id": event["run_id"], "phase": phase}
+                if phase == "start":
+                    data["topic"] = (event["data"].get("input") or {}).get("research_topic", "")
+                broadcaster.publish(chat_id, "researcher", data)
+            elif name == node:
+                broadcaster.publish(chat_id, "node", {"node": node, "phase": phase})
+                if phase == "end" and node == REPORT_NODE:
+                    output = event["data"].get("output") or {}
+                    broadcaster.publish(chat_id, "report", {"content": output.get("final_report", "")})
+    return final_state
@@ -0,0 +1,109 @@
+"""
+Cross-process delivery of research events over Postgres LISTEN/NOTIFY.
+
+With RESEARCH_EXECUTOR=queue the graph runs in a worker process, while
+the SSE watchers are connected to an API process. The worker's
+broadcaster forwards each open/publish call to an EventRelay, which sends
+it as a NOTIFY on research_events. Every API process listens on that
+channel (run_event_listener) and replays the events into its own
+broadcaster, which serves them to its watchers as usual.
+
+NOTIFY payloads are limited to 8000 bytes. Larger events (normally the
+complete `report`) are relayed as {"truncated": true}. Clients have
+already received the report as tokens, and can read it from GET
+/chat/{chat_id}.
+"""
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from backend.services.event_broadcaster import EventBroadcaster
+from backend.services.job_queue import listen_notifications
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "research_events"
+MAX_PAYLOAD_BYTES = 7500
+
+
+class EventRelay:
+    """Sends broadcaster events as NOTIFYs in order, batching what accumulates between sends."""
+
+    def __init__(self, pool, max_backlog: int = 10000, batch_size: int = 100):
+        self.pool = pool
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_backlog)
+        self._sender: Optional[asyncio.Task] = None
+        # Postgres folds identical payloads sent in one transaction; the sequence keeps them distinct
+        self._seq = itertools.count(1)
+
+    def attach(self, broadcaster: EventBroadcaster):
+        broadcaster.forward = self.send
+
+    def send(self, chat_id: str, event: str, data: Dict[str, Any]):
+        payload = json.dumps({"seq": next(self._seq), "chat_id": chat_id, "event": event, "data": data}, default=str)
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"seq": next(self._seq), "chat_id": chat_id, "event": event, "data": {"truncated": True}})
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning(f"Event relay backlog full; dropping {event} event for chat {chat_id}")
+
+    def start(self):
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_loop(), name="event-relay")
+
+    async def stop(self, timeout: float = 10.0):
+        """Send what is queued (up to timeout), then stop."""
+        if self._sender is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Event relay shutdown timed out with {self._queue.qsize()} events unsent")
+        self._sender.cancel()
+        try:
+            await self._sender
+        except asyncio.CancelledError:
+            pass
+        self._sender = None
+
+    async def _send_loop(self):
+        while True:
+            batch: List[str] = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                async with self.pool.connection() as conn:
+                    async with conn.cursor() as cur:
+                        # Pipelined: one round trip per batch, delivered in order
+                        await cur.executemany("SELECT pg_notify(%s, %s)", [(EVENTS_CHANNEL, p) for p in batch])
+            except Exception as e:
+                logger.error(f"Event relay dropped {len(batch)} events: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def apply_relayed_event(broadcaster: EventBroadcaster, payload: str):
+    """Replay one relayed event into a local broadcaster."""
+    message = json.loads(payload)
+    chat_id, event, data = message["chat_id"], message["event"], message["data"]
+    if event == "open":
+        broadcaster.open(chat_id)
+    elif event == "done":
+        broadcaster.close(chat_id, data.get("status", ""))
+    else:
+        broadcaster.publish(chat_id, event, data)
+
+
+async def run_event_listener(conninfo: str, broadcaster: EventBroadcaster):
+    """Feed events relayed by worker processes into this process's broadcaster (until cancelled)."""
+    def on_notify(channel: str, payload: str):
+        try:
+            apply_relayed_event(broadcaster, payload)
+        except Exception as e:
+            logger.error(f"Bad relayed event: {e}")
+
+    await listen_notifications(conninfo, [EVENTS_CHANNEL], on_notify)
@@ -0,0 +1,176 @@
+"""
+Background ingestion of final reports into vector memory.
+
+run_agent_workflow hands finished reports to IngestionQueue.submit() and
+marks the task COMPLETED straight away. A single consumer task drains the
+bounded backlog, splits reports into chunks, and writes chunks from several
+reports in one add_documents call, so they share an embedding request.
+Failed batches are retried with exponential backoff.
+
+Tuned with INGEST_MAX_BACKLOG, INGEST_BATCH_CHUNKS, INGEST_FLUSH_SECONDS,
+INGEST_MAX_RETRIES and INGEST_RETRY_BACKOFF.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+from langchain_core.documents import Document
+from src.data_retriever.vector_store import VectorStoreService, get_vector_store_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionStats:
+    submitted: int = 0
+    dropped: int = 0
+    ingested_documents: int = 0
+    ingested_chunks: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed_documents: int = 0
+
+
+@dataclass
+class IngestionSettings:
+    max_backlog: int = 1000
+    batch_chunks: int = 64
+    flush_seconds: float = 1.0
+    max_retries: int = 3
+    retry_backoff: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "IngestionSettings":
+        return cls(
+            max_backlog=int(os.getenv("INGEST_MAX_BACKLOG", cls.max_backlog)),
+            batch_chunks=int(os.getenv("INGEST_BATCH_CHUNKS", cls.batch_chunks)),
+            flush_seconds=float(os.getenv("INGEST_FLUSH_SECONDS", cls.flush_seconds)),
+            max_retries=int(os.getenv("INGEST_MAX_RETRIES", cls.max_retries)),
+            retry_backoff=float(os.getenv("INGEST_RETRY_BACKOFF", cls.retry_backoff)),
+        )
+
+
+class IngestionQueue:
+    """Bounded queue of reports with one batching consumer."""
+
+    def __init__(self, vector_store: VectorStoreService, settings: Optional[IngestionSettings] = None):
+        self.vector_store = vector_store
+        self.settings = settings or IngestionSettings()
+        self.stats = IngestionStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        # Reports taken off the queue for the batch being built or written
+        self._pending_documents = 0
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    def start(self):
+        """Start the consumer on the running event loop (idempotent)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.settings.max_backlog)
+        self._consumer = asyncio.create_task(self._consume(), name="vector-ingestion")
+
+    async def stop(self, timeout: float = 30.0):
+        """Flush what is queued (up to timeout), then stop the consumer."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Ingestion shutdown timed out with {self.backlog} reports still queued")
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        self._consumer = None
+
+    def submit(self, document: Document) -> bool:
+        """
+        Queue a report for ingestion without waiting for it.
+
+        Returns False (and drops the report from memory ingestion) when the
+        backlog is full; the report itself is already stored on the task.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            logger.warning(
+                f"Ingestion backlog full ({self.settings.max_backlog}); "
+                f"dropping report for chat {document.metadata.get('chat_id')}"
+            )
+            return False
+        self.stats.submitted += 1
+        return True
+
+    async def _next_batch(self) -> List[Document]:
+        """Wait for one report, then keep collecting until the batch fills or the flush window ends."""
+        documents = [await self._queue.get()]
+        self._pending_documents = 1
+        chunks = await asyncio.to_thread(self.vector_store.split, documents)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.flush_seconds
+        while len(chunks) < self.settings.batch_chunks:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                document = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            documents.append(document)
+            self._pending_documents += 1
+            chunks += await asyncio.to_thread(self.vector_store.split, [document])
+        return chunks
+
+    async def _write(self, chunks: List[Document]) -> bool:
+        for attempt in range(self.settings.max_retries + 1):
+            try:
+                await self.vector_store.aadd_chunks(chunks)
+                return True
+            except Exception as e:
+                if attempt == self.settings.max_retries:
+                    logger.error(f"Ingestion of {len(chunks)} chunks failed after {attempt + 1} attempts: {e}")
+                    return False
+                self.stats.retries += 1
+                delay = self.settings.retry_backoff * (2 ** attempt)
+                logger.warning(f"Ingestion attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        return False
+
+    async def _consume(self):
+        while True:
+            self._pending_documents = 0
+            try:
+                chunks = await self._next_batch()
+                if chunks and await self._write(chunks):
+                    self.stats.batches += 1
+                    self.stats.ingested_documents += self._pending_documents
+                    self.stats.ingested_chunks += len(chunks)
+                elif chunks:
+                    self.stats.failed_documents += self._pending_documents
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats.failed_documents += self._pending_documents
+                logger.error(f"Ingestion batch failed: {e}")
+            finally:
+                for _ in range(self._pending_documents):
+                    self._queue.task_done()
+
+
+@lru_cache(maxsize=1)
+def get_ingestion_queue() -> IngestionQueue:
+    """Return the process-wide ingestion queue."""
+    return IngestionQueue(get_vector_store_service(), IngestionSettings.from_env())
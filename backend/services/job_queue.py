@@ -0,0 +1,203 @@
+"""
+Durable research job queue on the backend's Postgres database.
+
+With RESEARCH_EXECUTOR=queue the API does not run research itself. When
+admission (backend/services/admission.py) starts a queued task, it inserts
+a research_jobs row in the same transaction that marks the task SEARCHING,
+and sends NOTIFY research_jobs.
+Worker processes (python -m backend.worker) claim the oldest queued job
+with one UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED), so any
+number of workers on any number of machines share the queue without
+handing out a job twice or waiting on each other's locks.
+
+Each worker runs up to WORKER_CONCURRENCY jobs at once. It wakes on the
+NOTIFY, and also polls every WORKER_POLL_SECONDS in case a notification
+was missed. The default executor (background) runs admitted research in
+the API process, as tasks of the run registry (backend/services/run_registry.py).
+"""
+import asyncio
+import datetime
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Awaitable, Callable, Iterable, List, Optional
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_session_context, ResearchJob, JobState, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+JOBS_CHANNEL = "research_jobs"
+# Payload: the chat id whose run should stop
+CANCEL_CHANNEL = "research_cancel"
+
+
+@dataclass
+class JobSettings:
+    executor: str = "background"  # "background" | "queue"
+    concurrency: int = 4
+    poll_seconds: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "JobSettings":
+        executor = os.getenv("RESEARCH_EXECUTOR", cls.executor).lower()
+        if executor not in ("background", "queue"):
+            raise ValueError(f"RESEARCH_EXECUTOR must be 'background' or 'queue', got {executor!r}")
+        return cls(
+            executor=executor,
+            concurrency=int(os.getenv("WORKER_CONCURRENCY", cls.concurrency)),
+            poll_seconds=float(os.getenv("WORKER_POLL_SECONDS", cls.poll_seconds)),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_job_settings() -> JobSettings:
+    return JobSettings.from_env()
+
+
+async def enqueue_research(db: AsyncSession, chat_id: str, research_brief: str, user_id: uuid.UUID,
+                           resume: bool = False) -> ResearchJob:
+    """
+    Add a queued job to the caller's transaction and wake the workers.
+
+    NOTIFY is transactional: workers hear it only when the caller commits,
+    by which time the job row is visible to them.
+    """
+    job = ResearchJob(thread_id=chat_id, user_id=user_id, research_brief=research_brief, resume=resume)
+    db.add(job)
+    await db.execute(text(f"NOTIFY {JOBS_CHANNEL}"))
+    return job
+
+
+async def cancel_jobs(db: AsyncSession, chat_id: str):
+    """
+    In the caller's transaction: drop the chat's queued jobs and tell the
+    worker running it, if any, to cancel the run (on commit).
+    """
+    await db.execute(
+        update(ResearchJob)
+        .where(ResearchJob.thread_id == chat_id, ResearchJob.state == JobState.QUEUED)
+        .values(state=JobState.CANCELLED, finished_at=datetime.datetime.utcnow())
+    )
+    await db.execute(text("SELECT pg_notify(:channel, :chat_id)"), {"channel": CANCEL_CHANNEL, "chat_id": chat_id})
+
+
+async def claim_job(worker_id: str) -> Optional[ResearchJob]:
+    """Mark the oldest queued job RUNNING for this worker and return it (None when the queue is empty)."""
+    # One statement: rows locked by another worker's claim are skipped, not waited on
+    next_job = (
+        select(ResearchJob.id)
+        .where(ResearchJob.state == JobState.QUEUED)
+        .order_by(ResearchJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    async with get_async_session_context() as db:
+        job = (await db.execute(
+            update(ResearchJob)
+            .where(ResearchJob.id == next_job, ResearchJob.state == JobState.QUEUED)
+            .values(
+                state=JobState.RUNNING,
+                attempts=ResearchJob.attempts + 1,
+                locked_by=worker_id,
+                locked_at=datetime.datetime.utcnow(),
+            )
+            .returning(ResearchJob)
+        )).scalar_one_or_none()
+        await db.commit()
+        return job
+
+
+async def finish_job(job_id: int, state: JobState, error: Optional[str] = None):
+    async with get_async_session_context() as db:
+        job = await db.get(ResearchJob, job_id)
+        if job is None:
+            return
+        job.state = state
+        job.error = error
+        job.finished_at = datetime.datetime.utcnow()
+        await db.commit()
+
+
+async def listen_notifications(conninfo: str, channels: Iterable[str],
+                               on_notify: Callable[[str, str], None], retry_seconds: float = 5.0):
+    """
+    LISTEN on channels over a dedicated connection, calling on_notify(channel, payload).
+
+    Runs until cancelled and reconnects after connection errors. The
+    connection is not taken from the pool: it stays checked out for good.
+    """
+    import psycopg
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                for channel in channels:
+                    await conn.execute(f"LISTEN {channel}")
+                async for notify in conn.notifies():
+                    on_notify(notify.channel, notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"LISTEN connection lost ({e}); reconnecting in {retry_seconds}s")
+            await asyncio.sleep(retry_seconds)
+
+
+class ResearchWorker:
+    """Claims research jobs and runs up to `concurrency` of them at a time."""
+
+    def __init__(self, run_job: Callable[[ResearchJob], Awaitable[TaskStatus]],
+                 settings: Optional[JobSettings] = None, worker_id: Optional[str] = None):
+        self.run_job = run_job
+        self.settings = settings or JobSettings()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def wake(self, *_):
+        self._wake.set()
+
+    def stop(self):
+        """Stop claiming jobs; runs in progress finish first."""
+        self._stopping = True
+        self._wake.set()
+
+    async def run(self):
+        slots: List[asyncio.Task] = [
+            asyncio.create_task(self._slot(), name=f"research-worker-{i}")
+            for i in range(self.settings.concurrency)
+        ]
+        await asyncio.gather(*slots)
+
+    async def _slot(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                job = await claim_job(self.worker_id)
+            except Exception as e:
+                logger.error(f"Claiming a research job failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.settings.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            logger.info(f"Worker {self.worker_id} claimed job {job.id} for chat {job.thread_id}")
+            state, error = JobState.FAILED, None
+            try:
+                final_status = await self.run_job(job)
+                if final_status == TaskStatus.COMPLETED:
+                    state = JobState.DONE
+                elif final_status == TaskStatus.CANCELLED:
+                    state = JobState.CANCELLED
+            except Exception as e:
+                logger.error(f"Research job {job.id} crashed: {e}")
+                error = str(e)
+            try:
+                await finish_job(job.id, state, error)
+            except Exception as e:
+                logger.error(f"Could not record the end of research job {job.id}: {e}")
@@ -0,0 +1,22 @@
+import asyncio
+import logging
+from src.data_retriever.vector_store import VectorStoreService
+logger = logging.getLogger(__name__)
+
+
+async def run_compaction_loop(vector_store: VectorStoreService):
+    """
+    Periodically compact research memory (see VectorStoreService.compact).
+
+    Runs every compaction_interval_hours until cancelled; 0 disables it.
+    """
+    interval = vector_store.settings.compaction_interval_hours * 3600
+    if interval <= 0:
+        return
+    while True:
+        try:
+            stats = await vector_store.acompact()
+            logger.info(f"Memory compaction: {stats}")
+        except Exception as e:
+            logger.error(f"Memory compaction failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,223 @@
+"""
+Reuse of research across chats that ask for the same brief.
+
+Briefs are compared by brief_hash(): a SHA-256 of the brief, lowercased,
+whitespace-collapsed and without trailing punctuation, stored on
+ResearchTask.brief_hash. When a chat produces a brief:
+
+  * a task with the same hash that COMPLETED within REPORT_CACHE_TTL_SECONDS
+    supplies its final_report straight away, without running the graph;
+  * otherwise, if a task with the same hash is being researched, the new
+    task becomes its follower (ResearchTask.coalesced_with) instead of
+    starting a run. When the leader's run ends, settle_followers() hands
+    them its report (or its failure). If the leader is cancelled, its
+    oldest follower runs the research for the others.
+
+Submissions of one brief are serialized, so two chats never both become
+its leader: by submission_lock(brief_hash) within a process, and on
+Postgres by an advisory lock on the brief hash (lock_brief()) held until
+the submission's transaction commits, across API replicas. Submissions of
+different briefs do not wait for each other.
+
+The lookups match across users unless COALESCE_ACROSS_USERS=0.
+RESEARCH_COALESCING=0 turns both off. A follower whose leader disappears
+(deleted chat, lost process) is picked up by the run-recovery sweep,
+which then researches it on its own.
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import re
+import uuid
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from langchain_core.messages import AIMessage
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import engine, get_async_session_context, ResearchTask, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = (TaskStatus.SEARCHING, TaskStatus.SUMMARIZING)
+# A leader may still wait in the admission queue
+LEADING = (TaskStatus.QUEUED,) + IN_PROGRESS
+
+
+@dataclass
+class CoalescingSettings:
+    enabled: bool = True
+    report_ttl_seconds: float = 86400.0
+    across_users: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CoalescingSettings":
+        return cls(
+            enabled=os.getenv("RESEARCH_COALESCING", "1") == "1",
+            report_ttl_seconds=float(os.getenv("REPORT_CACHE_TTL_SECONDS", cls.report_ttl_seconds)),
+            across_users=os.getenv("COALESCE_ACROSS_USERS", "1") == "1",
+        )
+
+
+@lru_cache(maxsize=1)
+def get_coalescing_settings() -> CoalescingSettings:
+    return CoalescingSettings.from_env()
+
+
+# Per-key locks, dropped by the dictionary once no submission holds or waits for them
+_submission_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def submission_lock(key: str) -> asyncio.Lock:
+    """
+    In-process lock for one brief hash (or other submission key).
+
+    Serializes "is anyone researching this brief?" with becoming the one who
+    is, without making unrelated submissions wait.
+    """
+    lock = _submission_locks.get(key)
+    if lock is None:
+        lock = _submission_locks[key] = asyncio.Lock()
+    return lock
+
+# First key of the two-key pg_advisory_xact_lock, apart from admission's single-key lock
+BRIEF_LOCK_NAMESPACE = 0x42524946  # "BRIF"
+
+
+async def lock_brief(db: AsyncSession, digest: str):
+    """Serialize submissions of one brief across processes until db's transaction ends (Postgres only)."""
+    if engine.dialect.name == "postgresql":
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:digest))"),
+            {"namespace": BRIEF_LOCK_NAMESPACE, "digest": digest},
+        )
+
+
+def brief_hash(research_brief: str) -> str:
+    normalized = re.sub(r"\s+", " ", research_brief).strip().rstrip(".!?;: ").lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _visible_to(query, user_id: uuid.UUID):
+    if get_coalescing_settings().across_users:
+        return query
+    return query.where(ResearchTask.user_id == user_id)
+
+
+async def find_cached_report(db: AsyncSession, digest: str, user_id: uuid.UUID) -> Optional[str]:
+    """The newest report for this brief completed within the TTL, if any."""
+    settings = get_coalescing_settings()
+    if not settings.enabled or settings.report_ttl_seconds <= 0:
+        return None
+    fresh_after = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.report_ttl_seconds)
+    query = (
+        select(ResearchTask.final_report)
+        .where(
+            ResearchTask.brief_hash == digest,
+            ResearchTask.status == TaskStatus.COMPLETED,
+            ResearchTask.final_report.is_not(None),
+            ResearchTask.final_report != "",
+            ResearchTask.updated_at >= fresh_after,
+        )
+        .order_by(ResearchTask.updated_at.desc())
+        .limit(1)
+    )
+    return (await db.execute(_visible_to(query, user_id))).scalar_one_or_none()
+
+
+async def find_leader(db: AsyncSession, digest: str, chat_id: str, user_id: uuid.UUID) -> Optional[str]:
+    """Thread id of a run already researching this brief, if any."""
+    if not get_coalescing_settings().enabled:
+        return None
+    query = (
+        select(ResearchTask.thread_id)
+        .where(
+            ResearchTask.brief_hash == digest,
+            ResearchTask.status.in_(LEADING),
+            ResearchTask.coalesced_with.is_(None),
+            ResearchTask.thread_id != chat_id,
+        )
+        .order_by(ResearchTask.created_at)
+        .limit(1)
+    )
+    return (await db.execute(_visible_to(query, user_id))).scalar_one_or_none()
+
+
+async def attach_report(thread_id: str, report: str):
+    """Append a report to a thread's conversation as if its own graph had written it."""
+    from src.agents.graph_registry import get_deep_research_agent
+    await get_deep_research_agent().aupdate_state(
+        {"configurable": {"thread_id": thread_id}},
+        {"messages": [AIMessage(content=report)], "final_report": report},
+        as_node="final_report_generation",
+    )
+
+
+async def promote_follower(db: AsyncSession, leader_thread_id: str):
+    """A cancelled leader's followers still want the research: the oldest one runs it for the rest."""
+    from backend.services.admission import dispatch_queued
+    successor = (await db.execute(
+        select(ResearchTask.thread_id, ResearchTask.research_brief, ResearchTask.user_id)
+        .where(ResearchTask.coalesced_with == leader_thread_id, ResearchTask.status.in_(IN_PROGRESS))
+        .order_by(ResearchTask.created_at)
+        .limit(1)
+    )).first()
+    if successor is None:
+        return
+    await db.execute(
+        update(ResearchTask)
+        .where(ResearchTask.coalesced_with == leader_thread_id, ResearchTask.thread_id != successor.thread_id)
+        .values(coalesced_with=successor.thread_id)
+    )
+    await db.execute(
+        update(ResearchTask)
+        .where(ResearchTask.thread_id == successor.thread_id)
+        # Through the admission queue, like any other run
+        .values(status=TaskStatus.QUEUED, coalesced_with=None, heartbeat_at=None,
+                queued_at=datetime.datetime.utcnow())
+    )
+    await db.commit()
+    await dispatch_queued()
+    logger.info(f"{successor.thread_id} takes over the cancelled research of {leader_thread_id}")
+
+
+async def settle_followers(leader_thread_id: str, status: TaskStatus, report: str):
+    """Give the tasks waiting on a leader's run its outcome, and tell their SSE watchers."""
+    from backend.services.event_broadcaster import get_event_broadcaster
+    async with get_async_session_context() as db:
+        if status == TaskStatus.CANCELLED:
+            await promote_follower(db, leader_thread_id)
+            return
+        followers = (await db.execute(
+            select(ResearchTask.thread_id).where(
+                ResearchTask.coalesced_with == leader_thread_id,
+                ResearchTask.status.in_(IN_PROGRESS),
+            )
+        )).scalars().all()
+        if not followers:
+            return
+        completed = status == TaskStatus.COMPLETED and bool(report)
+        events = get_event_broadcaster()
+        for thread_id in followers:
+            final_status = TaskStatus.FAILED
+            try:
+                if completed:
+                    await attach_report(thread_id, report)
+                    final_status = TaskStatus.COMPLETED
+            except Exception as e:
+                logger.error(f"Could not hand the report of {leader_thread_id} to {thread_id}: {e}")
+            await db.execute(
+                update(ResearchTask)
+                .where(ResearchTask.thread_id == thread_id, ResearchTask.coalesced_with == leader_thread_id)
+                .values(status=final_status, final_report=report if completed else None, coalesced_with=None)
+            )
+            await db.commit()
+            events.open(thread_id)
+            if completed:
+                events.publish(thread_id, "report", {"content": report})
+            events.publish(thread_id, "status", {"status": final_status.value})
+            events.close(thread_id, final_status.value)
+        logger.info(f"Settled {len(followers)} chats coalesced with {leader_thread_id}: {status.value}")
@@ -0,0 +1,171 @@
+"""
+Recovery of research runs lost with the process that was running them.
+
+While run_agent_workflow runs, it refreshes ResearchTask.heartbeat_at
+every RECOVERY_HEARTBEAT_SECONDS. A SEARCHING or SUMMARIZING task whose
+heartbeat (or last update, for tasks that never had one) is older than
+RECOVERY_STALE_SECONDS lost its process. The sweep claims such a task by
+a compare-and-set on heartbeat_at, so only one of several API processes
+picks it up. It then resumes the graph from the thread's latest
+checkpoint with ainvoke(None, config). Supervisor rounds and researcher
+results that were already checkpointed are not recomputed.
+
+The sweep runs at start-up and then every RECOVERY_INTERVAL_SECONDS (0
+disables it). With RESEARCH_EXECUTOR=queue it enqueues a resume job for
+the workers; otherwise it resumes the run in this process. A task that
+was resumed RECOVERY_MAX_RESUMES times is marked FAILED instead.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from sqlalchemy import and_, exists, func, select, update
+from sqlalchemy.orm import aliased
+from backend.db import get_async_session_context, ResearchTask, ResearchJob, JobState, TaskStatus
+from backend.services.job_queue import get_job_settings, enqueue_research
+from backend.services.run_registry import get_run_registry
+from backend.services.admission import dispatch_queued
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = (TaskStatus.SEARCHING, TaskStatus.SUMMARIZING)
+
+
+@dataclass
+class RecoverySettings:
+    heartbeat_seconds: float = 30.0
+    stale_seconds: float = 180.0
+    interval_seconds: float = 60.0
+    max_resumes: int = 3
+
+    @classmethod
+    def from_env(cls) -> "RecoverySettings":
+        return cls(
+            heartbeat_seconds=float(os.getenv("RECOVERY_HEARTBEAT_SECONDS", cls.heartbeat_seconds)),
+            stale_seconds=float(os.getenv("RECOVERY_STALE_SECONDS", cls.stale_seconds)),
+            interval_seconds=float(os.getenv("RECOVERY_INTERVAL_SECONDS", cls.interval_seconds)),
+            max_resumes=int(os.getenv("RECOVERY_MAX_RESUMES", cls.max_resumes)),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_recovery_settings() -> RecoverySettings:
+    return RecoverySettings.from_env()
+
+
+async def beat(thread_id: str) -> bool:
+    """Refresh the heartbeat; False when the task was cancelled or deleted meanwhile."""
+    async with get_async_session_context() as db:
+        result = await db.execute(
+            update(ResearchTask)
+            .where(ResearchTask.thread_id == thread_id, ResearchTask.status != TaskStatus.CANCELLED)
+            # Keep updated_at: it orders the history list, and a heartbeat is not an edit
+            .values(heartbeat_at=datetime.datetime.utcnow(), updated_at=ResearchTask.updated_at)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+async def run_heartbeat(thread_id: str):
+    """Refresh the task's heartbeat until cancelled; stops the run when its task is gone."""
+    interval = get_recovery_settings().heartbeat_seconds
+    while True:
+        try:
+            if not await beat(thread_id):
+                # Cancelled from another process (or the chat was deleted)
+                get_run_registry().cancel(thread_id)
+                return
+        except Exception as e:
+            logger.error(f"Heartbeat for {thread_id} failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def recover_stale_runs() -> int:
+    """Resume every in-progress task whose run stopped heart-beating; returns how many were taken over."""
+    from backend.services.background_worker import run_agent_workflow
+    settings = get_recovery_settings()
+    now = datetime.datetime.utcnow()
+    cutoff = now - datetime.timedelta(seconds=settings.stale_seconds)
+    last_seen = func.coalesce(ResearchTask.heartbeat_at, ResearchTask.updated_at)
+    queued = exists().where(and_(ResearchJob.thread_id == ResearchTask.thread_id, ResearchJob.state == JobState.QUEUED))
+    leader = aliased(ResearchTask)
+    leader_running = exists().where(and_(
+        leader.thread_id == ResearchTask.coalesced_with,
+        leader.status.in_((TaskStatus.QUEUED,) + IN_PROGRESS),
+    ))
+    queue_mode = get_job_settings().executor == "queue"
+
+    recovered = 0
+    async with get_async_session_context() as db:
+        stale = (await db.execute(
+            select(ResearchTask.id, ResearchTask.thread_id, ResearchTask.user_id,
+                   ResearchTask.research_brief, ResearchTask.resume_count)
+            # Tasks waiting in the job queue, or on another chat's run of the same brief,
+            # have no heartbeat of their own
+            .where(ResearchTask.status.in_(IN_PROGRESS), last_seen < cutoff, ~queued, ~leader_running)
+        )).all()
+
+        for task in stale:
+            claim = await db.execute(
+                update(ResearchTask)
+                .where(ResearchTask.id == task.id, ResearchTask.status.in_(IN_PROGRESS), last_seen < cutoff)
+                # A follower whose leader is gone runs the research itself
+                .values(heartbeat_at=now, resume_count=ResearchTask.resume_count + 1,
+                        coalesced_with=None, updated_at=ResearchTask.updated_at)
+            )
+            await db.commit()
+            if claim.rowcount != 1:
+                # Another process took it over, or the run came back to life
+                continue
+
+            if not task.research_brief or task.resume_count >= settings.max_resumes:
+                reason = f"after {task.resume_count} resumes" if task.research_brief else "(no stored brief)"
+                logger.error(f"Giving up on interrupted research for {task.thread_id} {reason}")
+                await db.execute(
+                    update(ResearchTask).where(ResearchTask.id == task.id).values(status=TaskStatus.FAILED)
+                )
+                await db.commit()
+                continue
+
+            logger.warning(f"Resuming interrupted research for {task.thread_id} from its last checkpoint")
+            recovered += 1
+            if queue_mode:
+                await db.execute(
+                    update(ResearchJob)
+                    .where(ResearchJob.thread_id == task.thread_id, ResearchJob.state == JobState.RUNNING)
+                    .values(state=JobState.FAILED, error="worker lost", finished_at=now)
+                )
+                await enqueue_research(db, task.thread_id, task.research_brief, task.user_id, resume=True)
+                await db.commit()
+            else:
+                get_run_registry().spawn(
+                    run_agent_workflow(task.thread_id, task.research_brief, task.user_id, resume=True)
+                )
+    return recovered
+
+
+async def run_recovery_loop():
+    """
+    Sweep for interrupted runs at start-up, then every interval_seconds,
+    and start queued runs that have a free slot.
+
+    Runs until cancelled; an interval of 0 disables it.
+    """
+    interval = get_recovery_settings().interval_seconds
+    if interval <= 0:
+        return
+    while True:
+        try:
+            recovered = await recover_stale_runs()
+            if recovered:
+                logger.info(f"Run recovery: resumed {recovered} interrupted research runs")
+        except Exception as e:
+            logger.error(f"Run recovery failed: {e}")
+        try:
+            # Queued tasks whose dispatcher was lost, or slots freed by runs that died
+            await dispatch_queued()
+        except Exception as e:
+            logger.error(f"Admission dispatch failed: {e}")
+        await asyncio.sleep(interval)
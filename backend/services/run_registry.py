@@ -0,0 +1,76 @@
+"""
+Registry of the research runs executing in this process.
+
+run_agent_workflow executes the graph through RunRegistry.run(), which
+runs it as a separate asyncio task registered under the chat id.
+cancel() cancels that task. The CancelledError is raised at the graph's
+current await, and asyncio propagates it into the supervisor's researcher
+fan-out (asyncio.gather) and the researchers' pending model and tool
+calls. Every node that calls a model or the search API is a coroutine
+on the async clients, so the in-flight HTTP requests are abandoned
+rather than left running in executor threads. run() then raises RunCancelled, so the caller can record the
+run as CANCELLED. Cancelling the caller itself (shutdown) still raises
+CancelledError, and run recovery picks the run up later.
+
+Runs in other processes are reached through the database. The
+cancel endpoint marks the task CANCELLED, and the run's heartbeat
+(run_recovery.py) notices within RECOVERY_HEARTBEAT_SECONDS. Queue workers
+also get a NOTIFY on research_cancel and stop at once.
+"""
+import asyncio
+from functools import lru_cache
+from typing import Any, Coroutine, Dict, Optional, Set
+
+
+class RunCancelled(Exception):
+    """The run was cancelled through RunRegistry.cancel()."""
+
+
+class RunRegistry:
+    """chat id -> the asyncio task running its graph; used from the event loop only."""
+
+    def __init__(self):
+        self._runs: Dict[str, asyncio.Task] = {}
+        # Runs started outside a request (recovery, follower promotion), referenced until done
+        self._spawned: Set[asyncio.Task] = set()
+
+    async def run(self, chat_id: str, coro: Coroutine) -> Any:
+        """Await coro as the chat's cancellable run."""
+        task = asyncio.create_task(coro, name=f"research-{chat_id}")
+        self._runs[chat_id] = task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The caller is being cancelled (shutdown): take the run down with it
+                task.cancel()
+                raise
+            raise RunCancelled(chat_id) from None
+        finally:
+            if self._runs.get(chat_id) is task:
+                del self._runs[chat_id]
+
+    def is_running(self, chat_id: str) -> bool:
+        task = self._runs.get(chat_id)
+        return task is not None and not task.done()
+
+    def cancel(self, chat_id: str) -> bool:
+        """Cancel the chat's run if it executes in this process; True when there was one."""
+        task = self._runs.get(chat_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """Start a run in the background, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro, name=name)
+        self._spawned.add(task)
+        task.add_done_callback(self._spawned.discard)
+        return task
+
+
+@lru_cache(maxsize=1)
+def get_run_registry() -> RunRegistry:
+    """Return the process-wide registry."""
+    return RunRegistry()
@@ -0,0 +1,33 @@
+import logging
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import ResearchTask, ResearchTaskUsage
+from src.handlers.usage_handler import UsageCallbackHandler
+logger = logging.getLogger(__name__)
+
+
+async def save_usage(db: AsyncSession, chat_id: str, handler: UsageCallbackHandler) -> int:
+    """
+    Persist the records collected by a UsageCallbackHandler next to the ResearchTask.
+
+    Returns the number of rows written. Records are dropped (with a warning) if the
+    task no longer exists, e.g. because the chat was deleted mid-run.
+    """
+    records = handler.drain()
+    if not records:
+        return 0
+
+    result = await db.execute(select(ResearchTask.id).where(ResearchTask.thread_id == chat_id))
+    task_id = result.scalar_one_or_none()
+    if task_id is None:
+        logger.warning(f"Dropping {len(records)} usage records for missing task {chat_id}")
+        return 0
+
+    db.add_all([
+        ResearchTaskUsage(task_id=task_id, thread_id=chat_id, **{
+            k: v for k, v in record.to_dict().items() if k != "chat_id"
+        })
+        for record in records
+    ])
+    await db.commit()
+    return len(records)
@@ -0,0 +1,103 @@
+"""
+Standalone research worker: python -m backend.worker [--concurrency N]
+
+Claims jobs that the API enqueued (RESEARCH_EXECUTOR=queue) from the
+research_jobs table and runs the deep research graph for them. Start as
+many worker processes, on as many machines, as research throughput needs.
+They share the API's Postgres database and checkpointer tables, and its
+research memory only through VECTOR_STORE_PROVIDER=pgvector: a Chroma
+directory is local to one machine, so the worker refuses to start without
+pgvector. Progress events reach the API's SSE watchers via LISTEN/NOTIFY
+(backend/services/event_relay.py).
+
+SIGTERM or Ctrl+C stops claiming new jobs and lets running ones finish.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from dotenv import load_dotenv
+load_dotenv()
+
+from backend.db import create_db_and_tables, ResearchJob, TaskStatus
+from backend.services.background_worker import run_agent_workflow
+from backend.services.event_broadcaster import get_event_broadcaster
+from backend.services.event_relay import EventRelay
+from backend.services.ingestion_queue import get_ingestion_queue
+from backend.services.job_queue import JOBS_CHANNEL, CANCEL_CHANNEL, JobSettings, ResearchWorker, listen_notifications
+from backend.services.run_registry import get_run_registry
+from src.agents.checkpointing import DATABASE_URL, USE_POSTGRES, connection_pool, setup_checkpointer
+from src.agents.graph_registry import compile_graphs
+from src.data_retriever.vector_store import get_vector_store_service
+
+logger = logging.getLogger(__name__)
+
+
+async def run_job(job: ResearchJob) -> TaskStatus:
+    return await run_agent_workflow(job.thread_id, job.research_brief, job.user_id, resume=job.resume)
+
+
+async def main(settings: JobSettings):
+    if not USE_POSTGRES:
+        raise RuntimeError("The research worker requires a PostgreSQL DATABASE_URL")
+    vector_store = get_vector_store_service()
+    if vector_store.settings.provider != "pgvector":
+        raise RuntimeError("The research worker requires VECTOR_STORE_PROVIDER=pgvector to share research memory with the API")
+
+    await create_db_and_tables()
+    await connection_pool.open()
+    await setup_checkpointer()
+    await vector_store.aopen()
+    ingestion_queue = get_ingestion_queue()
+    ingestion_queue.start()
+    await asyncio.to_thread(compile_graphs)
+
+    relay = EventRelay(connection_pool)
+    relay.attach(get_event_broadcaster())
+    relay.start()
+
+    worker = ResearchWorker(run_job, settings)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            # Windows: Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    def on_notify(channel: str, payload: str):
+        if channel == CANCEL_CHANNEL:
+            # Only the worker running this chat has it registered
+            get_run_registry().cancel(payload)
+        else:
+            worker.wake()
+
+    listener = asyncio.create_task(listen_notifications(DATABASE_URL, [JOBS_CHANNEL, CANCEL_CHANNEL], on_notify))
+    print(f"✅ Research worker {worker.worker_id} running {settings.concurrency} jobs at a time", flush=True)
+
+    try:
+        await worker.run()
+    finally:
+        listener.cancel()
+        await ingestion_queue.stop()
+        await relay.stop()
+        vector_store.close()
+        await connection_pool.close()
+
+
+def parse_args(argv=None) -> JobSettings:
+    settings = JobSettings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.concurrency,
+                        help="Research runs per process (WORKER_CONCURRENCY)")
+    parser.add_argument("--poll-seconds", type=float, default=settings.poll_seconds,
+                        help="Queue poll interval when no NOTIFY arrives (WORKER_POLL_SECONDS)")
+    args = parser.parse_args(argv)
+    settings.concurrency = args.concurrency
+    settings.poll_seconds = args.poll_seconds
+    return settings
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,105 @@
+"""
+Import-time budget check for the backend.
+
+Imports backend.app in fresh interpreters under ``python -X importtime``,
+takes the median cumulative import time of the top-level module and fails
+(exit code 1) when it exceeds the budget. The slowest modules of the median
+run are listed so a regression points straight at its cause.
+
+Usage:
+    python -m benchmarks.import_budget --budget-ms 1500 --runs 5
+    IMPORT_BUDGET_MS=2500 python -m benchmarks.import_budget --module backend.app
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGET_MS = 1500
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, float, float]]:
+    """Return (module, self_ms, cumulative_ms) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure_once(module: str, workdir: Path) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{workdir / 'import_budget.db'}")
+    env.setdefault("SECRET", "import-budget")
+    env.setdefault("DEEPSEEK_API_KEY", "import-budget")
+    env.setdefault("GOOGLE_API_KEY", "import-budget")
+    env.setdefault("TAVILY_API_KEY", "import-budget")
+    env["PYTHONPATH"] = str(REPO_ROOT)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    rows = _parse_importtime(completed.stderr)
+    total = next((cumulative for name, _, cumulative in reversed(rows) if name == module), 0.0)
+    return {"total_ms": total, "rows": rows}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="import-budget-") as workdir:
+        runs = [measure_once(args.module, Path(workdir)) for _ in range(args.runs)]
+    runs.sort(key=lambda r: r["total_ms"])
+    median_run = runs[len(runs) // 2]
+    offenders = sorted(median_run["rows"], key=lambda row: row[1], reverse=True)[:args.top]
+    median_ms = statistics.median(r["total_ms"] for r in runs)
+    return {
+        "benchmark": "import_budget",
+        "module": args.module,
+        "runs_ms": [r["total_ms"] for r in runs],
+        "median_ms": median_ms,
+        "budget_ms": args.budget_ms,
+        "within_budget": median_ms <= args.budget_ms,
+        "top_self_ms": [{"module": name, "self_ms": s, "cumulative_ms": c} for name, s, c in offenders],
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.app", help="Module whose import is measured")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                        help="Maximum median import time (default: IMPORT_BUDGET_MS or %(default)s)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to sample")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    for item in report["top_self_ms"]:
+        print(f"{item['self_ms']:9.1f}ms self {item['cumulative_ms']:9.1f}ms cum  {item['module']}", file=sys.stderr)
+    verdict = "OK" if report["within_budget"] else "OVER BUDGET"
+    print(f"{args.module}: median {report['median_ms']:.0f}ms / budget {args.budget_ms:.0f}ms -> {verdict}",
+          file=sys.stderr)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Offline benchmark for research-memory retrieval.
+
+Builds a synthetic corpus of research-report chunks, grouped by topic, and
+embeds it on the CPU (EMBEDDING_PROVIDER=local unless set). It ingests the
+corpus into a fresh store per size level and runs topic briefs through
+retrieve_data_with_score. Half the briefs are about stored topics, half
+about held-out ones. Per level it reports:
+  * ingestion throughput (chunks/s through VectorStoreService.add_chunks)
+  * query latency of the retriever tool (p50/p99/max)
+  * recall@k: the share of a topic's chunks among the top-k candidates
+  * threshold precision/recall for needs_research at score_threshold, and
+    a sweep over other thresholds, plus the best-distance distribution for
+    stored vs. held-out topics
+  * the retriever's actual decision (score_threshold plus lexically confirmed
+    hits up to lexical_threshold): precision/recall and the share of briefs
+    sent to research, next to the vector threshold alone
+
+Store settings come from config/vector_store_config.yaml and the usual
+environment overrides (HYBRID_SEARCH, HOT_TIER_CAPACITY, MEMORY_DEDUP_POLICY, ...).
+
+Usage:
+    python -m benchmarks.retrieval_bench --sizes 1000,10000,100000 --queries 200 --output retrieval.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+# Only local embedding providers (local, stub) keep the benchmark offline
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("LLM_CASSETTE_MODE", "off")
+os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("TAVILY_API_KEY", "bench")
+
+from langchain_core.documents import Document
+
+CHUNKS_PER_TOPIC = 50
+TERMS_PER_TOPIC = 12
+SWEEP_THRESHOLDS = (0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, 0.6)
+GENERAL_WORDS = (
+    "analysis market report growth study results data performance cost efficiency trend adoption "
+    "industry technology supply demand research evidence source review forecast capacity risk policy "
+    "investment production comparison benchmark quality standard region segment share outlook impact"
+).split()
+BRIEF_TEMPLATES = (
+    "Research the latest developments in {terms}",
+    "Compare findings on {terms} across recent sources",
+    "What is known about {terms}?",
+    "Provide an overview of {terms} and their impact",
+)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _word(rng: random.Random) -> str:
+    syllables = ("ka", "lo", "mi", "ter", "zon", "ra", "vel", "qui", "dor", "fen", "sa", "tri", "bo", "nex")
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+
+def _topic_terms(rng: random.Random) -> List[str]:
+    # Domain words plus one product/version-style name, the kind of term hybrid search targets
+    terms = [_word(rng) for _ in range(TERMS_PER_TOPIC - 1)]
+    terms.append(f"{_word(rng)}-{rng.randint(1, 9)}.{rng.randint(0, 9)}")
+    return terms
+
+
+def build_corpus(size: int, seed: int) -> Tuple[List[Document], List[List[str]], List[List[str]]]:
+    """Return (chunks, stored topic terms, held-out topic terms); chunk metadata carries the topic index."""
+    rng = random.Random(seed)
+    topics = max(1, size // CHUNKS_PER_TOPIC)
+    stored = [_topic_terms(rng) for _ in range(topics)]
+    held_out = [_topic_terms(rng) for _ in range(max(1, topics // 2))]
+    chunks = []
+    for i in range(size):
+        topic = i % topics
+        words = rng.sample(stored[topic], 8) + rng.choices(GENERAL_WORDS, k=30) + [_word(rng) for _ in range(20)]
+        rng.shuffle(words)
+        chunks.append(Document(
+            page_content=" ".join(words),
+            metadata={"chat_id": f"bench-{topic}", "topic": topic, "timestamp": "2025-01-01T00:00:00"},
+        ))
+    return chunks, stored, held_out
+
+
+def make_brief(rng: random.Random, terms: List[str]) -> str:
+    return rng.choice(BRIEF_TEMPLATES).format(terms=" ".join(rng.sample(terms, 5)))
+
+
+def run_level(size: int, queries: int, batch_size: int, seed: int) -> Dict[str, Any]:
+    from src.data_retriever.vector_store import get_vector_store_service
+    from src.data_retriever.output_retriever import retrieve_data_with_score
+
+    chunks, stored, held_out = build_corpus(size, seed)
+    topic_sizes: Dict[int, int] = {}
+    for chunk in chunks:
+        topic_sizes[chunk.metadata["topic"]] = topic_sizes.get(chunk.metadata["topic"], 0) + 1
+
+    workdir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    os.environ["VECTOR_DB_PATH"] = workdir
+    get_vector_store_service.cache_clear()
+    service = get_vector_store_service().open()
+    settings = service.settings
+    try:
+        started = time.perf_counter()
+        for start in range(0, len(chunks), batch_size):
+            service.add_chunks(chunks[start:start + batch_size])
+        ingest_seconds = time.perf_counter() - started
+        stored_chunks = service.collection.count()
+
+        rng = random.Random(seed + 1)
+        workload = []
+        for i in range(queries):
+            if i % 2 == 0:
+                topic = rng.randrange(len(stored))
+                workload.append((make_brief(rng, stored[topic]), topic))
+            else:
+                workload.append((make_brief(rng, rng.choice(held_out)), None))
+
+        latencies: List[float] = []
+        recalls: List[float] = []
+        best: List[Tuple[float, bool]] = []
+        decisions: List[Tuple[bool, bool]] = []
+        lexical_accepts = 0
+        for brief, topic in workload:
+            started = time.perf_counter()
+            result = retrieve_data_with_score.invoke({"research_brief": brief})
+            latencies.append((time.perf_counter() - started) * 1000)
+            best.append((float(result["best_score"]), topic is not None))
+            decisions.append((not result["needs_research"], topic is not None))
+            lexical_accepts += result.get("accepted_by") == "lexical"
+            if topic is not None:
+                _, candidates = service.search_candidates(brief)
+                top = candidates[:settings.top_k]
+                relevant = sum(1 for c in top if c.document.metadata.get("topic") == topic)
+                recalls.append(relevant / min(settings.top_k, topic_sizes[topic]))
+
+        def quality(hits: List[Tuple[bool, bool]]) -> Dict[str, float]:
+            tp = sum(1 for hit, positive in hits if hit and positive)
+            fp = sum(1 for hit, positive in hits if hit and not positive)
+            fn = sum(1 for hit, positive in hits if not hit and positive)
+            return {
+                "precision": tp / (tp + fp) if tp + fp else 1.0,
+                "recall": tp / (tp + fn) if tp + fn else 0.0,
+                "hit_rate": (tp + fp) / len(hits) if hits else 0.0,
+            }
+
+        def threshold_quality(threshold: float) -> Dict[str, float]:
+            return {"threshold": threshold, **quality([(score <= threshold, positive) for score, positive in best])}
+
+        decision = quality(decisions)
+        decision["research_rate"] = 1.0 - decision["hit_rate"]
+        decision["lexical_accepts"] = lexical_accepts
+
+        positive_scores = [score for score, positive in best if positive]
+        negative_scores = [score for score, positive in best if not positive]
+        return {
+            "chunks": size,
+            "stored_chunks": stored_chunks,
+            "topics": len(stored),
+            "ingest_seconds": ingest_seconds,
+            "ingest_chunks_per_second": size / ingest_seconds if ingest_seconds else 0.0,
+            "dedup_skipped": service.dedup_skipped,
+            "queries": len(workload),
+            "query_latency_ms": {
+                "p50": _percentile(latencies, 50),
+                "p99": _percentile(latencies, 99),
+                "max": max(latencies, default=0.0),
+            },
+            f"recall_at_{settings.top_k}": sum(recalls) / len(recalls) if recalls else 0.0,
+            "threshold": threshold_quality(settings.score_threshold),
+            "threshold_sweep": [threshold_quality(t) for t in SWEEP_THRESHOLDS],
+            "decision": decision,
+            "best_distance": {
+                label: {"p10": _percentile(scores, 10), "p50": _percentile(scores, 50), "p90": _percentile(scores, 90)}
+                for label, scores in (("stored_topics", positive_scores), ("held_out_topics", negative_scores))
+            },
+            "hot_tier": {"hits": service.hot_hits, "misses": service.hot_misses},
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    finally:
+        service.close()
+        get_vector_store_service.cache_clear()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.data_retriever.vector_store import VectorStoreSettings
+    settings = VectorStoreSettings.load()
+    results = []
+    # The retriever tool prints; keep stdout clean for the JSON report
+    sink = sys.stdout if args.verbose else open(os.devnull, "w")
+    for size in args.sizes:
+        with contextlib.redirect_stdout(sink):
+            result = run_level(size, args.queries, args.batch_size, args.seed)
+        print(
+            f"chunks={size:<7} ingest={result['ingest_chunks_per_second']:8.0f}/s  "
+            f"p50={result['query_latency_ms']['p50']:.1f}ms  p99={result['query_latency_ms']['p99']:.1f}ms  "
+            f"recall@{settings.top_k}={result[f'recall_at_{settings.top_k}']:.2f}  "
+            f"precision@{settings.score_threshold}={result['threshold']['precision']:.2f}  "
+            f"research={result['decision']['research_rate']:.2f} "
+            f"(vector only {1 - result['threshold']['hit_rate']:.2f}, precision {result['decision']['precision']:.2f})",
+            file=sys.stderr,
+        )
+        results.append(result)
+
+    return {
+        "benchmark": "retrieval",
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "settings": {
+            "queries": args.queries,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+            "provider": settings.provider,
+            "embedding_space": settings.embedding_space,
+            "top_k": settings.top_k,
+            "fetch_k": settings.fetch_k,
+            "score_threshold": settings.score_threshold,
+            "lexical_threshold": settings.lexical_threshold,
+            "hybrid_search": settings.hybrid_search,
+            "hot_tier_capacity": settings.hot_tier_capacity,
+            "dedup_policy": settings.dedup_policy,
+        },
+        "results": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", type=lambda v: [int(s) for s in v.split(",")])
+    parser.add_argument("--queries", type=int, default=200, help="Briefs per level (half about held-out topics)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per add_chunks call (INGEST_BATCH_CHUNKS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Keep the retriever's prints")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = main(arguments)
+    payload = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
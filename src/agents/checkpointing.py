@@ -0,0 +1,224 @@
+from psycopg_pool import AsyncConnectionPool
+from psycopg.rows import dict_row
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+import os
+import zlib
+from dotenv import load_dotenv
+load_dotenv()
+raw_url = os.getenv("ASYNC_DATABASE_URL")
+DATABASE_URL = raw_url.replace("+asyncpg", "")
+
+# AsyncPostgresSaver shares this pool directly; it requires autocommit, dict rows and no
+# server-side prepared statements (connections are handed between unrelated callers)
+connection_pool = AsyncConnectionPool(
+    conninfo=DATABASE_URL,
+    max_size=20,
+    open=False,
+    kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+)
+
+# Local stand-ins (e.g. sqlite+aiosqlite for load tests) keep graph state in memory
+USE_POSTGRES = DATABASE_URL.startswith("postgres")
+
+@dataclass
+class CheckpointSettings:
+    # "auto" (zstd when the zstandard package is installed, else zlib) | "zstd" | "zlib" | "off"
+    compression: str = "auto"
+    # Smaller values are stored as they are: the codec's framing would outweigh the savings
+    compress_min_bytes: int = 1024
+    # Root checkpoints kept per finished thread; the pruning job drops older ones
+    keep_last: int = 5
+    prune_interval_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "CheckpointSettings":
+        return cls(
+            compression=os.getenv("CHECKPOINT_COMPRESSION", cls.compression).lower(),
+            compress_min_bytes=int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", cls.compress_min_bytes)),
+            keep_last=int(os.getenv("CHECKPOINT_KEEP_LAST", cls.keep_last)),
+            prune_interval_seconds=float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", cls.prune_interval_seconds)),
+        )
+
+@lru_cache(maxsize=1)
+def get_checkpoint_settings() -> CheckpointSettings:
+    return CheckpointSettings.from_env()
+
+def _zstd_compress(data: bytes) -> bytes:
+    import zstandard
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+def _zstd_decompress(data: bytes) -> bytes:
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(data)
+
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "zstd": (_zstd_compress, _zstd_decompress),
+}
+
+class CompressingSerializer(JsonPlusSerializer):
+    """
+    JsonPlusSerializer that compresses large payloads (channel blobs, pending writes).
+
+    The codec is appended to the stored type ("msgpack+zlib"), so values
+    written before compression was enabled, or with another codec, still load.
+    Postgres keeps the checkpoint document itself as JSONB; it only holds
+    channel versions, the values are in checkpoint_blobs.
+    """
+
+    def __init__(self, codec: Optional[str], min_bytes: int = 1024, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.codec = codec
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self.codec is None or len(data) < self.min_bytes:
+            return type_, data
+        return f"{type_}+{self.codec}", CODECS[self.codec][0](data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        base_type, _, codec = type_.rpartition("+")
+        if base_type and codec in CODECS:
+            return super().loads_typed((base_type, CODECS[codec][1](payload)))
+        return super().loads_typed(data)
+
+@lru_cache(maxsize=1)
+def get_checkpoint_serde() -> JsonPlusSerializer:
+    settings = get_checkpoint_settings()
+    codec = settings.compression
+    if codec == "auto":
+        try:
+            import zstandard  # noqa: F401
+            codec = "zstd"
+        except ImportError:
+            codec = "zlib"
+    if codec == "off":
+        return JsonPlusSerializer()
+    if codec not in CODECS:
+        raise ValueError(f"CHECKPOINT_COMPRESSION must be auto, zstd, zlib or off, got {codec!r}")
+    return CompressingSerializer(codec, settings.compress_min_bytes)
+
+@lru_cache(maxsize=1)
+def get_memory_checkpointer():
+    """Process-wide InMemorySaver, created when the first request needs it."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    return InMemorySaver(serde=get_checkpoint_serde())
+
+@lru_cache(maxsize=1)
+def get_checkpointer():
+    """
+    Process-wide checkpointer shared by every compiled graph.
+
+    Postgres deployments get one AsyncPostgresSaver on the connection pool;
+    without Postgres it is the in-memory saver. The Postgres saver binds to
+    the running event loop, so the first call must come from the loop (the
+    lifespan hook makes it at start-up).
+    """
+    if not USE_POSTGRES:
+        return get_memory_checkpointer()
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    return AsyncPostgresSaver(connection_pool, serde=get_checkpoint_serde())
+
+async def setup_checkpointer():
+    """Create the checkpoint tables once per process (the pool must be open)."""
+    checkpointer = get_checkpointer()
+    if USE_POSTGRES:
+        await checkpointer.setup()
+    return checkpointer
+
+async def latest_checkpoint_id(thread_id: str):
+    """Id of the thread's newest checkpoint, read without loading or decoding the checkpoint."""
+    if not USE_POSTGRES:
+        checkpoints = get_memory_checkpointer().storage.get(thread_id, {}).get("", {})
+        return max(checkpoints) if checkpoints else None
+    async with connection_pool.connection() as conn:
+        cur = await conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT 1",
+            (thread_id,),
+        )
+        row = await cur.fetchone()
+        return row["checkpoint_id"] if row else None
+
+# Subgraph calls (namespace "<node>:<task id>") are only read to resume an interrupted
+# run; once the thread is finished they go, and the root namespace keeps its newest rows
+PRUNE_CHECKPOINTS_SQL = (
+    "DELETE FROM checkpoint_writes WHERE thread_id = %(thread_id)s AND checkpoint_ns <> ''",
+    "DELETE FROM checkpoint_blobs WHERE thread_id = %(thread_id)s AND checkpoint_ns <> ''",
+    "DELETE FROM checkpoints WHERE thread_id = %(thread_id)s AND checkpoint_ns <> ''",
+    """
+    WITH dropped AS (
+        DELETE FROM checkpoints
+        WHERE thread_id = %(thread_id)s AND checkpoint_ns = '' AND checkpoint_id NOT IN (
+            SELECT checkpoint_id FROM checkpoints
+            WHERE thread_id = %(thread_id)s AND checkpoint_ns = ''
+            ORDER BY checkpoint_id DESC LIMIT %(keep_last)s
+        )
+        RETURNING checkpoint_id
+    )
+    DELETE FROM checkpoint_writes
+    WHERE thread_id = %(thread_id)s AND checkpoint_ns = '' AND checkpoint_id IN (SELECT checkpoint_id FROM dropped)
+    """,
+    # A blob is shared by every checkpoint whose channel is at its version; drop the unreferenced ones
+    """
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = %(thread_id)s AND b.checkpoint_ns = '' AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = ''
+        AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+    )
+    """,
+    # The oldest kept checkpoint must not point at a deleted parent
+    """
+    UPDATE checkpoints SET parent_checkpoint_id = NULL
+    WHERE thread_id = %(thread_id)s AND checkpoint_ns = '' AND parent_checkpoint_id IS NOT NULL
+    AND parent_checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints WHERE thread_id = %(thread_id)s AND checkpoint_ns = ''
+    )
+    """,
+)
+
+def _prune_memory_checkpoints(thread_id: str, keep_last: int):
+    saver = get_memory_checkpointer()
+    namespaces = saver.storage.get(thread_id)
+    if not namespaces:
+        return
+    for ns in list(namespaces):
+        checkpoint_ids = sorted(namespaces[ns], reverse=True)
+        for checkpoint_id in checkpoint_ids[keep_last:] if ns == "" else checkpoint_ids:
+            del namespaces[ns][checkpoint_id]
+            saver.writes.pop((thread_id, ns, checkpoint_id), None)
+        if not namespaces[ns]:
+            del namespaces[ns]
+    kept = namespaces.get("", {})
+    for checkpoint_id, (checkpoint, metadata, parent_id) in list(kept.items()):
+        if parent_id is not None and parent_id not in kept:
+            kept[checkpoint_id] = (checkpoint, metadata, None)
+    referenced = {
+        ("", channel, version)
+        for checkpoint, _, _ in kept.values()
+        for channel, version in saver.serde.loads_typed(checkpoint)["channel_versions"].items()
+    }
+    for key in [key for key in saver.blobs if key[0] == thread_id and key[1:] not in referenced]:
+        del saver.blobs[key]
+
+async def prune_checkpoints(thread_id: str, keep_last: int) -> None:
+    """
+    Keep only a finished thread's newest keep_last root checkpoints, with
+    the blobs and writes they use. GET /chat reads the latest one; older
+    ones only served time travel, which the app does not offer.
+    """
+    keep_last = max(keep_last, 1)
+    if not USE_POSTGRES:
+        _prune_memory_checkpoints(thread_id, keep_last)
+        return
+    params = {"thread_id": thread_id, "keep_last": keep_last}
+    async with connection_pool.connection() as conn:
+        async with conn.transaction():
+            for statement in PRUNE_CHECKPOINTS_SQL:
+                await conn.execute(statement, params)
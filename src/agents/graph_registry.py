@@ -0,0 +1,33 @@
+"""
+Process-level registry of compiled agent graphs.
+
+Each graph is compiled once per process against the shared checkpointer
+(src/agents/checkpointing.py). Request handlers and the background worker
+only bind a per-thread config, with no saver construction, checkpoint DDL
+or recompilation on each message. The lifespan hook creates the
+checkpointer on the event loop and runs its setup once, then compiles
+the graphs in a worker thread. A request that arrives first compiles the
+graph it needs itself.
+"""
+from functools import lru_cache
+from src.agents.checkpointing import get_checkpointer
+
+
+@lru_cache(maxsize=1)
+def get_scope_agent():
+    """The scoping graph (clarification, brief, memory lookup), compiled once."""
+    from src.agents.scope_agent import scope_graph
+    return scope_graph.compile(checkpointer=get_checkpointer())
+
+
+@lru_cache(maxsize=1)
+def get_deep_research_agent():
+    """The full research graph (supervisor, researchers, final report), compiled once."""
+    from src.agents.workflow_executor import deep_researcher_builder
+    return deep_researcher_builder.compile(checkpointer=get_checkpointer())
+
+
+def compile_graphs():
+    """Compile every registered graph (blocking; run it off the event loop)."""
+    get_scope_agent()
+    get_deep_research_agent()
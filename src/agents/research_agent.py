@@ -7,21 +7,26 @@ from langgraph.checkpoint.memory import InMemorySaver
 from src.llm.gemini_client import create_model
 from src.prompt_engineering.templates import get_prompt
 from langchain_core.runnables import RunnableConfig
+from functools import lru_cache
 from dotenv import load_dotenv
 load_dotenv()
 
-model = create_model("research_agent")
-research_agent_prompt = get_prompt("research_agent","research_agent_prompt")
-compress_research_system_prompt = get_prompt("research_agent","compress_research_system_prompt")
-compress_research_human_message = get_prompt("research_agent","compress_research_human_message")
-
 tools = [tavily_search, think_tool]
 tools_by_name = {tool.name: tool for tool in tools}
-model_with_tools = model.bind_tools(tools)
 checkpoint = InMemorySaver()
 
 
-def llm_call(state: ResearcherState) :
+@lru_cache(maxsize=1)
+def get_model():
+    """Create the researcher model on first use instead of at import time."""
+    return create_model("research_agent")
+
+@lru_cache(maxsize=1)
+def get_model_with_tools():
+    return get_model().bind_tools(tools)
+
+
+async def llm_call(state: ResearcherState) :
     """Analyze current state and decide on next actions.
 
         The model analyzes the current conversation state and decides whether to:
@@ -32,13 +37,14 @@ def llm_call(state: ResearcherState) :
         """
     return {
         "researcher_messages": [
-            model_with_tools.invoke(
-                [SystemMessage(content=research_agent_prompt)] + state.get("researcher_messages",[])
+            await get_model_with_tools().ainvoke(
+                [SystemMessage(content=get_prompt("research_agent", "research_agent_prompt"))]
+                + state.get("researcher_messages",[])
             )
         ]
     }
 
-def tool_node(state: ResearcherState):
+async def tool_node(state: ResearcherState):
     """Execute all tool calls from the previous LLM response and show outputs."""
 
     tool_calls = state["researcher_messages"][-1].tool_calls
@@ -51,7 +57,8 @@ def tool_node(state: ResearcherState):
         print(f"📥 Arguments: {tool_args}")
 
         tool = tools_by_name[tool_name]
-        observation = tool.invoke(tool_args)
+        # Awaited on the event loop, so cancelling the run interrupts the search request itself
+        observation = await tool.ainvoke(tool_args)
 
         print(f"📤 ToolMessage output:\n{observation}\n{'-'*80}")
         observations.append(observation)
@@ -68,17 +75,18 @@ def tool_node(state: ResearcherState):
     return {"researcher_messages": tool_outputs}
 
 
-def compress_research(state: ResearcherState) -> dict:
+async def compress_research(state: ResearcherState) -> dict:
     """Compress research findings into a concise summary.
 
     Takes all the research messages and tool outputs and creates
     a compressed summary suitable for the supervisor's decision-making.
     """
 
-    system_message = compress_research_system_prompt.format(date=get_today_str())
+    system_message = get_prompt("research_agent", "compress_research_system_prompt").format(date=get_today_str())
+    compress_research_human_message = get_prompt("research_agent", "compress_research_human_message")
 
     messages = [SystemMessage(content=system_message)] + state.get("researcher_messages", []) + [HumanMessage(content=compress_research_human_message)]
-    response = model.invoke(messages)
+    response = await get_model().ainvoke(messages)
 
     # Extract raw notes from tool and AI messages
     raw_notes = [
@@ -133,4 +141,7 @@ agent_builder.add_conditional_edges(
 agent_builder.add_edge("tool_node", "llm_call") # Loop back for more research
 agent_builder.add_edge("compress_research", END)
 
-research_agent = agent_builder.compile(checkpointer=checkpoint)
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_research_agent():
+    """Compile the researcher graph on first use (named so its runs are identifiable in event streams)."""
+    return agent_builder.compile(checkpointer=checkpoint, name="research_agent")
\ No newline at end of file
@@ -10,19 +10,21 @@ from langsmith import traceable
 from src.prompt_engineering.templates import get_prompt
 from src.utils.tools import get_today_str
 from langgraph.checkpoint.memory import InMemorySaver
+from functools import lru_cache
 
 
 load_dotenv()
 
-clarification_instructions = get_prompt("scope_agent","clarification_instructions")
-transform_messages_into_research_topic_prompt = get_prompt("scope_agent","transform_messages_into_research_topic_prompt")
-
-model = create_model("scope_agent")
+@lru_cache(maxsize=1)
+def get_model():
+    """Create the scope model on first use instead of at import time."""
+    return create_model("scope_agent")
 
 @traceable
 async def clarify_with_user(state: AgentInputState) -> Command[Literal["write_research_brief", "__end__"]]:
 
-    structured_output_model = model.with_structured_output(schema=ClarifyWithUser)
+    structured_output_model = get_model().with_structured_output(schema=ClarifyWithUser)
+    clarification_instructions = get_prompt("scope_agent", "clarification_instructions")
 
     result = await structured_output_model.ainvoke([
         HumanMessage(content=clarification_instructions.format(
@@ -45,7 +47,8 @@ async def clarify_with_user(state: AgentInputState) -> Command[Literal["write_re
 
 async def write_research_brief(state: AgentOutputState):
 
-    structured_output_model = model.with_structured_output(schema=ResearchQuestion)
+    structured_output_model = get_model().with_structured_output(schema=ResearchQuestion)
+    transform_messages_into_research_topic_prompt = get_prompt("scope_agent", "transform_messages_into_research_topic_prompt")
 
     result = await structured_output_model.ainvoke([
         HumanMessage(content=transform_messages_into_research_topic_prompt.format(
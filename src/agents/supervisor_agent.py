@@ -3,22 +3,25 @@ from src.agent_interface.tools import  ConductResearch, ResearchComplete
 from langchain_core.messages import SystemMessage, ToolMessage, BaseMessage, HumanMessage, filter_messages
 from src.utils.tools import get_today_str, think_tool
 from langgraph.types import Command
-from src.agents.research_agent import research_agent
+from src.agents.research_agent import get_research_agent
 from src.data_retriever.output_retriever import retrieve_data_with_score
 from langgraph.graph import StateGraph, START, END
 from langchain_core.runnables import RunnableConfig
 import asyncio
-from langgraph.checkpoint.memory import InMemorySaver
 from typing_extensions import Literal
 from src.llm.gemini_client import create_model
 from src.prompt_engineering.templates import get_prompt
+from functools import lru_cache
 from dotenv import load_dotenv
 load_dotenv()
 
-model = create_model("supervisor_agent")
-lead_researcher_prompt = get_prompt("supervisor_agent","lead_researcher_prompt")
 tools = [ConductResearch, ResearchComplete, think_tool, retrieve_data_with_score]
-model_with_tools = model.bind_tools(tools)
+
+@lru_cache(maxsize=1)
+def get_model_with_tools():
+    """Create the supervisor model on first use instead of at import time."""
+    return create_model("supervisor_agent").bind_tools(tools)
+
 # This prevents infinite loops and controls research depth per topic
 max_researcher_iterations = 6 # Calls to think_tool + ConductResearch
 
@@ -63,7 +66,7 @@ async def supervisor(state: SupervisorState) ->  Command[Literal["supervisor_too
     supervisor_messages = state.get("supervisor_messages",[])
 
     print(supervisor_messages)
-    system_message = lead_researcher_prompt.format(
+    system_message = get_prompt("supervisor_agent", "lead_researcher_prompt").format(
         date=get_today_str(),
         max_researcher_iterations=max_researcher_iterations,
         max_concurrent_research_units=max_concurrent_researchers_unit,
@@ -71,7 +74,7 @@ async def supervisor(state: SupervisorState) ->  Command[Literal["supervisor_too
 
     messages = [SystemMessage(content=system_message)] + supervisor_messages
 
-    response = await model_with_tools.ainvoke(messages)
+    response = await get_model_with_tools().ainvoke(messages)
 
     return Command(
         goto="supervisor_tools",
@@ -142,7 +145,8 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
                 ))
 
             for tool_call in retriever_tool_calls:
-                observations = retrieve_data_with_score.invoke(state.get("research_brief",""))
+                # Sync tool: ainvoke runs the embedding and vector lookup in a worker thread
+                observations = await retrieve_data_with_score.ainvoke(state.get("research_brief",""))
                 tool_messages.append(ToolMessage(
                     content=observations,
                     name=tool_call["name"],
@@ -150,16 +154,23 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
                 ))
 
             if conduct_research_calls:
+                research_agent = get_research_agent()
+                # Each researcher gets its own thread so concurrent runs don't share message history
                 coros = [
                     research_agent.ainvoke({
                         "researcher_messages": [HumanMessage(content=tool_call["args"]["research_topic"])],
                         "research_topic": tool_call["args"]["research_topic"]
-                    },config={"configurable": {"thread_id": "1"},
+                    },config={"configurable": {"thread_id": tool_call["id"]},
                         "recursion_limit" : 50})
                     for tool_call in conduct_research_calls
                 ]
 
-                tool_results = await asyncio.gather(*coros)
+                try:
+                    tool_results = await asyncio.gather(*coros)
+                finally:
+                    # Researcher checkpoints are scratch space; drop them once the results are in
+                    for tool_call in conduct_research_calls:
+                        await research_agent.checkpointer.adelete_thread(tool_call["id"])
 
                 research_tool_messages = [
                     ToolMessage(
@@ -201,12 +212,12 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["superviso
             }
         )
 
-checkpoint = InMemorySaver()
-
 supervisor_builder = StateGraph(SupervisorState)
 supervisor_builder.add_node("supervisor", supervisor)
 supervisor_builder.add_node("supervisor_tools", supervisor_tools)
 supervisor_builder.add_edge(START, "supervisor")
 
-supervisor_agent = supervisor_builder.compile(checkpointer=checkpoint)
+# No checkpointer of its own: as a node of deep_researcher_builder it checkpoints into the
+# parent's (Postgres) saver, so a resumed run continues after the last finished supervisor step
+supervisor_agent = supervisor_builder.compile()
 
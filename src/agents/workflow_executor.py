@@ -6,14 +6,14 @@ from src.prompt_engineering.templates import get_prompt
 from src.agents.supervisor_agent import supervisor, supervisor_tools, supervisor_agent
 from langgraph.graph import StateGraph, START, END
 from langsmith import traceable
-from psycopg_pool import AsyncConnectionPool
-import os
-from dotenv import load_dotenv
-load_dotenv()
-raw_url = os.getenv("ASYNC_DATABASE_URL")
-DATABASE_URL = raw_url.replace("+asyncpg", "")
-model = create_model("final_reporter")
-final_report_generation_prompt = get_prompt("final_reporter", "final_report_generation_prompt")
+# Pool and checkpointer live in a light module so the API can import them without the graphs
+from src.agents.checkpointing import DATABASE_URL, connection_pool, USE_POSTGRES, get_checkpointer
+from functools import lru_cache
+
+@lru_cache(maxsize=1)
+def get_model():
+    """Create the final reporter model on first use instead of at import time."""
+    return create_model("final_reporter")
 
 @traceable
 async def final_report_generation(state: AgentOutputState):
@@ -31,14 +31,14 @@ async def final_report_generation(state: AgentOutputState):
     research_brief = state.get("research_brief", "")
 
     # Build the final report prompt
-    final_report_prompt = final_report_generation_prompt.format(
+    final_report_prompt = get_prompt("final_reporter", "final_report_generation_prompt").format(
         research_brief=research_brief,
         findings=findings,
         date=get_today_str()
     )
 
     # Call the model
-    final_report_response = await model.ainvoke([HumanMessage(content=final_report_prompt)])
+    final_report_response = await get_model().ainvoke([HumanMessage(content=final_report_prompt)])
 
     # Wrap final report in AIMessage to keep it labeled correctly
     ai_message = AIMessage(content=final_report_response.content)
@@ -63,7 +63,3 @@ deep_researcher_builder.add_node("final_report_generation", final_report_generat
 deep_researcher_builder.add_edge(START,"supervisor_subgraph")
 deep_researcher_builder.add_edge("supervisor_subgraph", "final_report_generation" )
 deep_researcher_builder.add_edge("final_report_generation", END)
-
-connection_pool = AsyncConnectionPool(conninfo=DATABASE_URL, max_size=20,open=False)
-
-
@@ -0,0 +1,96 @@
+"""
+Context packing for memory hits.
+
+Chunks that overlap (the splitter keeps 200 characters of overlap) or that
+come from near-identical reports repeat the same text. pack_context ranks
+candidates with maximal marginal relevance, then takes them in that order
+until the chunk limit or the token budget is reached. The supervisor thus
+gets a small, diverse context instead of the k nearest chunks.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+
+
+@dataclass
+class Candidate:
+    document: Document
+    # Cosine distance to the query embedding
+    distance: float
+    vector: Sequence[float]
+    # Reciprocal-rank-fusion score over the vector and lexical rankings
+    fused_score: float = 0.0
+    # Share of the query's terms found in the chunk text
+    coverage: float = 0.0
+    # 1-based positions in the vector and lexical result lists (None: not in that list)
+    vector_rank: Optional[int] = None
+    lexical_rank: Optional[int] = None
+    # Distance after the lexical boost; orders chunks for packing, not compared against the score threshold
+    relevance_distance: Optional[float] = None
+
+    def __post_init__(self):
+        if self.relevance_distance is None:
+            self.relevance_distance = self.distance
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_order(query_vector: Sequence[float], vectors: Sequence[Sequence[float]], lambda_mult: float = 0.7,
+              relevance: Optional[Sequence[float]] = None) -> List[int]:
+    """
+    Order candidate indices by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    lambda * relevance(c) - (1 - lambda) * max(sim(c, already picked)),
+    where relevance defaults to the cosine similarity to the query.
+    """
+    if len(vectors) == 0:
+        return []
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+    if relevance is None:
+        relevance = matrix @ _normalize(np.asarray(query_vector, dtype=np.float32))
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    redundancy = np.zeros(len(matrix), dtype=np.float32)
+    remaining = np.ones(len(matrix), dtype=bool)
+    order: List[int] = []
+    for _ in range(len(matrix)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~remaining] = -np.inf
+        pick = int(np.argmax(scores))
+        order.append(pick)
+        remaining[pick] = False
+        redundancy = np.maximum(redundancy, matrix @ matrix[pick])
+    return order
+
+
+def pack_context(query_vector: Sequence[float], candidates: List[Candidate], max_chunks: int,
+                 token_budget: int, lambda_mult: float = 0.7) -> List[Candidate]:
+    """Select diverse candidates in MMR order within max_chunks and token_budget."""
+    selected: List[Candidate] = []
+    used_tokens = 0
+    relevance = [1.0 - c.relevance_distance for c in candidates]
+    for index in mmr_order(query_vector, [c.vector for c in candidates], lambda_mult, relevance):
+        candidate = candidates[index]
+        tokens = estimate_tokens(candidate.document.page_content)
+        if used_tokens + tokens > token_budget:
+            # A shorter chunk further down may still fit
+            continue
+        selected.append(candidate)
+        used_tokens += tokens
+        if len(selected) >= max_chunks:
+            break
+    if not selected and candidates:
+        # Always return the most relevant chunk, even when it alone exceeds the budget
+        selected.append(min(candidates, key=lambda c: c.relevance_distance))
+    return selected
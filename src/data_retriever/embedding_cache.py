@@ -0,0 +1,174 @@
+"""
+Persistent embedding cache.
+
+CachedEmbeddings wraps the embedding function used by the vector store. Each
+vector is stored in SQLite under a key built from the model name, the
+embedding kind ("query" or "document"; Gemini uses a different task type for
+each) and a SHA-256 of the normalized text. Repeat research briefs and
+duplicate chunks are then served from disk instead of the embedding API.
+
+The cache is bounded by size. When the stored vectors exceed max_bytes, the
+least recently used entries are evicted down to 90% of the limit.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, List, Sequence
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# Stay well below SQLite's host-parameter limit
+_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace; case is kept, it can change meaning."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model: str, kind: str, text: str) -> str:
+    digest = hashlib.sha256()
+    for part in (model, kind, normalize_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed key -> float32 vector store with LRU eviction by size."""
+
+    def __init__(self, path: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings(last_used)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _BATCH):
+                batch = unique[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array("f", vector).tobytes()
+            rows.append((key, model, blob, len(blob), now))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                added = 0
+                for row in rows:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO embeddings (key, model, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                        row,
+                    )
+                    added += row[3] * cursor.rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used rows until the cache is at 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT ?", (_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            victims = []
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                victims.append((key,))
+                self._total_bytes -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            self.evictions += len(victims)
+            logger.debug(f"Evicted {len(victims)} cached embeddings ({self._total_bytes} bytes kept)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an EmbeddingCache before the model."""
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def _embed(self, texts: List[str], kind: str, embed_fn) -> List[List[float]]:
+        keys = [cache_key(self.model, kind, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once, in a single upstream call
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            fresh = embed_fn(list(missing.values()))
+            new_items = dict(zip(missing.keys(), fresh))
+            self.cache.put_many(self.model, new_items)
+            vectors.update(new_items)
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda batch: [self.embeddings.embed_query(batch[0])])[0]
@@ -0,0 +1,123 @@
+"""
+In-process hot tier for recent report chunks.
+
+HotTier keeps the embeddings of recently ingested chunks in one contiguous
+float32 matrix with L2-normalized rows. A query is a single matrix-vector
+product, and the returned distances are cosine distances, 1 - similarity,
+the same scale Chroma's "cosine" space uses. The vector store searches this
+tier first and falls through to Chroma only when the best hot hit misses
+the score threshold.
+
+Capacity is fixed. Entries older than max_age_seconds expire, and when the
+matrix is full the least recently used row is overwritten. A row counts as
+used when it was added or last returned by a search.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+
+class HotTier:
+    """Fixed-capacity brute-force cosine index over recent chunks."""
+
+    def __init__(self, capacity: int, max_age_seconds: Optional[float] = None):
+        self.capacity = capacity
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._documents: List[Optional[Document]] = [None] * capacity
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._slots: Dict[str, int] = {}
+        self._added_at = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._occupied = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return int(self._occupied.sum())
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _free(self, slot: int):
+        self._slots.pop(self._ids[slot], None)
+        self._ids[slot] = None
+        self._documents[slot] = None
+        self._occupied[slot] = False
+
+    def _expire(self, now: float):
+        if not self.max_age_seconds:
+            return
+        for slot in np.flatnonzero(self._occupied & (self._added_at < now - self.max_age_seconds)):
+            self._free(int(slot))
+
+    def _take_slot(self) -> int:
+        free = np.flatnonzero(~self._occupied)
+        if free.size:
+            return int(free[0])
+        # Full: overwrite the least recently used row
+        slot = int(np.argmin(self._last_used))
+        self._free(slot)
+        return slot
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document], vectors: Sequence[Sequence[float]],
+            added_at: Optional[Sequence[float]] = None):
+        """Insert (or refresh) chunks with their embeddings."""
+        if self.capacity <= 0 or not ids:
+            return
+        batch = self._normalize(np.asarray(vectors, dtype=np.float32))
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, batch.shape[1]), dtype=np.float32)
+            elif batch.shape[1] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {batch.shape[1]} does not match hot tier dimension {self._matrix.shape[1]}"
+                )
+            self._expire(now)
+            for i, chunk_id in enumerate(ids):
+                slot = self._slots.get(chunk_id)
+                if slot is None:
+                    slot = self._take_slot()
+                self._matrix[slot] = batch[i]
+                self._documents[slot] = documents[i]
+                self._ids[slot] = chunk_id
+                self._slots[chunk_id] = slot
+                self._added_at[slot] = added_at[i] if added_at is not None else now
+                self._last_used[slot] = now
+                self._occupied[slot] = True
+
+    def remove(self, ids: Sequence[str]):
+        with self._lock:
+            for chunk_id in ids:
+                slot = self._slots.get(chunk_id)
+                if slot is not None:
+                    self._free(slot)
+
+    def search(self, query_vector: Sequence[float], k: int) -> List[Tuple[Document, float]]:
+        """Return up to k (document, cosine distance) pairs, nearest first."""
+        return [(document, distance) for document, distance, _ in self.search_with_vectors(query_vector, k)]
+
+    def search_with_vectors(self, query_vector: Sequence[float], k: int) -> List[Tuple[Document, float, np.ndarray]]:
+        """Like search(), also returning each hit's (normalized) embedding."""
+        with self._lock:
+            if self._matrix is None:
+                return []
+            now = time.time()
+            self._expire(now)
+            occupied = int(self._occupied.sum())
+            if not occupied:
+                return []
+            query = self._normalize(np.asarray(query_vector, dtype=np.float32))
+            # Scan the whole contiguous matrix and mask free rows rather than copying the live ones
+            distances = 1.0 - self._matrix @ query
+            distances[~self._occupied] = np.inf
+            k = min(k, occupied)
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top])]
+            self._last_used[top] = now
+            return [(self._documents[slot], float(distances[slot]), self._matrix[slot].copy()) for slot in top]
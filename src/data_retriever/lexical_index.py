@@ -0,0 +1,137 @@
+"""
+Lexical (BM25) index over research-memory chunks.
+
+Embedding search is weak on exact terms such as product names, version
+numbers and acronyms. LexicalIndex keeps every chunk written to the
+deep_research_texts collection in a SQLite FTS5 table under the same chunk
+id, and ranks matches with FTS5's built-in bm25(). The vector store fuses
+the lexical and vector rankings with reciprocal rank fusion. Term coverage
+(the share of query terms found in a chunk) favours a chunk when the
+context is packed. The needs_research threshold stays on the raw cosine
+distance, so lexical matches never make weak vector hits count as memory.
+"""
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+from langchain_core.documents import Document
+
+_TOKEN = re.compile(r"\w+(?:[.\-]\w+)*", re.UNICODE)
+# Keep queries short: FTS5 OR-queries over a whole brief get slow and unfocused
+MAX_QUERY_TERMS = 32
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this to was were "
+    "what when which who will with about how why does do can should would could than then there these those "
+    "compare research find provide information latest best".split()
+)
+
+
+def query_terms(text: str) -> List[str]:
+    """Distinct lowercase terms worth matching (stopwords and 1-char tokens dropped)."""
+    terms: Dict[str, None] = {}
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) > 1 and token not in STOPWORDS:
+            terms[token] = None
+    return list(terms)[:MAX_QUERY_TERMS]
+
+
+def term_coverage(terms: Sequence[str], text: str) -> float:
+    """Fraction of terms present in text (as whole tokens)."""
+    if not terms:
+        return 0.0
+    tokens = set(_TOKEN.findall(text.lower()))
+    return sum(1 for term in terms if term in tokens) / len(terms)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> Dict[str, float]:
+    """Combine ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class LexicalIndex:
+    """SQLite FTS5 table of chunk text keyed by the vector store's chunk id."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            " chunk_id UNINDEXED, chat_id UNINDEXED, content, tokenize='unicode61 remove_diacritics 2')"
+        )
+        # FTS5 can only look rows up by rowid; this keyed table maps chunk ids to it
+        # (a WHERE on the UNINDEXED chunk_id column scans the whole index)
+        exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunk_rows'").fetchone()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunk_rows (chunk_id TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        if not exists:
+            self._conn.execute("INSERT OR REPLACE INTO chunk_rows (chunk_id, row) SELECT chunk_id, rowid FROM chunks")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document]):
+        """Insert or replace chunks (same ids as the vector collection)."""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete(ids)
+                for chunk_id, document in zip(ids, documents):
+                    row = self._conn.execute(
+                        "INSERT INTO chunks (chunk_id, chat_id, content) VALUES (?, ?, ?)",
+                        (chunk_id, str(document.metadata.get("chat_id", "")), document.page_content),
+                    ).lastrowid
+                    self._conn.execute("INSERT INTO chunk_rows (chunk_id, row) VALUES (?, ?)", (chunk_id, row))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete(self, ids: Sequence[str]):
+        rows = []
+        for chunk_id in ids:
+            found = self._conn.execute("SELECT row FROM chunk_rows WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if found:
+                rows.append(found)
+        self._conn.executemany("DELETE FROM chunks WHERE rowid = ?", rows)
+        self._conn.executemany("DELETE FROM chunk_rows WHERE chunk_id = ?", [(i,) for i in ids])
+
+    def delete(self, ids: Sequence[str]):
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._delete(ids)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, bm25) pairs, best first (FTS5 bm25 is lower-is-better)."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quote every term so punctuation in names like "gpt-4.1" is matched as a phrase, not parsed
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, bm25(chunks) AS score FROM chunks WHERE chunks MATCH ? ORDER BY score LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [(chunk_id, score) for chunk_id, score in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
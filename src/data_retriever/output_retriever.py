@@ -1,45 +1,86 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import Optional
 from dotenv import load_dotenv
-from langchain.tools import tool
-import os
-from pathlib import Path
+from langchain_core.tools import tool
+from src.data_retriever.context_packing import Candidate
+from src.data_retriever.vector_store import get_vector_store_service
+from src.data_retriever.context_packing import estimate_tokens, pack_context
 
 load_dotenv()
-embedding = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-VECTOR_DB_PATH = str(Path(r"C:\Users\User\PythonProject\data\output").resolve())
-vector_store = Chroma(
-    collection_name="deep_research_texts",
-    embedding_function=embedding,
-    persist_directory=VECTOR_DB_PATH,
-    collection_metadata={"hnsw:space": "cosine"}
-)
+
+
+def accepted_by(candidate: Candidate, settings) -> Optional[str]:
+    """
+    Why a candidate lets the brief skip research: "vector", "lexical" or None.
+
+    A raw cosine distance within score_threshold is enough on its own. Up to
+    lexical_threshold, a chunk also counts when BM25 confirms it: it is the
+    top hit of both the vector and lexical searches, or it contains every
+    query term (exact product names, versions and acronyms that embeddings
+    blur).
+    """
+    if candidate.distance <= settings.score_threshold:
+        return "vector"
+    if candidate.distance <= settings.lexical_threshold and (
+        candidate.coverage >= settings.lexical_min_coverage
+        or (candidate.vector_rank == 1 and candidate.lexical_rank == 1)
+    ):
+        return "lexical"
+    return None
+
+
 @tool
 def retrieve_data_with_score(research_brief: str):
     """
     Retrieve relevant documents from memory using the research brief.
-    Only return results if top score <= 0.30; otherwise indicate that further research is needed.
+    Only return results if top score <= 0.30, or a lexically confirmed hit is within the lexical
+    threshold (see accepted_by); otherwise indicate that further research is needed.
+    On a hit, returns a diverse, token-budgeted selection of chunks with their scores and source chat_ids.
     """
-    retrieved_docs_with_score = vector_store.similarity_search_with_score(
-        query=research_brief, k=10
-    )
+    vector_store = get_vector_store_service()
+    settings = vector_store.settings
+    query_vector, candidates = vector_store.search_candidates(research_brief)
 
-    best_score = min(score for _, score in retrieved_docs_with_score) if retrieved_docs_with_score else 1
-    needs_research = best_score > 0.30
+    # Raw cosine distance: score_threshold is tuned for it; lexical evidence gets its own, second threshold
+    best_score = min(c.distance for c in candidates) if candidates else 1
+    reasons = [reason for reason in (accepted_by(c, settings) for c in candidates) if reason]
+    needs_research = not reasons
 
     if needs_research:
         return {
             "needs_research": True,
             "serialized": "",
+            "best_score": best_score,
+            "chunks": [],
         }
 
+    selected = pack_context(
+        query_vector,
+        candidates,
+        max_chunks=settings.top_k,
+        token_budget=settings.context_token_budget,
+        lambda_mult=settings.mmr_lambda,
+    )
+    chunks = [
+        {
+            "chat_id": c.document.metadata.get("chat_id"),
+            "score": round(c.distance, 4),
+            "coverage": round(c.coverage, 2),
+            "tokens": estimate_tokens(c.document.page_content),
+        }
+        for c in selected
+    ]
     serialized = "\n\n".join(
-        f"Content: {doc.page_content}" for doc, _ in retrieved_docs_with_score
+        f"[source chat_id={chunk['chat_id']} score={chunk['score']}]\nContent: {c.document.page_content}"
+        for chunk, c in zip(chunks, selected)
     )
 
     return {
         "needs_research": False,
-        "serialized": serialized
+        "accepted_by": "vector" if "vector" in reasons else "lexical",
+        "serialized": serialized,
+        "best_score": best_score,
+        "chunks": chunks,
+        "tokens": sum(chunk["tokens"] for chunk in chunks),
     }
 
 if __name__ == '__main__':
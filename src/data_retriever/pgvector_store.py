@@ -0,0 +1,317 @@
+"""
+pgvector backend for research memory.
+
+PgVectorCollection stores chunks in Postgres through the backend's existing
+AsyncConnectionPool (src/agents/checkpointing.py). Every replica therefore
+reads and writes the same memory, with no shared Chroma directory. It
+exposes the subset of the Chroma collection API that VectorStoreService
+uses (count/upsert/query/get/delete, same result shapes), so the service
+logic is the same for both backends.
+
+  * bulk writes COPY rows into a temporary table, then upsert them in one
+    INSERT ... ON CONFLICT
+  * an HNSW (default) or IVFFlat index with cosine ops; embeddings wider
+    than 2000 dimensions are stored as halfvec, since pgvector cannot index
+    wider vector columns
+  * a generated tsvector column with a GIN index backs PgLexicalIndex, so
+    hybrid retrieval is shared across replicas too
+
+The service methods are synchronous and run in worker threads
+(asyncio.to_thread). This class bridges each call onto the event loop that
+owns the pool, via run_coroutine_threadsafe. Vectors travel in pgvector's
+text format, so the pgvector Python package is not required.
+"""
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence
+from psycopg import sql
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+# pgvector cannot index `vector` columns wider than this; halfvec goes up to 4000
+MAX_VECTOR_INDEX_DIMENSIONS = 2000
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _vector_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{float(x):.7g}" for x in vector) + "]"
+
+
+def _parse_vector(text: str) -> List[float]:
+    return json.loads(text)
+
+
+class PgVectorCollection:
+    """Chroma-compatible collection on a pgvector table."""
+
+    def __init__(self, pool: AsyncConnectionPool, table: str, collection: str, index: str = "hnsw",
+                 hnsw_m: int = 16, hnsw_ef_construction: int = 64, hnsw_ef_search: int = 40,
+                 ivfflat_lists: int = 100, ivfflat_probes: int = 10):
+        if not _IDENTIFIER.match(table):
+            raise ValueError(f"Invalid pgvector table name: {table}")
+        if index not in ("hnsw", "ivfflat", "none"):
+            raise ValueError(f"Unknown pgvector index type: {index}")
+        self.pool = pool
+        self.table = table
+        self.collection = collection
+        self.index = index
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivfflat_lists = ivfflat_lists
+        self.ivfflat_probes = ivfflat_probes
+        self.dimension: Optional[int] = None
+        self.vector_type = "vector"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # --- sync bridge -------------------------------------------------------
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the event loop that owns the pool (called from the lifespan)."""
+        self._loop = loop
+
+    def _run(self, coro):
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("PgVectorCollection is not bound to an event loop; call VectorStoreService.aopen()")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            coro.close()
+            raise RuntimeError("Synchronous pgvector calls must run off the event loop (use asyncio.to_thread)")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _ident(self, suffix: str = "") -> sql.Identifier:
+        return sql.Identifier(self.table + suffix)
+
+    # --- schema ------------------------------------------------------------
+
+    async def asetup(self, dimension: int, embedding_space: str) -> str:
+        """
+        Create the extension, table and indexes for embeddings of the given dimension.
+
+        Registers the collection's embedding space on first use and returns
+        the recorded one, which differs from embedding_space when the
+        collection was built with another model.
+        """
+        self.dimension = dimension
+        self.vector_type = "halfvec" if dimension > MAX_VECTOR_INDEX_DIMENSIONS else "vector"
+        ops = sql.SQL(f"{self.vector_type}_cosine_ops")
+        column = sql.SQL(f"{self.vector_type}({dimension})")
+        async with self.pool.connection() as conn:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            await conn.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {table} ("
+                " id text PRIMARY KEY,"
+                " collection text NOT NULL,"
+                " content text NOT NULL,"
+                " metadata jsonb NOT NULL DEFAULT '{{}}'::jsonb,"
+                " created_at double precision,"
+                " embedding {column} NOT NULL,"
+                " content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED)"
+            ).format(table=self._ident(), column=column))
+            await conn.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {registry} ("
+                " collection text PRIMARY KEY, embedding_space text NOT NULL, dimension integer NOT NULL)"
+            ).format(registry=self._ident("_collections")))
+            await conn.execute(sql.SQL(
+                "INSERT INTO {registry} (collection, embedding_space, dimension) VALUES (%s, %s, %s)"
+                " ON CONFLICT (collection) DO NOTHING"
+            ).format(registry=self._ident("_collections")), (self.collection, embedding_space, dimension))
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(sql.SQL(
+                    "SELECT embedding_space FROM {registry} WHERE collection = %s"
+                ).format(registry=self._ident("_collections")), (self.collection,))
+                recorded = (await cur.fetchone())["embedding_space"]
+            await conn.execute(sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {name} ON {table} (collection, created_at)"
+            ).format(name=self._ident("_created_at_idx"), table=self._ident()))
+            await conn.execute(sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (content_tsv)"
+            ).format(name=self._ident("_tsv_idx"), table=self._ident()))
+            if self.index == "hnsw":
+                await conn.execute(sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {name} ON {table} USING hnsw (embedding {ops})"
+                    " WITH (m = {m}, ef_construction = {ef})"
+                ).format(name=self._ident("_embedding_hnsw"), table=self._ident(), ops=ops,
+                         m=sql.Literal(self.hnsw_m), ef=sql.Literal(self.hnsw_ef_construction)))
+            elif self.index == "ivfflat":
+                # IVFFlat centroids come from existing rows; build it once the table has data
+                await conn.execute(sql.SQL(
+                    "CREATE INDEX IF NOT EXISTS {name} ON {table} USING ivfflat (embedding {ops})"
+                    " WITH (lists = {lists})"
+                ).format(name=self._ident("_embedding_ivfflat"), table=self._ident(), ops=ops,
+                         lists=sql.Literal(self.ivfflat_lists)))
+        return recorded
+
+    def _search_settings(self) -> List[sql.Composable]:
+        if self.index == "hnsw":
+            return [sql.SQL("SET LOCAL hnsw.ef_search = {}").format(sql.Literal(self.hnsw_ef_search))]
+        if self.index == "ivfflat":
+            return [sql.SQL("SET LOCAL ivfflat.probes = {}").format(sql.Literal(self.ivfflat_probes))]
+        return []
+
+    # --- async operations --------------------------------------------------
+
+    async def acount(self) -> int:
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(
+                    sql.SQL("SELECT count(*) AS n FROM {table} WHERE collection = %s").format(table=self._ident()),
+                    (self.collection,),
+                )
+                return (await cur.fetchone())["n"]
+
+    async def aupsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+                      metadatas: List[Dict[str, Any]]):
+        staging = sql.Identifier(f"{self.table}_staging")
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(sql.SQL(
+                    "CREATE TEMP TABLE IF NOT EXISTS {staging} ("
+                    " id text, collection text, content text, metadata jsonb,"
+                    " created_at double precision, embedding text) ON COMMIT DELETE ROWS"
+                ).format(staging=staging))
+                async with conn.cursor() as cur:
+                    async with cur.copy(sql.SQL(
+                        "COPY {staging} (id, collection, content, metadata, created_at, embedding) FROM STDIN"
+                    ).format(staging=staging)) as copy:
+                        for chunk_id, vector, text, metadata in zip(ids, embeddings, documents, metadatas):
+                            metadata = metadata or {}
+                            await copy.write_row((
+                                chunk_id, self.collection, text, json.dumps(metadata),
+                                metadata.get("created_at"), _vector_literal(vector),
+                            ))
+                await conn.execute(sql.SQL(
+                    "INSERT INTO {table} (id, collection, content, metadata, created_at, embedding)"
+                    " SELECT id, collection, content, metadata, created_at, embedding::{vtype} FROM {staging}"
+                    " ON CONFLICT (id) DO UPDATE SET"
+                    " collection = EXCLUDED.collection, content = EXCLUDED.content, metadata = EXCLUDED.metadata,"
+                    " created_at = EXCLUDED.created_at, embedding = EXCLUDED.embedding"
+                ).format(table=self._ident(), staging=staging, vtype=sql.SQL(self.vector_type)))
+
+    async def aquery(self, query_embeddings: List[List[float]], n_results: int,
+                     include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict[str, list]:
+        result: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        vtype = sql.SQL(self.vector_type)
+        statement = sql.SQL(
+            "SELECT id, content, metadata, embedding <=> %(q)s::{vtype} AS distance, embedding::text AS embedding"
+            " FROM {table} WHERE collection = %(collection)s"
+            " ORDER BY embedding <=> %(q)s::{vtype} LIMIT %(k)s"
+        ).format(table=self._ident(), vtype=vtype)
+        async with self.pool.connection() as conn:
+            async with conn.transaction():
+                for setting in self._search_settings():
+                    await conn.execute(setting)
+                async with conn.cursor(row_factory=dict_row) as cur:
+                    for vector in query_embeddings:
+                        await cur.execute(statement, {
+                            "q": _vector_literal(vector), "collection": self.collection, "k": n_results,
+                        })
+                        rows = await cur.fetchall()
+                        result["ids"].append([r["id"] for r in rows])
+                        result["documents"].append([r["content"] for r in rows])
+                        result["metadatas"].append([r["metadata"] for r in rows])
+                        result["distances"].append([float(r["distance"]) for r in rows])
+                        result["embeddings"].append(
+                            [_parse_vector(r["embedding"]) for r in rows] if "embeddings" in include else None
+                        )
+        return result
+
+    async def aget(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+                   limit: Optional[int] = None, offset: Optional[int] = None,
+                   include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, list]:
+        conditions = [sql.SQL("collection = %s")]
+        params: List[Any] = [self.collection]
+        if ids is not None:
+            conditions.append(sql.SQL("id = ANY(%s)"))
+            params.append(list(ids))
+        for key, condition in (where or {}).items():
+            # Only the operators VectorStoreService uses, on created_at
+            if key != "created_at":
+                raise ValueError(f"Unsupported pgvector filter key: {key}")
+            for op, value in condition.items():
+                operator = {"$gte": ">=", "$gt": ">", "$lte": "<=", "$lt": "<", "$eq": "="}[op]
+                conditions.append(sql.SQL("created_at " + operator + " %s"))
+                params.append(value)
+        statement = sql.SQL(
+            "SELECT id, content, metadata, embedding::text AS embedding FROM {table} WHERE {where} ORDER BY id"
+        ).format(table=self._ident(), where=sql.SQL(" AND ").join(conditions))
+        if limit is not None:
+            statement += sql.SQL(" LIMIT {}").format(sql.Literal(limit))
+        if offset:
+            statement += sql.SQL(" OFFSET {}").format(sql.Literal(offset))
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(statement, params)
+                rows = await cur.fetchall()
+        return {
+            "ids": [r["id"] for r in rows],
+            "documents": [r["content"] for r in rows],
+            "metadatas": [r["metadata"] for r in rows],
+            "embeddings": [_parse_vector(r["embedding"]) for r in rows] if "embeddings" in include else None,
+        }
+
+    async def adelete(self, ids: List[str]):
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                sql.SQL("DELETE FROM {table} WHERE collection = %s AND id = ANY(%s)").format(table=self._ident()),
+                (self.collection, list(ids)),
+            )
+
+    async def atext_search(self, terms: List[str], k: int) -> List[tuple]:
+        """Full-text OR-search over the given terms, best first (ts_rank_cd, higher is better)."""
+        if not terms:
+            return []
+        tsquery = sql.SQL(" || ").join(sql.SQL("phraseto_tsquery('simple', %s)") for _ in terms)
+        statement = sql.SQL(
+            "SELECT id, ts_rank_cd(content_tsv, q) AS score FROM {table}, ({tsquery}) AS query(q)"
+            " WHERE collection = %s AND content_tsv @@ q ORDER BY score DESC LIMIT %s"
+        ).format(table=self._ident(), tsquery=sql.SQL("SELECT ") + tsquery)
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(statement, [*terms, self.collection, k])
+                return [(r["id"], float(r["score"])) for r in await cur.fetchall()]
+
+    # --- Chroma-compatible sync API (call from worker threads) --------------
+
+    def count(self) -> int:
+        return self._run(self.acount())
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        return self._run(self.aupsert(ids, embeddings, documents, metadatas))
+
+    def query(self, query_embeddings, n_results: int, include=("documents", "metadatas", "distances")):
+        return self._run(self.aquery(query_embeddings, n_results, include))
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        return self._run(self.aget(ids=ids, where=where, limit=limit, offset=offset, include=include))
+
+    def delete(self, ids):
+        return self._run(self.adelete(ids))
+
+
+class PgLexicalIndex:
+    """LexicalIndex counterpart on the pgvector table's tsvector column (rows are shared, so add is a no-op)."""
+
+    def __init__(self, collection: PgVectorCollection):
+        self.collection = collection
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, documents):
+        pass
+
+    def delete(self, ids):
+        pass
+
+    def search(self, query: str, k: int):
+        from src.data_retriever.lexical_index import query_terms
+        return self.collection._run(self.collection.atext_search(query_terms(query), k))
+
+    def close(self):
+        pass
@@ -0,0 +1,619 @@
+"""
+Shared vector store for research memory.
+
+A single VectorStoreService owns the embedding client and the memory
+collection. The FastAPI lifespan opens it once at start-up; the retriever
+tool and the report ingestion path both go through get_vector_store_service(),
+so the index is loaded once per process instead of once per task. The
+embedding space (provider and model) is recorded on the collection, and
+opening it with a different one fails instead of mixing incomparable vectors.
+
+The collection lives in Chroma by default. With provider: pgvector it is a
+table in the backend's Postgres database on the shared connection pool
+(src/data_retriever/pgvector_store.py), so API replicas and workers share it.
+
+Recent chunks are also kept in an in-process HotTier (src/data_retriever/hot_tier.py).
+A query checks it first and goes to the collection only when the best hot hit misses
+the score threshold. The pgvector backend has no hot tier: other processes change
+the shared table, and a local copy would go stale. Every chunk is also indexed in a BM25 LexicalIndex
+(src/data_retriever/lexical_index.py), and the two rankings are fused with
+reciprocal rank fusion.
+
+Ingestion suppresses near-duplicates: a chunk within dedup_similarity of a
+stored chunk is skipped, or replaces the stored one. compact() bounds the
+collection over time. It expires chunks past retention_days, drops stale
+chunks that have a fresher near-duplicate, and caps the total at max_chunks.
+
+Settings come from config/vector_store_config.yaml, overridden by
+VECTOR_STORE_PROVIDER, PGVECTOR_INDEX, VECTOR_DB_PATH, VECTOR_COLLECTION,
+EMBEDDING_PROVIDER, EMBEDDING_MODEL, EMBEDDING_CACHE (0/1), EMBEDDING_CACHE_PATH,
+EMBEDDING_CACHE_MAX_MB, HOT_TIER_CAPACITY, HOT_TIER_MAX_AGE_HOURS and
+VECTOR_STORE_LEXICAL_THRESHOLD.
+"""
+import asyncio
+import datetime
+import os
+import threading
+import time
+import uuid
+import yaml
+import numpy as np
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from src.llm.gemini_client import create_embeddings
+from src.data_retriever.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.data_retriever.hot_tier import HotTier
+from src.data_retriever.context_packing import Candidate
+from src.data_retriever.lexical_index import LexicalIndex, query_terms, reciprocal_rank_fusion, term_coverage
+
+load_dotenv()
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+CONFIG_PATH = REPO_ROOT / "config" / "vector_store_config.yaml"
+# Every collection was embedded with this before the space was recorded on it
+LEGACY_EMBEDDING_SPACE = "google:gemini-embedding-001"
+
+
+@dataclass
+class VectorStoreSettings:
+    provider: str = "chroma"
+    persist_directory: str = "data/output"
+    collection_name: str = "deep_research_texts"
+    distance: str = "cosine"
+    # google | local (CPU hashing embeddings, src/llm/local_embeddings.py) | stub
+    embedding_provider: str = "google"
+    embedding_model: str = "gemini-embedding-001"
+    local_embedding_dimension: int = 768
+    chunk_size: int = 1800
+    chunk_overlap: int = 200
+    top_k: int = 10
+    score_threshold: float = 0.30
+    # Candidates fetched for MMR re-ranking, and the packing limits for a memory hit
+    fetch_k: int = 20
+    mmr_lambda: float = 0.7
+    context_token_budget: int = 2000
+    embedding_cache: bool = True
+    # Empty means <persist_directory>/embedding_cache.sqlite3
+    embedding_cache_path: str = ""
+    embedding_cache_max_mb: int = 256
+    # 0 disables the hot tier
+    hot_tier_capacity: int = 5000
+    hot_tier_max_age_hours: float = 72
+    # Hybrid retrieval: BM25 index next to the collection, fused by reciprocal rank
+    hybrid_search: bool = True
+    # Empty means <persist_directory>/lexical_index.sqlite3
+    lexical_index_path: str = ""
+    rrf_k: int = 60
+    # Full term coverage scales a chunk's packing relevance distance by (1 - lexical_weight)
+    lexical_weight: float = 0.5
+    # Lexically confirmed hits count as memory up to this distance (0 disables); see output_retriever
+    lexical_threshold: float = 0.45
+    lexical_min_coverage: float = 1.0
+    # Near-duplicate suppression at ingestion: off | skip | replace
+    dedup_policy: str = "replace"
+    dedup_similarity: float = 0.97
+    # Compaction (see compact()); 0 disables the respective rule
+    retention_days: float = 180
+    stale_after_days: float = 30
+    max_chunks: int = 200000
+    compaction_interval_hours: float = 6
+    # pgvector backend (provider: pgvector), on the shared Postgres pool
+    pgvector_table: str = "research_memory"
+    # hnsw | ivfflat | none
+    pgvector_index: str = "hnsw"
+    pgvector_m: int = 16
+    pgvector_ef_construction: int = 64
+    pgvector_ef_search: int = 40
+    pgvector_lists: int = 100
+    pgvector_probes: int = 10
+
+    @classmethod
+    def load(cls, path: Path = CONFIG_PATH) -> "VectorStoreSettings":
+        data: Dict[str, Any] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+        settings = cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+        settings.provider = os.getenv("VECTOR_STORE_PROVIDER", settings.provider)
+        settings.persist_directory = os.getenv("VECTOR_DB_PATH", settings.persist_directory)
+        settings.collection_name = os.getenv("VECTOR_COLLECTION", settings.collection_name)
+        settings.embedding_provider = os.getenv("EMBEDDING_PROVIDER", settings.embedding_provider).lower()
+        settings.embedding_model = os.getenv("EMBEDDING_MODEL", settings.embedding_model)
+        settings.embedding_cache = os.getenv("EMBEDDING_CACHE", "1" if settings.embedding_cache else "0") == "1"
+        settings.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", settings.embedding_cache_path)
+        settings.embedding_cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", settings.embedding_cache_max_mb))
+        settings.hot_tier_capacity = int(os.getenv("HOT_TIER_CAPACITY", settings.hot_tier_capacity))
+        settings.hot_tier_max_age_hours = float(os.getenv("HOT_TIER_MAX_AGE_HOURS", settings.hot_tier_max_age_hours))
+        settings.hybrid_search = os.getenv("HYBRID_SEARCH", "1" if settings.hybrid_search else "0") == "1"
+        settings.lexical_threshold = float(os.getenv("VECTOR_STORE_LEXICAL_THRESHOLD", settings.lexical_threshold))
+        settings.dedup_policy = os.getenv("MEMORY_DEDUP_POLICY", settings.dedup_policy)
+        settings.retention_days = float(os.getenv("MEMORY_RETENTION_DAYS", settings.retention_days))
+        settings.compaction_interval_hours = float(
+            os.getenv("MEMORY_COMPACTION_INTERVAL_HOURS", settings.compaction_interval_hours)
+        )
+        settings.pgvector_index = os.getenv("PGVECTOR_INDEX", settings.pgvector_index)
+        if settings.dedup_policy not in ("off", "skip", "replace"):
+            raise ValueError(f"Unknown dedup policy: {settings.dedup_policy}")
+        if settings.pgvector_index not in ("hnsw", "ivfflat", "none"):
+            raise ValueError(f"Unknown pgvector index type: {settings.pgvector_index}")
+        return settings
+
+    @property
+    def embedding_space(self) -> str:
+        """Provider and model behind the stored vectors; recorded on the collection and checked on open."""
+        if self.embedding_provider == "local":
+            from src.llm.local_embeddings import LocalHashingEmbeddings
+            return f"local:hashing-{LocalHashingEmbeddings.version}-{self.local_embedding_dimension}"
+        if self.embedding_provider == "stub":
+            return "stub"
+        return f"{self.embedding_provider}:{self.embedding_model}"
+
+    @property
+    def persist_path(self) -> Path:
+        path = Path(self.persist_directory).expanduser()
+        return path if path.is_absolute() else (REPO_ROOT / path).resolve()
+
+    def _data_file(self, configured: str, default_name: str) -> Path:
+        if not configured:
+            return self.persist_path / default_name
+        path = Path(configured).expanduser()
+        return path if path.is_absolute() else (REPO_ROOT / path).resolve()
+
+    @property
+    def embedding_cache_file(self) -> Path:
+        return self._data_file(self.embedding_cache_path, "embedding_cache.sqlite3")
+
+    @property
+    def lexical_index_file(self) -> Path:
+        return self._data_file(self.lexical_index_path, "lexical_index.sqlite3")
+
+
+class VectorStoreService:
+    """Process-wide handle on the research-memory collection."""
+
+    def __init__(self, settings: VectorStoreSettings):
+        if settings.provider not in ("chroma", "pgvector"):
+            raise ValueError(f"Unsupported vector store provider: {settings.provider}")
+        self.settings = settings
+        self._collection = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._embedding = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hot_tier: Optional[HotTier] = None
+        # pgvector is shared with other processes, whose inserts, replacements and
+        # compaction an in-process copy would never see; every query goes to the table
+        if settings.hot_tier_capacity > 0 and settings.provider != "pgvector":
+            self.hot_tier = HotTier(settings.hot_tier_capacity, settings.hot_tier_max_age_hours * 3600)
+        self.lexical_index = None
+        self.hot_hits = 0
+        self.hot_misses = 0
+        self.dedup_skipped = 0
+        self.dedup_replaced = 0
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        """
+        The backing collection, opened on first access.
+
+        Chroma's collection, or a PgVectorCollection exposing the same
+        count/upsert/query/get/delete API.
+        """
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._collection = self._open()
+        return self._collection
+
+    def _open(self):
+        path = self.settings.persist_path
+        os.makedirs(path, exist_ok=True)
+        embedding = create_embeddings(
+            self.settings.embedding_model,
+            provider=self.settings.embedding_provider,
+            dimension=self.settings.local_embedding_dimension,
+        )
+        # Local vectors are cheaper to recompute than to look up
+        if self.settings.embedding_cache and self.settings.embedding_provider != "local":
+            self._cache = EmbeddingCache(
+                self.settings.embedding_cache_file,
+                max_bytes=self.settings.embedding_cache_max_mb * 1024 * 1024,
+            )
+            embedding = CachedEmbeddings(embedding, self.settings.embedding_space, self._cache)
+        self._embedding = embedding
+        if self.settings.provider == "pgvector":
+            return self._open_pgvector()
+        if self.settings.hybrid_search:
+            self.lexical_index = LexicalIndex(self.settings.lexical_index_file)
+        from langchain_chroma import Chroma
+        store = Chroma(
+            collection_name=self.settings.collection_name,
+            embedding_function=embedding,
+            persist_directory=str(path),
+            collection_metadata={"hnsw:space": self.settings.distance, "embedding_space": self.settings.embedding_space},
+        )
+        collection = store._collection
+        metadata = dict(collection.metadata or {})
+        if "embedding_space" not in metadata:
+            # Collections created before the space was recorded hold Gemini vectors;
+            # record the configured space only if it is that one (or nothing is stored yet)
+            if collection.count():
+                self._check_embedding_space(LEGACY_EMBEDDING_SPACE)
+            # The distance function lives in the collection's configuration and cannot change
+            metadata = {k: v for k, v in metadata.items() if not k.startswith("hnsw:")}
+            collection.modify(metadata={**metadata, "embedding_space": self.settings.embedding_space})
+        else:
+            self._check_embedding_space(metadata["embedding_space"])
+        return collection
+
+    def _check_embedding_space(self, recorded: str):
+        if recorded != self.settings.embedding_space:
+            raise ValueError(
+                f"Collection {self.settings.collection_name} holds {recorded} embeddings but "
+                f"{self.settings.embedding_space} is configured; use another collection or re-ingest"
+            )
+
+    def _open_pgvector(self):
+        from src.agents.checkpointing import connection_pool
+        from src.data_retriever.pgvector_store import PgLexicalIndex, PgVectorCollection
+        if self.settings.distance != "cosine":
+            raise ValueError("The pgvector backend supports only cosine distance")
+        collection = PgVectorCollection(
+            connection_pool,
+            table=self.settings.pgvector_table,
+            collection=self.settings.collection_name,
+            index=self.settings.pgvector_index,
+            hnsw_m=self.settings.pgvector_m,
+            hnsw_ef_construction=self.settings.pgvector_ef_construction,
+            hnsw_ef_search=self.settings.pgvector_ef_search,
+            ivfflat_lists=self.settings.pgvector_lists,
+            ivfflat_probes=self.settings.pgvector_probes,
+        )
+        if self._loop is None:
+            raise RuntimeError("The pgvector backend must be opened with aopen() from the application's event loop")
+        collection.bind_loop(self._loop)
+        # The column type needs the embedding width; one probe (cached after the first start)
+        dimension = len(self._embedding.embed_query("dimension probe"))
+        recorded = collection._run(collection.asetup(dimension, self.settings.embedding_space))
+        self._check_embedding_space(recorded)
+        if self.settings.hybrid_search:
+            # Full-text search on the same table, so every replica sees the same lexical index
+            self.lexical_index = PgLexicalIndex(collection)
+        return collection
+
+    def open(self) -> "VectorStoreService":
+        """Load the client and index eagerly (called from the lifespan hook)."""
+        _ = self.collection
+        self.backfill_lexical_index()
+        self.warm_hot_tier()
+        return self
+
+    async def aopen(self) -> "VectorStoreService":
+        """
+        open() from the event loop. The pgvector backend runs its queries on
+        this loop's connection pool, so the pool must already be open.
+        """
+        self._loop = asyncio.get_running_loop()
+        return await asyncio.to_thread(self.open)
+
+    def backfill_lexical_index(self, page_size: int = 1000) -> int:
+        """Index chunks written before the lexical index existed (runs only when it is empty)."""
+        if not isinstance(self.lexical_index, LexicalIndex):
+            # The pgvector backend's full-text column is filled by Postgres itself
+            return 0
+        if len(self.lexical_index) or not self.collection.count():
+            return 0
+        indexed = 0
+        while True:
+            page = self.collection.get(limit=page_size, offset=indexed, include=["documents", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                return indexed
+            documents = [
+                Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata in zip(ids, page["documents"], page["metadatas"])
+            ]
+            self.lexical_index.add(ids, documents)
+            indexed += len(ids)
+
+    def warm_hot_tier(self) -> int:
+        """Load chunks newer than the hot-tier age limit, with their stored embeddings."""
+        if self.hot_tier is None:
+            return 0
+        cutoff = time.time() - self.settings.hot_tier_max_age_hours * 3600
+        recent = self.collection.get(
+            where={"created_at": {"$gte": cutoff}},
+            limit=self.settings.hot_tier_capacity,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        ids = recent.get("ids") or []
+        if not ids:
+            return 0
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for chunk_id, text, metadata in zip(ids, recent["documents"], recent["metadatas"])
+        ]
+        added_at = [doc.metadata.get("created_at", cutoff) for doc in documents]
+        self.hot_tier.add(ids, documents, recent["embeddings"], added_at=added_at)
+        return len(ids)
+
+    @property
+    def embedding_cache(self) -> Optional[EmbeddingCache]:
+        return self._cache
+
+    def close(self):
+        self._collection = None
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+            self.lexical_index = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def split(self, documents: List[Document]) -> List[Document]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.settings.chunk_size,
+            chunk_overlap=self.settings.chunk_overlap,
+        )
+        return splitter.split_documents(documents)
+
+    def _near_duplicates(self, vectors: List[List[float]]) -> Tuple[List[bool], List[Optional[str]]]:
+        """
+        For each new vector: is it a near-duplicate of an earlier vector in the
+        same batch, and which stored chunk (if any) is it a near-duplicate of?
+        """
+        max_distance = 1.0 - self.settings.dedup_similarity
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        similarity = matrix @ matrix.T
+        in_batch = [bool((similarity[i, :i] >= self.settings.dedup_similarity).any()) for i in range(len(matrix))]
+
+        stored: List[Optional[str]] = [None] * len(vectors)
+        if self.collection.count():
+            nearest = self.collection.query(query_embeddings=vectors, n_results=1, include=["distances"])
+            for i, (ids, distances) in enumerate(zip(nearest["ids"], nearest["distances"])):
+                if ids and distances[0] <= max_distance:
+                    stored[i] = ids[0]
+        return in_batch, stored
+
+    def add_chunks(self, chunks: List[Document]) -> List[str]:
+        """
+        Write pre-split chunks in one call (one embedding request per batch).
+
+        Near-duplicates are skipped or replace the stored chunk, depending on
+        dedup_policy. Returns the ids that were written.
+        """
+        if not chunks:
+            return []
+        collection = self.collection
+        now = time.time()
+        ids = [chunk.id or str(uuid.uuid4()) for chunk in chunks]
+        for chunk, chunk_id in zip(chunks, ids):
+            chunk.id = chunk_id
+            # Numeric timestamp so recent chunks can be selected with a metadata filter
+            chunk.metadata.setdefault("created_at", now)
+        # Embed once and hand the same vectors to the collection and the hot tier (same ids in the lexical index)
+        vectors = self._embedding.embed_documents([chunk.page_content for chunk in chunks])
+
+        if self.settings.dedup_policy != "off":
+            in_batch, stored = self._near_duplicates(vectors)
+            keep = [i for i in range(len(chunks)) if not in_batch[i]]
+            replaced = []
+            if self.settings.dedup_policy == "skip":
+                keep = [i for i in keep if stored[i] is None]
+            else:
+                replaced = sorted({stored[i] for i in keep if stored[i] is not None})
+            self.dedup_skipped += len(chunks) - len(keep)
+            self.dedup_replaced += len(replaced)
+            self.delete_chunks(replaced)
+            chunks = [chunks[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            vectors = [vectors[i] for i in keep]
+            if not chunks:
+                return []
+
+        collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=[chunk.page_content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks],
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, chunks)
+        if self.hot_tier is not None:
+            self.hot_tier.add(ids, chunks, vectors, added_at=[chunk.metadata["created_at"] for chunk in chunks])
+        return ids
+
+    def delete_chunks(self, ids: List[str], batch_size: int = 1000):
+        """Remove chunks from the collection, the lexical index and the hot tier."""
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            self.collection.delete(ids=batch)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(batch)
+            if self.hot_tier is not None:
+                self.hot_tier.remove(batch)
+
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """Split documents into chunks and add them to the collection."""
+        return self.add_chunks(self.split(documents))
+
+    def _vector_candidates(self, query_vector: List[float], k: int) -> List[Candidate]:
+        """Nearest chunks by embedding: the hot tier when its best hit is within threshold, else the collection."""
+        if self.hot_tier is not None:
+            hot = self.hot_tier.search_with_vectors(query_vector, k)
+            if hot and hot[0][1] <= self.settings.score_threshold:
+                self.hot_hits += 1
+                return [Candidate(doc, distance, vector) for doc, distance, vector in hot]
+            self.hot_misses += 1
+        results = self.collection.query(
+            query_embeddings=[query_vector],
+            n_results=k,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        return [
+            Candidate(Document(page_content=text, metadata=metadata or {}, id=chunk_id), distance, vector)
+            for chunk_id, text, metadata, distance, vector in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0],
+                results["distances"][0], results["embeddings"][0],
+            )
+        ]
+
+    def _lexical_candidates(self, query_vector: List[float], chunk_ids: List[str]) -> List[Candidate]:
+        """Load lexical-only hits from the collection and score them against the query embedding."""
+        if not chunk_ids:
+            return []
+        rows = self.collection.get(ids=chunk_ids, include=["documents", "metadatas", "embeddings"])
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        candidates = []
+        for chunk_id, text, metadata, vector in zip(rows["ids"], rows["documents"], rows["metadatas"], rows["embeddings"]):
+            vector = np.asarray(vector, dtype=np.float32)
+            distance = 1.0 - float(vector @ query) / (float(np.linalg.norm(vector)) or 1.0)
+            candidates.append(Candidate(Document(page_content=text, metadata=metadata or {}, id=chunk_id), distance, vector))
+        return candidates
+
+    def search_candidates(self, query: str, k: Optional[int] = None) -> Tuple[List[float], List[Candidate]]:
+        """
+        Return the query embedding and the best chunks with distances and vectors.
+
+        With hybrid search, the vector and BM25 rankings are fused by reciprocal
+        rank and candidates come back in fused order. distance stays the raw
+        cosine distance; each candidate also carries its rank in the vector and
+        lexical lists and its query-term coverage, for the retriever's
+        acceptance rule. relevance_distance, scaled down by query-term
+        coverage, ranks chunks for context packing.
+        """
+        k = k or self.settings.fetch_k
+        query_vector = self._embedding.embed_query(query)
+        candidates = self._vector_candidates(query_vector, k)
+        for rank, candidate in enumerate(candidates, start=1):
+            candidate.vector_rank = rank
+        if self.lexical_index is None:
+            return query_vector, candidates
+
+        lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, k)]
+        lexical_ranks = {chunk_id: rank for rank, chunk_id in enumerate(lexical_ids, start=1)}
+        by_id = {c.document.id: c for c in candidates}
+        missing = [chunk_id for chunk_id in lexical_ids if chunk_id not in by_id]
+        for candidate in self._lexical_candidates(query_vector, missing):
+            by_id[candidate.document.id] = candidate
+
+        fused = reciprocal_rank_fusion([[c.document.id for c in candidates], lexical_ids], k=self.settings.rrf_k)
+        terms = query_terms(query)
+        for chunk_id, candidate in by_id.items():
+            candidate.fused_score = fused.get(chunk_id, 0.0)
+            candidate.lexical_rank = lexical_ranks.get(chunk_id)
+            candidate.coverage = term_coverage(terms, candidate.document.page_content)
+            candidate.relevance_distance = candidate.distance * (1 - self.settings.lexical_weight * candidate.coverage)
+        ranked = sorted(by_id.values(), key=lambda c: c.fused_score, reverse=True)
+        return query_vector, ranked[:k]
+
+    def similarity_search_with_score(self, query: str, k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """Nearest chunks with cosine distance (hot tier first, then the collection)."""
+        _, candidates = self.search_candidates(query, k or self.settings.top_k)
+        return [(c.document, c.distance) for c in candidates]
+
+    @staticmethod
+    def _written_at(metadata: Dict[str, Any]) -> Optional[float]:
+        """Epoch seconds a chunk was stored: created_at, else the report's ISO timestamp."""
+        if metadata.get("created_at") is not None:
+            return float(metadata["created_at"])
+        if metadata.get("timestamp"):
+            try:
+                return datetime.datetime.fromisoformat(metadata["timestamp"]).timestamp()
+            except ValueError:
+                return None
+        return None
+
+    def compact(self, page_size: int = 1000) -> Dict[str, int]:
+        """
+        Bound the collection's size and age.
+
+          * expire: chunks older than retention_days are deleted
+          * merge:  chunks older than stale_after_days that have a newer
+                    near-duplicate (dedup_similarity) are deleted
+          * cap:    beyond max_chunks, the oldest chunks are deleted
+        """
+        collection = self.collection
+        now = time.time()
+        written: Dict[str, float] = {}
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            for chunk_id, metadata in zip(page_ids, page["metadatas"]):
+                # Undated chunks predate timestamps; treat them as oldest
+                written[chunk_id] = self._written_at(metadata or {}) or 0.0
+            offset += len(page_ids)
+
+        expired = []
+        if self.settings.retention_days:
+            cutoff = now - self.settings.retention_days * 86400
+            expired = [chunk_id for chunk_id, at in written.items() if at < cutoff]
+            self.delete_chunks(expired)
+            for chunk_id in expired:
+                written.pop(chunk_id)
+
+        merged = []
+        if self.settings.stale_after_days and self.settings.dedup_similarity < 1:
+            stale_cutoff = now - self.settings.stale_after_days * 86400
+            stale = [chunk_id for chunk_id, at in written.items() if at < stale_cutoff]
+            max_distance = 1.0 - self.settings.dedup_similarity
+            for start in range(0, len(stale), page_size):
+                batch = collection.get(ids=stale[start:start + page_size], include=["embeddings"])
+                if not batch["ids"]:
+                    continue
+                nearest = collection.query(
+                    query_embeddings=batch["embeddings"], n_results=2, include=["distances"]
+                )
+                for chunk_id, neighbour_ids, distances in zip(batch["ids"], nearest["ids"], nearest["distances"]):
+                    for other, distance in zip(neighbour_ids, distances):
+                        if other == chunk_id or other not in written or distance > max_distance:
+                            continue
+                        # Keep the fresher copy (ties broken by id so exactly one survives)
+                        if (written[other], other) > (written[chunk_id], chunk_id):
+                            merged.append(chunk_id)
+                            break
+            self.delete_chunks(merged)
+            for chunk_id in merged:
+                written.pop(chunk_id, None)
+
+        capped = []
+        if self.settings.max_chunks and len(written) > self.settings.max_chunks:
+            oldest = sorted(written, key=written.get)
+            capped = oldest[:len(written) - self.settings.max_chunks]
+            self.delete_chunks(capped)
+
+        return {"expired": len(expired), "merged": len(merged), "capped": len(capped),
+                "remaining": len(written) - len(capped)}
+
+    # Both collection clients are synchronous; run them off the event loop
+    async def aadd_chunks(self, chunks: List[Document]) -> List[str]:
+        return await asyncio.to_thread(self.add_chunks, chunks)
+
+    async def aadd_documents(self, documents: List[Document]) -> List[str]:
+        return await asyncio.to_thread(self.add_documents, documents)
+
+    async def asearch_candidates(self, query: str, k: Optional[int] = None) -> Tuple[List[float], List[Candidate]]:
+        return await asyncio.to_thread(self.search_candidates, query, k)
+
+    async def acompact(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.compact)
+
+    async def asimilarity_search_with_score(self, query: str, k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        return await asyncio.to_thread(self.similarity_search_with_score, query, k)
+
+
+@lru_cache(maxsize=1)
+def get_vector_store_service() -> VectorStoreService:
+    """Return the shared vector store service for this process."""
+    return VectorStoreService(VectorStoreSettings.load())
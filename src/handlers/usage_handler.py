@@ -0,0 +1,249 @@
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from uuid import UUID
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from src.llm.gemini_client import get_model_pricing
+
+# Graph node -> agent that owns it. LLM calls carry their own agent name
+# through the model metadata set in create_model.
+NODE_AGENTS = {
+    "clarify_with_user": "scope_agent",
+    "write_research_brief": "scope_agent",
+    "supervisor_subgraph": "supervisor_agent",
+    "supervisor": "supervisor_agent",
+    "supervisor_tools": "supervisor_agent",
+    "llm_call": "research_agent",
+    "tool_node": "research_agent",
+    "compress_research": "research_agent",
+    "final_report_generation": "final_reporter",
+}
+
+
+@dataclass
+class UsageRecord:
+    """A single accounted unit of work: one LLM call or one graph node run."""
+
+    kind: str  # "llm" or "node"
+    chat_id: str
+    agent_name: str
+    node: Optional[str]
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: float = 0.0
+    retries: int = 0
+    cost_usd: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class _PendingRun:
+    started: float
+    kind: str
+    agent_name: str
+    node: Optional[str]
+    model: Optional[str] = None
+    # HTTP requests sent for an LLM call; more than one means the SDK client retried
+    attempts: int = 0
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+
+# The LLM call in progress in this task; set by on_chat_model_start, read by the HTTP hooks
+_active_llm_call: ContextVar[Optional[_PendingRun]] = ContextVar("active_llm_call", default=None)
+
+
+def count_llm_attempt(request) -> None:
+    """
+    httpx request hook for the model clients (see create_model).
+
+    The OpenAI-compatible SDK retries inside its client (max_retries), out of
+    sight of LangChain callbacks; every attempt passes through this hook.
+    """
+    call = _active_llm_call.get()
+    if call is not None:
+        call.attempts += 1
+
+
+async def acount_llm_attempt(request) -> None:
+    count_llm_attempt(request)
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    """Estimate the USD cost of a call from the pricing block in model_config.yaml."""
+    pricing = get_model_pricing(model) if model else {}
+    if not pricing:
+        return 0.0
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    cost = (
+        uncached * pricing.get("input", 0.0)
+        + cached_tokens * pricing.get("cached_input", pricing.get("input", 0.0))
+        + completion_tokens * pricing.get("output", 0.0)
+    )
+    return cost / 1_000_000
+
+
+def _extract_token_usage(response: LLMResult) -> Dict[str, int]:
+    """Pull prompt/completion/cached token counts out of an LLM result."""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None) if message else None
+            if metadata:
+                usage["prompt_tokens"] += metadata.get("input_tokens", 0)
+                usage["completion_tokens"] += metadata.get("output_tokens", 0)
+                usage["cached_tokens"] += metadata.get("input_token_details", {}).get("cache_read", 0) or 0
+                continue
+            # Fall back to the raw provider usage block (DeepSeek reports cache hits separately)
+            token_usage = (getattr(message, "response_metadata", {}) or {}).get("token_usage", {})
+            usage["prompt_tokens"] += token_usage.get("prompt_tokens", 0)
+            usage["completion_tokens"] += token_usage.get("completion_tokens", 0)
+            usage["cached_tokens"] += token_usage.get("prompt_cache_hit_tokens", 0)
+
+    if not any(usage.values()) and response.llm_output:
+        token_usage = response.llm_output.get("token_usage", {}) or {}
+        usage["prompt_tokens"] = token_usage.get("prompt_tokens", 0)
+        usage["completion_tokens"] = token_usage.get("completion_tokens", 0)
+        usage["cached_tokens"] = token_usage.get("prompt_cache_hit_tokens", 0)
+    return usage
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Collects token, latency, retry and cost accounting for a single graph run.
+
+    Attach it to the run config (``config["callbacks"]``). It records one entry
+    per chat model call and one per LangGraph node execution, tagged with the
+    chat_id and the owning agent. Nested graphs (the researchers launched by the
+    supervisor) inherit the callback through the runnable context.
+    """
+
+    # Keep bookkeeping ordered with the run instead of hopping to an executor
+    run_inline = True
+
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        self.records: List[UsageRecord] = []
+        self._pending: Dict[UUID, _PendingRun] = {}
+        self._lock = threading.Lock()
+
+    # ---------- LLM calls ----------
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs):
+        metadata = metadata or {}
+        pending = _PendingRun(
+            started=time.perf_counter(),
+            kind="llm",
+            agent_name=metadata.get("agent_name", "unknown"),
+            node=metadata.get("langgraph_node"),
+            model=metadata.get("ls_model_name"),
+        )
+        with self._lock:
+            self._pending[run_id] = pending
+        # Handlers with run_inline are called in the task that makes the HTTP requests
+        _active_llm_call.set(pending)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        if _active_llm_call.get() is pending:
+            _active_llm_call.set(None)
+        usage = _extract_token_usage(response)
+        self._append(UsageRecord(
+            kind="llm",
+            chat_id=self.chat_id,
+            agent_name=pending.agent_name,
+            node=pending.node,
+            model=pending.model,
+            latency_ms=(time.perf_counter() - pending.started) * 1000,
+            retries=pending.retries,
+            cost_usd=estimate_cost(pending.model, **usage),
+            **usage,
+        ))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish_with_error(run_id, error)
+
+    # ---------- Graph nodes ----------
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the runnable that *is* the node, not every runnable nested inside it
+        if not node or kwargs.get("name") != node:
+            return
+        with self._lock:
+            self._pending[run_id] = _PendingRun(
+                started=time.perf_counter(),
+                kind="node",
+                agent_name=NODE_AGENTS.get(node, "unknown"),
+                node=node,
+            )
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        self._append(UsageRecord(
+            kind="node",
+            chat_id=self.chat_id,
+            agent_name=pending.agent_name,
+            node=pending.node,
+            latency_ms=(time.perf_counter() - pending.started) * 1000,
+        ))
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish_with_error(run_id, error)
+
+    # ---------- helpers ----------
+    def _finish_with_error(self, run_id: UUID, error: BaseException):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        if _active_llm_call.get() is pending:
+            _active_llm_call.set(None)
+        self._append(UsageRecord(
+            kind=pending.kind,
+            chat_id=self.chat_id,
+            agent_name=pending.agent_name,
+            node=pending.node,
+            model=pending.model,
+            latency_ms=(time.perf_counter() - pending.started) * 1000,
+            retries=pending.retries,
+            error=type(error).__name__,
+        ))
+
+    def _append(self, record: UsageRecord):
+        with self._lock:
+            self.records.append(record)
+
+    def drain(self) -> List[UsageRecord]:
+        """Return and clear the collected records (used when persisting)."""
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def totals(self) -> Dict[str, float]:
+        """Aggregate LLM token and cost totals across the collected records."""
+        with self._lock:
+            llm_records = [r for r in self.records if r.kind == "llm"]
+        return {
+            "prompt_tokens": sum(r.prompt_tokens for r in llm_records),
+            "completion_tokens": sum(r.completion_tokens for r in llm_records),
+            "cached_tokens": sum(r.cached_tokens for r in llm_records),
+            "cost_usd": sum(r.cost_usd for r in llm_records),
+            "llm_calls": len(llm_records),
+        }
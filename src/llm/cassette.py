@@ -0,0 +1,330 @@
+"""
+Record/replay cassettes for the external calls made by the research graph.
+
+Three kinds of traffic are captured:
+  * "http"       - every request ChatDeepSeek sends through its httpx clients
+  * "search"     - every Tavily search
+  * "embeddings" - every embedding call made by the vector memory
+
+Configuration (environment):
+  LLM_CASSETTE_MODE     off | record | replay            (default: off)
+  LLM_CASSETTE_PATH     cassette file                    (default: data/cassettes/default.json)
+  LLM_CASSETTE_LATENCY  recorded | zero                  (default: recorded, replay only)
+
+In replay mode no network client is ever constructed, so scope_graph and
+deep_researcher_builder run end to end offline. In record mode interactions
+are kept in memory and written when the process exits (or on flush()).
+"""
+import asyncio
+import atexit
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from langchain_core.embeddings import Embeddings
+
+MODES = ("off", "record", "replay")
+LATENCY_MODES = ("recorded", "zero")
+
+# get_today_str() ends up in most prompts; mask it so cassettes survive a date change
+_DATE_PATTERN = re.compile(
+    r"\b(Mon|Tue|Wed|Thu|Fri|Sat|Sun) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) \S{1,3}, \d{4}\b"
+)
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _canonical(value: Any) -> str:
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return _DATE_PATTERN.sub("<date>", text)
+
+
+def request_key(kind: str, *parts: Any) -> str:
+    """Stable hash identifying a request independent of dict ordering and today's date."""
+    digest = hashlib.sha256(kind.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(_canonical(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Cassette:
+    """A JSON file of recorded interactions, grouped by kind and request key."""
+
+    def __init__(self, path: Path, mode: str = "off", latency: str = "recorded"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Unknown cassette latency mode: {latency}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._cursors: Dict[Tuple[str, str], int] = {}
+        self._interactions: Dict[str, Dict[str, List[dict]]] = {}
+        self._dirty = False
+
+        if mode == "record":
+            atexit.register(self.flush)
+        if mode == "replay":
+            if not self.path.exists():
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._interactions = json.load(f).get("interactions", {})
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def record(self, kind: str, key: str, payload: dict, latency: float) -> None:
+        # Called from the event loop by the async transport: memory only, no file I/O
+        with self._lock:
+            entries = self._interactions.setdefault(kind, {}).setdefault(key, [])
+            entries.append({"payload": payload, "latency": latency})
+            self._dirty = True
+
+    def play(self, kind: str, key: str) -> Tuple[dict, float]:
+        """
+        Return the next recorded payload for a key and the latency to simulate.
+
+        Identical requests are served in recording order; once exhausted the
+        last recording is repeated.
+        """
+        with self._lock:
+            entries = self._interactions.get(kind, {}).get(key)
+            if not entries:
+                raise CassetteMissError(f"No recorded {kind} interaction for key {key[:12]} in {self.path}")
+            cursor = self._cursors.get((kind, key), 0)
+            self._cursors[(kind, key)] = cursor + 1
+            entry = entries[min(cursor, len(entries) - 1)]
+        latency = entry["latency"] if self.latency == "recorded" else 0.0
+        return entry["payload"], latency
+
+    def flush(self) -> None:
+        """Write the recorded interactions to the cassette file if any were added since the last flush."""
+        with self._lock:
+            if not self._dirty:
+                return
+            document = json.dumps({"version": 1, "interactions": self._interactions}, ensure_ascii=False)
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(document)
+        os.replace(tmp_path, self.path)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def configure_cassette(mode: str, path: Optional[str] = None, latency: str = "recorded") -> Cassette:
+    """Install the process-wide cassette (used by benchmarks instead of env vars)."""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is not None:
+            # Replacing a recording cassette: keep what it captured
+            _cassette.flush()
+        _cassette = Cassette(Path(path or "data/cassettes/default.json"), mode=mode, latency=latency)
+    return _cassette
+
+
+def get_cassette() -> Cassette:
+    """Return the process-wide cassette, created from the environment on first use."""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                Path(os.getenv("LLM_CASSETTE_PATH", "data/cassettes/default.json")),
+                mode=os.getenv("LLM_CASSETTE_MODE", "off").lower(),
+                latency=os.getenv("LLM_CASSETTE_LATENCY", "recorded").lower(),
+            )
+        return _cassette
+
+
+# ---------- HTTP (ChatDeepSeek) ----------
+def _http_key(request: httpx.Request, body: bytes) -> str:
+    try:
+        content: Any = json.loads(body) if body else None
+    except ValueError:
+        content = body.decode("utf-8", errors="replace")
+    return request_key("http", request.method, request.url.path, content)
+
+
+def _encode_body(body: bytes) -> dict:
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(payload: dict) -> bytes:
+    if "base64" in payload:
+        return base64.b64decode(payload["base64"])
+    return payload.get("text", "").encode("utf-8")
+
+
+def _to_payload(response: httpx.Response, body: bytes) -> dict:
+    return {
+        "status": response.status_code,
+        "headers": {"content-type": response.headers.get("content-type", "application/json")},
+        "body": _encode_body(body),
+    }
+
+
+def _from_payload(request: httpx.Request, payload: dict) -> httpx.Response:
+    return httpx.Response(
+        status_code=payload["status"],
+        headers=payload.get("headers", {}),
+        content=_decode_body(payload["body"]),
+        request=request,
+    )
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """Sync httpx transport that records to / replays from the cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._inner = httpx.HTTPTransport() if cassette.mode == "record" else None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        key = _http_key(request, body)
+        if self.cassette.mode == "replay":
+            payload, latency = self.cassette.play("http", key)
+            if latency:
+                time.sleep(latency)
+            return _from_payload(request, payload)
+
+        started = time.perf_counter()
+        response = self._inner.handle_request(request)
+        content = response.read()
+        self.cassette.record("http", key, _to_payload(response, content), time.perf_counter() - started)
+        return _from_payload(request, _to_payload(response, content))
+
+    def close(self) -> None:
+        if self._inner is not None:
+            self._inner.close()
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    """Async httpx transport that records to / replays from the cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._inner = httpx.AsyncHTTPTransport() if cassette.mode == "record" else None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = _http_key(request, body)
+        if self.cassette.mode == "replay":
+            payload, latency = self.cassette.play("http", key)
+            if latency:
+                await asyncio.sleep(latency)
+            return _from_payload(request, payload)
+
+        started = time.perf_counter()
+        response = await self._inner.handle_async_request(request)
+        content = await response.aread()
+        self.cassette.record("http", key, _to_payload(response, content), time.perf_counter() - started)
+        return _from_payload(request, _to_payload(response, content))
+
+    async def aclose(self) -> None:
+        if self._inner is not None:
+            await self._inner.aclose()
+
+
+def http_client_kwargs(timeout: httpx.Timeout) -> Dict[str, Any]:
+    """
+    Extra ChatDeepSeek kwargs that route its traffic through the cassette.
+
+    Returns an empty dict when cassettes are off so the default clients are used.
+    """
+    cassette = get_cassette()
+    if not cassette.enabled:
+        return {}
+    kwargs: Dict[str, Any] = {
+        "http_client": httpx.Client(transport=CassetteTransport(cassette), timeout=timeout),
+        "http_async_client": httpx.AsyncClient(transport=AsyncCassetteTransport(cassette), timeout=timeout),
+    }
+    if cassette.mode == "replay":
+        # The key is never sent anywhere, it only satisfies client validation
+        kwargs["api_key"] = os.getenv("DEEPSEEK_API_KEY") or "cassette-replay"
+        kwargs["max_retries"] = 0
+    return kwargs
+
+
+# ---------- Tavily ----------
+class CassetteSearchClient:
+    """Drop-in wrapper around AsyncTavilyClient.search backed by the cassette."""
+
+    def __init__(self, cassette: Cassette, client_factory: Callable[[], Any]):
+        self.cassette = cassette
+        self._client = client_factory() if cassette.mode == "record" else None
+
+    async def search(self, query: str, **kwargs) -> dict:
+        key = request_key("search", query, kwargs)
+        if self.cassette.mode == "replay":
+            payload, latency = self.cassette.play("search", key)
+            if latency:
+                await asyncio.sleep(latency)
+            return payload
+
+        started = time.perf_counter()
+        result = await self._client.search(query, **kwargs)
+        self.cassette.record("search", key, result, time.perf_counter() - started)
+        return result
+
+
+def wrap_search_client(client_factory: Callable[[], Any]):
+    """Return the real search client, or a cassette-backed one in record/replay mode."""
+    cassette = get_cassette()
+    if not cassette.enabled:
+        return client_factory()
+    return CassetteSearchClient(cassette, client_factory)
+
+
+# ---------- Embeddings ----------
+class CassetteEmbeddings(Embeddings):
+    """Embeddings wrapper that records to / replays from the cassette."""
+
+    def __init__(self, cassette: Cassette, embeddings_factory: Callable[[], Embeddings], name: str):
+        self.cassette = cassette
+        self.name = name
+        self._inner = embeddings_factory() if cassette.mode == "record" else None
+
+    def _call(self, method: str, payload: Any, compute: Callable[[], Any]):
+        key = request_key("embeddings", self.name, method, payload)
+        if self.cassette.mode == "replay":
+            result, latency = self.cassette.play("embeddings", key)
+            if latency:
+                time.sleep(latency)
+            return result["vectors"]
+
+        started = time.perf_counter()
+        vectors = compute()
+        self.cassette.record("embeddings", key, {"vectors": vectors}, time.perf_counter() - started)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call("documents", texts, lambda: self._inner.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call("query", text, lambda: self._inner.embed_query(text))
+
+
+def wrap_embeddings(embeddings_factory: Callable[[], Embeddings], name: str) -> Embeddings:
+    """Return the real embeddings, or a cassette-backed wrapper in record/replay mode."""
+    cassette = get_cassette()
+    if not cassette.enabled:
+        return embeddings_factory()
+    return CassetteEmbeddings(cassette, embeddings_factory, name)
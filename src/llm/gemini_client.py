@@ -1,11 +1,17 @@
 import yaml
 from pathlib import Path
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import lru_cache
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
-from langchain_deepseek import ChatDeepSeek
+from typing import Optional, Dict, Any, TYPE_CHECKING
 import os
 import httpx
+from src.llm.cassette import http_client_kwargs, wrap_embeddings
+from langchain_core.embeddings import Embeddings
+
+# Provider SDKs are heavy to import; they are loaded on the first create_model() call
+if TYPE_CHECKING:
+    from langchain_deepseek import ChatDeepSeek
+
 granular_timeout = httpx.Timeout(
     connect=5.0,    # Time to establish connection
     read=180.0,     # MAXIMUM: Time waiting for server response (most important!)
@@ -14,24 +20,38 @@ granular_timeout = httpx.Timeout(
 )
 load_dotenv()
 
-CONFIG_PATH = Path("config/model_config.yaml")
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / "config" / "model_config.yaml"
 
-with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-    MODEL_CONFIG = yaml.safe_load(f)
+@lru_cache(maxsize=1)
+def get_model_config() -> Dict[str, Any]:
+    """Load config/model_config.yaml once, on first use."""
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
 
-def create_model(agent_name: str) -> ChatDeepSeek:
+def create_model(agent_name: str) -> "ChatDeepSeek":
     """
-    Initialize a ChatGoogleGenerativeAI model for the given agent based on YAML configuration.
+    Initialize a ChatDeepSeek model for the given agent based on YAML configuration.
     """
+    model_config = get_model_config()
     # 1. Resolve model routing from YAML
-    model_key: Optional[str] = MODEL_CONFIG.get("routing", {}).get(agent_name)
+    model_key: Optional[str] = model_config.get("routing", {}).get(agent_name)
     if not model_key:
         raise ValueError(f"No model configured for agent: {agent_name}")
 
-    cfg: Dict[str, Any] = MODEL_CONFIG.get("models", {}).get(model_key)
+    cfg: Dict[str, Any] = model_config.get("models", {}).get(model_key)
     if not cfg:
         raise ValueError(f"No configuration found for model key: {model_key}")
 
+    # Offline benchmarks swap every agent for the scripted stub model
+    if os.getenv("LLM_PROVIDER", "deepseek").lower() == "stub":
+        from src.llm.stub import StubChatModel
+        return StubChatModel(
+            agent_name=agent_name,
+            model_name=cfg["model"],
+            tags=[agent_name],
+            metadata={"agent_name": agent_name},
+        )
+
     # 2. Build Gemini-specific kwargs
     # Note: langchain-google-genai uses 'model' and 'google_api_key'
     model_kwargs: Dict[str, Any] = {
@@ -45,4 +65,54 @@ def create_model(agent_name: str) -> ChatDeepSeek:
     if isinstance(cfg.get("max_tokens"), int):
         model_kwargs["max_tokens"] = cfg["max_tokens"]
 
-    return ChatDeepSeek(**model_kwargs,streaming= True)
\ No newline at end of file
+    # Tag every call with the agent name so usage accounting can attribute it
+    model_kwargs["tags"] = [agent_name]
+    model_kwargs["metadata"] = {"agent_name": agent_name}
+
+    # Route traffic through the record/replay cassette when one is active
+    model_kwargs.update(http_client_kwargs(granular_timeout))
+
+    # Count each HTTP attempt, so usage records include the SDK client's own retries
+    from openai import DefaultHttpxClient, DefaultAsyncHttpxClient
+    from src.handlers.usage_handler import count_llm_attempt, acount_llm_attempt
+    model_kwargs.setdefault("http_client", DefaultHttpxClient(timeout=granular_timeout))
+    model_kwargs.setdefault("http_async_client", DefaultAsyncHttpxClient(timeout=granular_timeout))
+    model_kwargs["http_client"].event_hooks["request"].append(count_llm_attempt)
+    model_kwargs["http_async_client"].event_hooks["request"].append(acount_llm_attempt)
+
+    from langchain_deepseek import ChatDeepSeek
+    return ChatDeepSeek(**model_kwargs, streaming=True, stream_usage=True)
+
+def get_model_pricing(model_name: str) -> Dict[str, float]:
+    """
+    Return the per-million-token pricing configured for a provider model name.
+
+    Unknown models are priced at zero so accounting never fails a run.
+    """
+    for cfg in get_model_config().get("models", {}).values():
+        if cfg.get("model") == model_name:
+            return cfg.get("pricing", {})
+    return {}
+
+def create_embeddings(model: str = "gemini-embedding-001", provider: Optional[str] = None,
+                      dimension: int = 768) -> Embeddings:
+    """
+    Initialize the embedding model used by the vector memory.
+
+    provider (default: EMBEDDING_PROVIDER, else "google") selects the backend:
+    "local" uses CPU hashing embeddings of the given dimension, "stub" swaps in
+    deterministic test vectors for offline runs, and "google" uses Gemini
+    embeddings, routed through the cassette when active.
+    """
+    provider = (provider or os.getenv("EMBEDDING_PROVIDER", "google")).lower()
+    if provider == "stub":
+        from src.llm.stub import StubEmbeddings
+        return StubEmbeddings()
+    if provider == "local":
+        from src.llm.local_embeddings import LocalHashingEmbeddings
+        return LocalHashingEmbeddings(dimension=dimension)
+    if provider != "google":
+        raise ValueError(f"Unknown embedding provider: {provider}")
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return wrap_embeddings(lambda: GoogleGenerativeAIEmbeddings(model=model), model)
@@ -0,0 +1,90 @@
+"""
+Local CPU embeddings for research memory.
+
+LocalHashingEmbeddings maps text to vectors with signed feature hashing over
+word unigrams and bigrams. There is no model download and no network call.
+Vectors are stable across processes and machines: features are hashed with
+blake2b, not Python's salted hash(). A batch is encoded with one
+scatter-add into a dense float32 matrix, and each feature's (index, sign)
+is memoized, so repeated vocabulary costs a dict lookup.
+
+The vectors capture lexical overlap, not paraphrase, so distances are on a
+different scale than Gemini's. A collection built with one provider cannot
+be searched with the other (VectorStoreService checks the embedding space
+recorded on the collection).
+"""
+import hashlib
+import re
+import threading
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.data_retriever.lexical_index import STOPWORDS
+
+_TOKEN = re.compile(r"\w+(?:[.\-]\w+)*", re.UNICODE)
+# Bound the memoized feature table so a long-running process does not grow without limit
+MAX_CACHED_FEATURES = 500_000
+
+
+class LocalHashingEmbeddings(Embeddings):
+    """Deterministic hashing embeddings (unigrams + bigrams), vectorized with NumPy."""
+
+    version = "v1"
+
+    def __init__(self, dimension: int = 768, bigram_weight: float = 0.5):
+        self.dimension = dimension
+        self.bigram_weight = bigram_weight
+        self._features: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        """Identifies the embedding space: vectors from different names are not comparable."""
+        return f"hashing-{self.version}-{self.dimension}"
+
+    def _feature(self, feature: str) -> Tuple[int, float]:
+        cached = self._features.get(feature)
+        if cached is None:
+            value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            cached = (value % self.dimension, 1.0 if value >> 63 else -1.0)
+            with self._lock:
+                if len(self._features) >= MAX_CACHED_FEATURES:
+                    self._features.clear()
+                self._features[feature] = cached
+        return cached
+
+    def _features_of(self, text: str) -> List[Tuple[int, float]]:
+        tokens = [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+        features = [self._feature(token) for token in tokens]
+        features += [
+            (index, sign * self.bigram_weight)
+            for index, sign in (self._feature(f"{a} {b}") for a, b in zip(tokens, tokens[1:]))
+        ]
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, dimension) float32 matrix of L2-normalized embeddings."""
+        rows: List[int] = []
+        columns: List[int] = []
+        weights: List[float] = []
+        for row, text in enumerate(texts):
+            for index, weight in self._features_of(text):
+                rows.append(row)
+                columns.append(index)
+                weights.append(weight)
+        flat = np.asarray(rows, dtype=np.int64) * self.dimension + np.asarray(columns, dtype=np.int64)
+        matrix = np.bincount(flat, weights=weights, minlength=len(texts) * self.dimension)
+        matrix = matrix.reshape(len(texts), self.dimension).astype(np.float32)
+        # Sublinear term frequency, keeping the hash sign
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
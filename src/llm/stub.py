@@ -0,0 +1,235 @@
+"""
+Built-in stub LLM, search and embedding providers for offline benchmarking.
+
+Selected with LLM_PROVIDER=stub, SEARCH_PROVIDER=stub and EMBEDDING_PROVIDER=stub.
+The stub model plays every agent in the graph with a fixed script that
+exercises the real control flow (scope -> brief -> supervisor fan-out ->
+researcher search loop -> compression -> final report) while sleeping for a
+latency drawn from a configurable distribution.
+
+Latency specs (seconds): "zero", "fixed:0.2", "uniform:0.1,0.5",
+"normal:0.3,0.05", "lognormal:-1.5,0.4".
+"""
+import asyncio
+import hashlib
+import math
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class LatencyModel:
+    """Samples a latency in seconds from a distribution spec string."""
+
+    def __init__(self, spec: str = "zero", seed: Optional[int] = None):
+        self.spec = spec
+        self._rng = random.Random(seed)
+        name, _, args = spec.partition(":")
+        self.kind = name.strip().lower()
+        self.params = [float(a) for a in args.split(",") if a.strip()]
+        if self.kind not in ("zero", "fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "zero":
+            return 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(self._rng.gauss(self.params[0], self.params[1]), 0.0)
+        return self._rng.lognormvariate(self.params[0], self.params[1])
+
+
+@dataclass
+class StubSettings:
+    llm_latency: str = "zero"
+    search_latency: str = "zero"
+    # Number of ConductResearch calls the supervisor issues in its first turn
+    fan_out: int = 3
+    # Number of tavily_search calls each researcher makes before answering
+    searches_per_researcher: int = 2
+    results_per_search: int = 3
+    # Size of generated texts, drives state and checkpoint size
+    response_chars: int = 1200
+    raw_content_chars: int = 4000
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "StubSettings":
+        settings = cls()
+        for f in fields(cls):
+            raw = os.getenv(f"STUB_{f.name.upper()}")
+            if raw is not None:
+                setattr(settings, f.name, raw if f.type in (str, "str") else int(raw))
+        return settings
+
+
+STUB_SETTINGS = StubSettings.from_env()
+_llm_latency = LatencyModel(STUB_SETTINGS.llm_latency, STUB_SETTINGS.seed)
+_search_latency = LatencyModel(STUB_SETTINGS.search_latency, STUB_SETTINGS.seed)
+
+
+def configure_stubs(**overrides) -> StubSettings:
+    """Override stub settings at runtime (the models read them on every call)."""
+    global _llm_latency, _search_latency
+    for key, value in overrides.items():
+        if not hasattr(STUB_SETTINGS, key):
+            raise ValueError(f"Unknown stub setting: {key}")
+        setattr(STUB_SETTINGS, key, value)
+    _llm_latency = LatencyModel(STUB_SETTINGS.llm_latency, STUB_SETTINGS.seed)
+    _search_latency = LatencyModel(STUB_SETTINGS.search_latency, STUB_SETTINGS.seed)
+    return STUB_SETTINGS
+
+
+def _filler(label: str, chars: int) -> str:
+    sentence = f"{label}: stub finding about the research topic with supporting detail. "
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+def _args_for_schema(parameters: dict, label: str) -> Dict[str, Any]:
+    """Produce arguments satisfying a JSON schema of flat string/bool/int properties."""
+    args: Dict[str, Any] = {}
+    for name, prop in parameters.get("properties", {}).items():
+        kind = prop.get("type")
+        if kind == "boolean":
+            # need_clarification=False keeps the scope graph moving to the brief
+            args[name] = False
+        elif kind in ("integer", "number"):
+            args[name] = 1
+        else:
+            args[name] = _filler(f"{label} {name}", 200)
+    return args
+
+
+def _tool_call(name: str, args: dict) -> dict:
+    return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:16]}", "type": "tool_call"}
+
+
+class StubChatModel(BaseChatModel):
+    """Scripted chat model standing in for ChatDeepSeek in benchmarks."""
+
+    agent_name: str = "stub"
+    model_name: str = "stub-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "agent_name": self.agent_name}
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_model_name"] = self.model_name
+        return params
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        if tool_choice == "any" and len(formatted) == 1:
+            tool_choice = formatted[0]["function"]["name"]
+        return super().bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]], tool_choice: Any) -> AIMessage:
+        tool_specs = {t["function"]["name"]: t["function"] for t in tools or []}
+        tool_counts: Dict[str, int] = {}
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                tool_counts[message.name] = tool_counts.get(message.name, 0) + 1
+
+        # Structured output: a single forced tool
+        if isinstance(tool_choice, str) and tool_choice in tool_specs:
+            spec = tool_specs[tool_choice]
+            return AIMessage(content="", tool_calls=[
+                _tool_call(tool_choice, _args_for_schema(spec.get("parameters", {}), self.agent_name))
+            ])
+
+        # Supervisor: fan out once, then finish
+        if "ConductResearch" in tool_specs:
+            if not tool_counts.get("ConductResearch"):
+                return AIMessage(content="", tool_calls=[
+                    _tool_call("ConductResearch", {"research_topic": _filler(f"topic {i}", 300)})
+                    for i in range(STUB_SETTINGS.fan_out)
+                ])
+            return AIMessage(content="", tool_calls=[_tool_call("ResearchComplete", {})])
+
+        # Researcher: search a fixed number of times, then answer
+        if "tavily_search" in tool_specs:
+            done = tool_counts.get("tavily_search", 0)
+            if done < STUB_SETTINGS.searches_per_researcher:
+                return AIMessage(content="", tool_calls=[
+                    _tool_call("tavily_search", {"query": f"stub query {done}"})
+                ])
+
+        return AIMessage(content=_filler(self.agent_name, STUB_SETTINGS.response_chars))
+
+    def _build_result(self, messages: List[BaseMessage], **kwargs: Any) -> ChatResult:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        completion_chars = len(str(message.content)) + sum(len(str(tc["args"])) for tc in message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": completion_chars // 4,
+            "total_tokens": (prompt_chars + completion_chars) // 4,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(_llm_latency.sample())
+        return self._build_result(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(_llm_latency.sample())
+        return self._build_result(messages, **kwargs)
+
+
+class StubSearchClient:
+    """AsyncTavilyClient-shaped search client returning generated pages."""
+
+    async def search(self, query: str, max_results: int = 3, include_raw_content: bool = True, **kwargs) -> dict:
+        await asyncio.sleep(_search_latency.sample())
+        count = min(max_results, STUB_SETTINGS.results_per_search)
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://stub.local/{uuid.uuid4().hex[:8]}",
+                    "title": f"Stub result {i} for {query}",
+                    "content": _filler(f"snippet {i}", 300),
+                    "raw_content": _filler(f"page {i}", STUB_SETTINGS.raw_content_chars) if include_raw_content else None,
+                }
+                for i in range(count)
+            ],
+        }
+
+
+class StubEmbeddings(Embeddings):
+    """Deterministic bag-of-words hashing embeddings; no model, no network."""
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in text.lower().split():
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
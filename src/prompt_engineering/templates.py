@@ -1,5 +1,9 @@
 import yaml
+import logging
 from pathlib import Path
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 # 1. Get the directory where templates.py is located
 # 2. Go up enough levels to reach the root (PythonProject)
@@ -7,17 +11,21 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 PROMPT_PATH = BASE_DIR / "config" / "prompt_templates.yaml"
 
-# Debugging line - this will show up in 'docker logs research_backend'
-print(f"DEBUG: Loading YAML from {PROMPT_PATH}")
 
-if not PROMPT_PATH.exists():
-    raise FileNotFoundError(f"Could not find the prompt file at {PROMPT_PATH}. "
-                            f"Check if the 'config' folder is mapped correctly in Docker.")
+@lru_cache(maxsize=1)
+def load_prompt_templates() -> dict:
+    """Load config/prompt_templates.yaml once, on the first prompt lookup."""
+    # Shows up in 'docker logs research_backend' when debug logging is enabled
+    logger.debug(f"Loading YAML from {PROMPT_PATH}")
+
+    if not PROMPT_PATH.exists():
+        raise FileNotFoundError(f"Could not find the prompt file at {PROMPT_PATH}. "
+                                f"Check if the 'config' folder is mapped correctly in Docker.")
+
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
 
-with open(PROMPT_PATH, "r", encoding="utf-8") as f:
-    PROMPT_TEMPLATES = yaml.safe_load(f)
 
-# ... (rest of your get_prompt function)
 def get_prompt(agent_name: str, prompt_name: str) -> str:
     """
     Fetch a specific prompt string for an agent from YAML.
@@ -30,6 +38,6 @@ def get_prompt(agent_name: str, prompt_name: str) -> str:
         Prompt string ready for .format(...)
     """
     try:
-        return PROMPT_TEMPLATES[agent_name][prompt_name]
+        return load_prompt_templates()[agent_name][prompt_name]
     except KeyError:
         raise ValueError(f"Prompt '{prompt_name}' not found for agent '{agent_name}'")
@@ -2,25 +2,39 @@ from langchain_core.tools import tool, InjectedToolArg
 from src.agent_interface.schemas import Summary
 from src.prompt_engineering.templates import get_prompt
 from typing_extensions import Literal, List, Annotated
-from tavily import TavilyClient
+from functools import lru_cache
 from src.llm.gemini_client import create_model
+from src.llm.cassette import wrap_search_client
 from langchain_core.messages import HumanMessage
 from datetime import datetime
+import asyncio
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
-summarize_webpage_prompt = get_prompt("utils","summarize_webpage_prompt")
-model = create_model("summarizer")
-tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
+
+@lru_cache(maxsize=1)
+def get_summarizer_model():
+    """Create the summarization model on first use instead of at import time."""
+    return create_model("summarizer")
+
+@lru_cache(maxsize=1)
+def get_search_client():
+    """Build the search client on first use (stub, cassette-backed or Tavily)."""
+    if os.getenv("SEARCH_PROVIDER", "tavily").lower() == "stub":
+        from src.llm.stub import StubSearchClient
+        return StubSearchClient()
+
+    from tavily import AsyncTavilyClient
+    return wrap_search_client(lambda: AsyncTavilyClient(api_key=TAVILY_API_KEY))
 
 def get_today_str() -> str:
     return datetime.now().strftime("%a %b %#d, %Y")
 
 
-def tavily_search_multiple(
+async def tavily_search_multiple(
     search_queries: List[str],
     max_results: int = 3,
     topic: Literal["general", "scientific", "beauty_tech_trend"] = "general",
@@ -38,20 +52,19 @@ def tavily_search_multiple(
         List of search result dictionaries
     """
 
-    # Execute searches sequentially. Note: yon can use AsyncTavilyClient to parallelize this step.
-    search_docs = []
-    for query in search_queries:
-        result = tavily_client.search(
+    # Execute searches concurrently on the async client
+    tavily_client = get_search_client()
+    return list(await asyncio.gather(*[
+        tavily_client.search(
             query,
             max_results=max_results,
             include_raw_content=include_raw_content,
             topic=topic
         )
-        search_docs.append(result)
+        for query in search_queries
+    ]))
 
-    return search_docs
-
-def summarize_webpage_content(webpage_content: str) -> str:
+async def summarize_webpage_content(webpage_content: str) -> str:
     """Summarize webpage content using the configured summarization model.
 
     Args:
@@ -62,10 +75,11 @@ def summarize_webpage_content(webpage_content: str) -> str:
     """
     try:
         # Set up structured output model for summarization
-        structured_model = model.with_structured_output(Summary)
+        structured_model = get_summarizer_model().with_structured_output(Summary)
+        summarize_webpage_prompt = get_prompt("utils", "summarize_webpage_prompt")
 
         # Generate summary
-        summary = structured_model.invoke([
+        summary = await structured_model.ainvoke([
             HumanMessage(content=summarize_webpage_prompt.format(
                 webpage_content=webpage_content,
                 date=get_today_str()
@@ -133,7 +147,7 @@ def deduplicate_search_results(search_results: List[dict]) -> dict:
 
 
 
-def process_search_results(results: dict) -> dict:
+async def process_search_results(results: dict) -> dict:
     """Process search results by summarizing content where available.
 
     Args:
@@ -142,22 +156,19 @@ def process_search_results(results: dict) -> dict:
     Returns:
         Dictionary of processed results with summaries
     """
-    summarized_results = {}
-
-    for url, result in results.items():
+    async def summarize(result: dict) -> str:
         # Use existing content if no raw content for summarization
         if not result.get("raw_content"):
-            content = result['content']
-        else:
-            # Summarize raw content for better processing
-            content = summarize_webpage_content(result['raw_content'])
-
-        summarized_results[url] = {
-            'title': result['title'],
-            'content': content
-        }
+            return result['content']
+        # Summarize raw content for better processing
+        return await summarize_webpage_content(result['raw_content'])
 
-    return summarized_results
+    # The pages are summarized concurrently
+    contents = await asyncio.gather(*[summarize(result) for result in results.values()])
+    return {
+        url: {'title': result['title'], 'content': content}
+        for (url, result), content in zip(results.items(), contents)
+    }
 
 def format_search_output(summarized_results: dict) -> str:
     """Format search results into a well-structured string output.
@@ -182,7 +193,7 @@ def format_search_output(summarized_results: dict) -> str:
     return formatted_output
 
 @tool(parse_docstring=True)
-def tavily_search(
+async def tavily_search(
     query: str,
     max_results: Annotated[int, InjectedToolArg] = 3,
     topic: Annotated[Literal["general", "scientific", "beauty_tech_trend" ], InjectedToolArg] = "general",
@@ -198,7 +209,7 @@ def tavily_search(
         Formatted string of search results with summaries
     """
     # Execute search for single query
-    search_results = tavily_search_multiple(
+    search_results = await tavily_search_multiple(
         [query],  # Convert single query to list for the internal function
         max_results=max_results,
         topic=topic,
@@ -207,7 +218,7 @@ def tavily_search(
 
     uniqe_results = deduplicate_search_results(search_results)
     # Process results with summarization
-    summarized_results = process_search_results(uniqe_results)
+    summarized_results = await process_search_results(uniqe_results)
 
     # Format output for consumption
     return format_search_output(summarized_results)